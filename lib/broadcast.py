@@ -0,0 +1,59 @@
+import asyncio
+import collections
+import itertools
+import threading
+
+
+class BroadcastHub:
+    """Publish/subscribe channel from worker threads to asyncio websocket clients.
+
+    Messages are kept in a ring buffer with increasing sequence numbers, every subscriber reads
+    from its own cursor so all connected clients get every message. append() can be called from
+    any thread and wakes the subscribers on the event loop right away.
+    """
+
+    def __init__(self, capacity=1000):
+        self.messages = collections.deque(maxlen=capacity)
+        self.last_seq = 0
+        self.lock = threading.Lock()
+        self.loop = None
+        self.subscribers = set()
+        self.notify_pending = False
+
+    def attach_loop(self, loop):
+        self.loop = loop
+
+    def append(self, message):
+        with self.lock:
+            self.last_seq += 1
+            self.messages.append((self.last_seq, message))
+            # a burst of messages schedules a single wake-up
+            if self.loop is None or self.notify_pending:
+                return
+            self.notify_pending = True
+        self.loop.call_soon_threadsafe(self.notify)
+
+    def notify(self):
+        with self.lock:
+            self.notify_pending = False
+        for wakeup in self.subscribers:
+            wakeup.set()
+
+    def subscribe(self):
+        """Returns (cursor, event), new subscribers only get messages published after subscribing"""
+        wakeup = asyncio.Event()
+        self.subscribers.add(wakeup)
+        return self.last_seq, wakeup
+
+    def unsubscribe(self, wakeup):
+        self.subscribers.discard(wakeup)
+
+    def read(self, cursor):
+        """Messages after cursor and the new cursor. A client that fell behind the buffer skips what was dropped."""
+        with self.lock:
+            if cursor >= self.last_seq:
+                return [], cursor
+            missing = min(self.last_seq - cursor, len(self.messages))
+            messages = [message for _, message in
+                        itertools.islice(self.messages, len(self.messages) - missing, None)]
+            return messages, self.last_seq
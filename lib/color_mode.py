@@ -5,6 +5,16 @@ import colorsys
 import mido
 import random
 
+# user settings read by the color modes, a change makes the current one reload its settings
+LOADED_SETTINGS = ("red", "green", "blue", "multicolor", "multicolor_range", "multicolor_iteration",
+                   "rainbow_offset", "rainbow_scale", "rainbow_timeshift", "rainbow_colormap",
+                   "velocityrainbow_offset", "velocityrainbow_scale", "velocityrainbow_curve",
+                   "velocityrainbow_colormap", "speed_period_in_seconds", "speed_max_notes", "scale_key",
+                   "led_count") + tuple(color + "_" + channel
+                                        for color in ("speed_slowest", "speed_fastest", "gradient_start",
+                                                      "gradient_end", "key_in_scale", "key_not_in_scale")
+                                        for channel in ("red", "green", "blue"))
+
 class ColorMode(object):
     def __new__(cls, name, ledsettings):
         """Automagic factory for creating ColorMode
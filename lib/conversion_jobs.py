@@ -0,0 +1,272 @@
+import collections
+import itertools
+import os
+import queue
+import shutil
+import subprocess
+import threading
+import time
+
+from lib.log_setup import logger
+from lib.status_board import status_board
+
+SCORE_EXTENSIONS = (".musicxml", ".xml", ".mxl", ".abc")
+# converter programs by (source extension, target extension), the first installed one is used;
+# midi2abc and abc2midi come with the abcmidi package, MusicXML needs the MuseScore command line
+CONVERTERS = {
+    (".mid", ".abc"): [["midi2abc", "{source}", "-o", "{target}"]],
+    (".abc", ".mid"): [["abc2midi", "{source}", "-o", "{target}"]],
+}
+for _extension in (".musicxml", ".xml", ".mxl"):
+    CONVERTERS[(_extension, ".mid")] = [[program, "-o", "{target}", "{source}"]
+                                        for program in ("mscore3", "musescore3", "mscore", "musescore")]
+# converters are killed after this many seconds
+CONVERSION_TIMEOUT = 300
+# niceness of the converter processes, so they don't take CPU time from the LED loop
+CONVERTER_NICENESS = 10
+# bytes of source file converted per second, until a conversion of the same kind was timed
+DEFAULT_THROUGHPUT = 100000
+# seconds between two progress updates of a running conversion
+PROGRESS_INTERVAL = 1
+
+FINISHED_STATES = ("done", "failed", "cancelled")
+
+
+def split_extension(name):
+    base, extension = os.path.splitext(name)
+    return base, extension.lower()
+
+
+class ConversionJob:
+    def __init__(self, job_id, source, target):
+        self.id = job_id
+        self.source = source
+        self.target = target
+        self.state = "queued"
+        self.error = None
+        self.cached = False
+        self.created = time.time()
+        self.started = None
+        self.finished = None
+        self.expected_duration = 1.0
+        self.process = None
+        self.callbacks = []
+
+    @property
+    def kind(self):
+        return split_extension(self.source)[1], split_extension(self.target)[1]
+
+    def progress(self):
+        # converters don't report progress, it is estimated from the duration of previous conversions
+        if self.state == "done":
+            return 1.0
+        if self.state == "running":
+            return round(min(0.95, (time.time() - self.started) / self.expected_duration), 2)
+        return 0.0
+
+    def as_dict(self):
+        return {"id": self.id, "source": self.source, "target": self.target, "state": self.state,
+                "progress": self.progress(), "error": self.error, "cached": self.cached}
+
+
+class ConversionQueue:
+    """Converts songs between MIDI and sheet music formats with external programs.
+
+    Jobs are run by a few worker threads which only wait for the converter processes, so request
+    threads return right away with a job and follow it through get()/status(). Results are
+    written next to the source in the songs folder and reused while they are newer than it.
+    """
+
+    def __init__(self, songs_dir="Songs", workers=2, keep_finished=20, converters=None):
+        self.songs_dir = songs_dir
+        self.workers = workers
+        self.keep_finished = keep_finished
+        self.converters = converters if converters is not None else CONVERTERS
+        self.jobs = collections.OrderedDict()
+        self.pending = queue.Queue()
+        self.lock = threading.Lock()
+        self.ids = itertools.count(1)
+        self.throughput = {}
+        self.threads = []
+
+    def path(self, name):
+        return os.path.join(self.songs_dir, name)
+
+    def can_convert(self, source, target_extension):
+        return (split_extension(source)[1], target_extension) in self.converters
+
+    def is_cached(self, source, target):
+        try:
+            return os.path.getmtime(self.path(target)) >= os.path.getmtime(self.path(source))
+        except OSError:
+            return False
+
+    def submit(self, source, target_extension, callback=None):
+        """Queue the conversion of a file of the songs folder, callback(job) is called once it finished.
+
+        A conversion of the same file which is already queued or running is reused.
+        """
+        if not self.can_convert(source, target_extension):
+            raise ValueError("Can't convert " + source + " to " + target_extension)
+        if not os.path.isfile(self.path(source)):
+            raise ValueError(source + " doesn't exist")
+        target = split_extension(source)[0] + target_extension
+        with self.lock:
+            for job in self.jobs.values():
+                if job.target == target and job.state not in FINISHED_STATES:
+                    if callback is not None:
+                        job.callbacks.append(callback)
+                    return job
+            job = ConversionJob(next(self.ids), source, target)
+            if callback is not None:
+                job.callbacks.append(callback)
+            self.jobs[job.id] = job
+            self.trim()
+            queued = not self.is_cached(source, target)
+            if queued:
+                self.start_workers()
+                self.pending.put(job)
+        if queued:
+            self.publish()
+            return job
+        job.cached = True
+        self.finish(job, "done")
+        return job
+
+    def cancel(self, job_id):
+        with self.lock:
+            job = self.jobs.get(job_id)
+            if job is None or job.state in FINISHED_STATES:
+                return False
+            if job.state == "queued":
+                # skipped by the worker picking it up
+                job.state = "cancelled"
+                job.finished = time.time()
+                callbacks = True
+            else:
+                job.state = "cancelling"
+                if job.process is not None:
+                    job.process.terminate()
+                callbacks = False
+        self.publish()
+        if callbacks:
+            self.run_callbacks(job)
+        return True
+
+    def get(self, job_id):
+        with self.lock:
+            job = self.jobs.get(job_id)
+            return job.as_dict() if job is not None else None
+
+    def status(self):
+        with self.lock:
+            return {"jobs": [job.as_dict() for job in self.jobs.values()]}
+
+    def publish(self):
+        status_board.update("conversion", self.status())
+
+    def trim(self):
+        finished = [job_id for job_id, job in self.jobs.items() if job.state in FINISHED_STATES]
+        for job_id in finished[:max(0, len(finished) - self.keep_finished)]:
+            del self.jobs[job_id]
+
+    def start_workers(self):
+        while len(self.threads) < self.workers:
+            thread = threading.Thread(target=self.run, daemon=True)
+            self.threads.append(thread)
+            thread.start()
+
+    def run(self):
+        while True:
+            job = self.pending.get()
+            try:
+                self.convert(job)
+            except Exception as e:
+                logger.warning("Conversion of " + job.source + " failed: " + str(e))
+                self.finish(job, "failed", str(e))
+
+    def find_command(self, job):
+        for command in self.converters[job.kind]:
+            if shutil.which(command[0]):
+                return command
+        return None
+
+    def convert(self, job):
+        command = self.find_command(job)
+        # the result is written in the cache folder, so the song library never sees a partial file
+        temp_dir = self.path("cache")
+        os.makedirs(temp_dir, exist_ok=True)
+        temp_path = os.path.join(temp_dir, "converting-" + str(job.id) + job.kind[1])
+        with self.lock:
+            if job.state != "queued":
+                return
+            if command is None:
+                job.state = "failed"
+            else:
+                job.state = "running"
+                job.started = time.time()
+                job.expected_duration = max(0.1, os.path.getsize(self.path(job.source)) /
+                                            self.throughput.get(job.kind, DEFAULT_THROUGHPUT))
+                # nice(1) instead of a preexec_fn, which isn't safe to run in a process with threads
+                job.process = subprocess.Popen(
+                    ["nice", "-n", str(CONVERTER_NICENESS)] +
+                    [part.format(source=self.path(job.source), target=temp_path) for part in command],
+                    stdout=subprocess.DEVNULL, stderr=subprocess.PIPE)
+        if command is None:
+            self.finish(job, "failed", "No converter installed: " + self.converters[job.kind][0][0])
+            return
+
+        deadline = time.time() + CONVERSION_TIMEOUT
+        while True:
+            self.publish()
+            try:
+                _, stderr = job.process.communicate(timeout=PROGRESS_INTERVAL)
+                break
+            except subprocess.TimeoutExpired:
+                if time.time() >= deadline:
+                    job.process.kill()
+                    job.process.communicate()
+                    stderr = b"Timed out"
+                    break
+        try:
+            if job.state == "cancelling":
+                self.finish(job, "cancelled")
+            elif job.process.returncode == 0 and os.path.isfile(temp_path) and os.path.getsize(temp_path) > 0:
+                os.replace(temp_path, self.path(job.target))
+                self.learn_throughput(job)
+                self.finish(job, "done")
+            else:
+                lines = stderr.decode(errors="replace").strip().splitlines()
+                self.finish(job, "failed", lines[-1] if lines else "Exit code " + str(job.process.returncode))
+        finally:
+            if os.path.exists(temp_path):
+                os.remove(temp_path)
+
+    def learn_throughput(self, job):
+        elapsed = max(0.01, time.time() - job.started)
+        throughput = max(1.0, os.path.getsize(self.path(job.source)) / elapsed)
+        previous = self.throughput.get(job.kind)
+        self.throughput[job.kind] = throughput if previous is None else (previous + throughput) / 2
+
+    def finish(self, job, state, error=None):
+        with self.lock:
+            job.state = state
+            job.error = error
+            job.finished = time.time()
+            job.process = None
+            self.trim()
+        if error:
+            logger.warning("Converting " + job.source + " failed: " + error)
+        self.publish()
+        self.run_callbacks(job)
+
+    @staticmethod
+    def run_callbacks(job):
+        for callback in job.callbacks:
+            try:
+                callback(job)
+            except Exception as e:
+                logger.warning("Conversion callback failed: " + str(e))
+
+
+conversion_queue = ConversionQueue()
@@ -3,15 +3,14 @@ from lib.rpi_drivers import Color
 import lib.colormaps as cmap
 import mido
 import datetime
-import psutil
 import time
 import socket
 from lib.rpi_drivers import GPIO
 import math
-import subprocess
 import random
-from lib.log_setup import logger
-import os
+from lib.log_setup import logger, memory_handler
+from lib.system_metrics import metrics_sampler, DiskUsage
+from lib.settings_bus import settings_bus
 
 SENSECOVER = 12
 GPIO.setmode(GPIO.BCM)
@@ -30,26 +29,12 @@ def get_ip_address():
 
 
 def get_last_logs(n=100):
-    file_path = 'visualizer.log'
-    # If the file does not exist, create it with write permissions
-    if not os.path.exists(file_path):
-        open(file_path, 'w').close()
-        os.chmod(file_path, 0o777)
-
+    # served from the in-memory log buffer, no need to read (or tail) the log file
     try:
-        # Use the 'tail' command to get the last N lines of the log file
-        tail_command = ["tail", f"-n{n}", file_path]
-        result = subprocess.run(tail_command, stdout=subprocess.PIPE, stderr=subprocess.PIPE, text=True, check=True)
-
-        # Split the output into lines and return as a list
-        lines = result.stdout.splitlines()
-        string = ""
-        for line in lines:
-            string += "\r\n" + line
-        return string
-    except subprocess.CalledProcessError as e:
-        # Handle any errors that occur during the 'tail' command execution
-        return [f"Error: {e.stderr}"]
+        n = int(n)
+    except (TypeError, ValueError):
+        n = 100
+    return "".join("\r\n" + line for _, line in memory_handler.get_lines(limit=n))
 
 
 def find_between(s, start, end):
@@ -74,9 +59,7 @@ def play_midi(song_path, midiports, saving, menu, ledsettings, ledstrip):
         menu.render_message(song_path, "Already playing", 2000)
         return
 
-    saving.is_playing_midi.clear()
-
-    saving.is_playing_midi[song_path] = True
+    saving.start_playing(song_path)
     menu.render_message("Playing: ", song_path, 2000)
     saving.t = threading.currentThread()
 
@@ -123,7 +106,7 @@ def play_midi(song_path, midiports, saving, menu, ledsettings, ledstrip):
     except Exception as e:
         menu.render_message(song_path, "Error while playing song " + str(e), 2000)
         logger.warning(e)
-    saving.is_playing_midi.clear()
+    saving.stop_playing()
 
 
 def manage_idle_animation(ledstrip, ledsettings, menu, midiports):
@@ -191,22 +174,15 @@ def manage_idle_animation(ledstrip, ledsettings, menu, midiports):
 
 
 def screensaver(menu, midiports, saving, ledstrip, ledsettings):
-    last_cpu_average = 0
-
     KEY2 = 20
     GPIO.setup(KEY2, GPIO.IN, GPIO.PUD_UP)
 
     delay = 0.1
-    interval = 3 / float(delay)
-    i = 0
-    cpu_history = [None] * int(interval)
-    cpu_chart = [0] * 28
-    cpu_average = 0
-
-    upload = 0
-    download = 0
-    upload_start = 0
-    download_start = 0
+    # the screensaver holds the main loop, setting changes are still applied at least this often
+    dispatch_interval = 0.1
+    # seconds of CPU history averaged for the CPU line
+    average_window = 3
+
     local_ip = 0
 
     if menu.screensaver_settings["local_ip"] == "1":
@@ -218,15 +194,15 @@ def screensaver(menu, midiports, saving, ledstrip, ledsettings):
         menu.render_message("Error while getting ports", "", 2000)
         logger.warning("Error while getting ports " + str(e))
 
+    # statistics are read from the shared background sampler
+    metrics_sampler.start()
+
     while True:
         manage_idle_animation(ledstrip, ledsettings, menu, midiports)
 
         if (time.perf_counter() - saving.start_time) > 3600 and delay < 0.5 and menu.screensaver_is_running is False:
             delay = 0.9
-            interval = 5 / float(delay)
-            cpu_history = [None] * int(interval)
-            cpu_average = 0
-            i = 0
+            average_window = 5
 
         if int(menu.screen_off_delay) > 0 and ((time.perf_counter() - saving.start_time) > (int(menu.screen_off_delay) * 60)):
             menu.screen_status = 0
@@ -236,63 +212,40 @@ def screensaver(menu, midiports, saving, ledstrip, ledsettings):
 
         hour = datetime.datetime.now().strftime("%H:%M:%S")
         date = datetime.datetime.now().strftime("%d-%m-%Y")
-        cpu_usage = psutil.cpu_percent()
-        cpu_history[i] = cpu_usage
-        cpu_chart.append(cpu_chart.pop(0))
-        cpu_chart[27] = cpu_usage
 
-        if i >= (int(interval) - 1):
-            i = 0
-            try:
-                cpu_average = sum(cpu_history) / (float(len(cpu_history) + 1))
-                last_cpu_average = cpu_average
-            except:
-                cpu_average = last_cpu_average
+        metrics = metrics_sampler.latest()
+        history = metrics_sampler.history()
+        cpu_usage = metrics['cpu_usage']
+        cpu_chart = [sample['cpu_usage'] for sample in history[-28:]]
+        cpu_chart = [0] * (28 - len(cpu_chart)) + cpu_chart
+        recent = [sample['cpu_usage'] for sample in metrics_sampler.history(average_window)] or [cpu_usage]
+        cpu_average = sum(recent) / len(recent)
 
-        if menu.screensaver_settings["ram"] == "1":
-            ram_usage = psutil.virtual_memory()[2]
-        else:
-            ram_usage = 0
-
-        if menu.screensaver_settings["temp"] == "1":
-            try:
-                temp = find_between(str(psutil.sensors_temperatures()["cpu_thermal"]), "current=", ",")
-            except:
-                temp = 0
-            temp = round(float(temp), 1)
-        else:
-            temp = 0
+        ram_usage = metrics['memory_usage_percent'] if menu.screensaver_settings["ram"] == "1" else 0
+        temp = metrics['cpu_temp'] if menu.screensaver_settings["temp"] == "1" else 0
 
         if menu.screensaver_settings["network_usage"] == "1":
-            upload_end = psutil.net_io_counters().bytes_sent
-            download_end = psutil.net_io_counters().bytes_recv
-
-            if upload_start:
-                upload = upload_end - upload_start
-                upload = upload * (1 / delay)
-                upload = upload / 1000000
-                upload = round(upload, 2)
-
-            if download_start:
-                download = download_end - download_start
-                download = download * (1 / delay)
-                download = download / 1000000
-                download = round(download, 2)
-
-            upload_start = upload_end
-            download_start = download_end
+            upload = round(metrics['upload_rate'] / 1000000, 2)
+            download = round(metrics['download_rate'] / 1000000, 2)
         else:
             upload = 0
             download = 0
         if menu.screensaver_settings["sd_card_space"] == "1":
-            card_space = psutil.disk_usage('/')
+            card_space = DiskUsage(metrics['card_space_total'], metrics['card_space_used'],
+                                   metrics['card_space_total'] - metrics['card_space_used'],
+                                   metrics['card_space_percent'])
         else:
             card_space = 0
 
         menu.render_screensaver(hour, date, cpu_usage, round(cpu_average, 1), ram_usage, temp, cpu_chart, upload,
                                 download, card_space, local_ip)
-        time.sleep(delay)
-        i += 1
+        wake_time = time.perf_counter() + delay
+        while True:
+            settings_bus.dispatch()
+            remaining = wake_time - time.perf_counter()
+            if remaining <= 0:
+                break
+            time.sleep(min(remaining, dispatch_interval))
         try:
             if len(midiports.midi_queue) != 0:
                 menu.screensaver_is_running = False
@@ -407,16 +360,19 @@ def check_if_led_can_be_overwrite(i, ledstrip, ledsettings):
     return False
 
 
+def get_backlight_color(ledsettings):
+    if ledsettings.backlight_stopped:
+        return Color(0, 0, 0)
+    brightness = ledsettings.backlight_brightness_percent / 100
+    red = int(ledsettings.get_backlight_color("Red") * brightness)
+    green = int(ledsettings.get_backlight_color("Green") * brightness)
+    blue = int(ledsettings.get_backlight_color("Blue") * brightness)
+    return Color(red, green, blue)
+
+
 # LED animations
 def fastColorWipe(strip, update, ledsettings):
-    if ledsettings.backlight_stopped:
-        color = Color(0, 0, 0)
-    else:
-        brightness = ledsettings.backlight_brightness_percent / 100
-        red = int(ledsettings.get_backlight_color("Red") * brightness)
-        green = int(ledsettings.get_backlight_color("Green") * brightness)
-        blue = int(ledsettings.get_backlight_color("Blue") * brightness)
-        color = Color(red, green, blue)
+    color = get_backlight_color(ledsettings)
     for i in range(strip.numPixels()):
         strip.setPixelColor(i, color)
     if update:
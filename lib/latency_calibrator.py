@@ -0,0 +1,109 @@
+import statistics
+import threading
+import time
+
+import mido
+
+from lib.log_setup import logger
+
+# Note used for the round trip test and the tap-along clicks
+CALIBRATION_NOTE = 96
+
+
+class LatencyCalibrator:
+    """Measures the input latency of the current MIDI setup and stores it per input port.
+
+    Two methods are available:
+    - round_trip: sends notes to the play port and times their echo on the input port
+      (instruments or interfaces that forward MIDI in to MIDI out), half of the round trip is used
+    - tap_along: plays clicks through the note scheduler and times the user's key presses against them
+    """
+
+    def __init__(self, midiports, note_scheduler):
+        self.midiports = midiports
+        self.note_scheduler = note_scheduler
+        self.status = {"running": False, "mode": None, "result": None, "error": None}
+        self.thread = None
+
+    def start(self, mode):
+        if self.status["running"]:
+            return False
+        if mode not in ("round_trip", "tap_along"):
+            raise ValueError("Unknown calibration mode: " + str(mode))
+        self.status = {"running": True, "mode": mode, "result": None, "error": None}
+        self.thread = threading.Thread(target=self.run, args=(mode,), daemon=True)
+        self.thread.start()
+        return True
+
+    def run(self, mode):
+        try:
+            if mode == "round_trip":
+                latency = self.measure_round_trip()
+            else:
+                latency = self.measure_tap_along()
+            self.midiports.set_input_latency(latency)
+            self.status["result"] = self.midiports.get_input_latency()
+            logger.info("Input latency calibrated to " + str(self.status["result"]) + "s")
+        except Exception as e:
+            logger.warning(e)
+            self.status["error"] = str(e)
+        self.status["running"] = False
+
+    def collect_note_ons(self, note=None):
+        # returns a list filled with timestamps of incoming note_on messages and the listener to remove afterwards
+        timestamps = []
+        received = threading.Event()
+
+        def listener(msg, timestamp):
+            if msg.type == 'note_on' and msg.velocity > 0 and (note is None or msg.note == note):
+                timestamps.append(timestamp)
+                received.set()
+
+        self.midiports.input_listeners.append(listener)
+        return timestamps, received, listener
+
+    def measure_round_trip(self, samples=5, timeout=1):
+        if self.midiports.playport is None:
+            raise Exception("No play port")
+
+        timestamps, received, listener = self.collect_note_ons(CALIBRATION_NOTE)
+        round_trips = []
+        try:
+            for _ in range(samples):
+                received.clear()
+                timestamps.clear()
+                sent = time.perf_counter()
+                self.midiports.playport.send(mido.Message('note_on', note=CALIBRATION_NOTE, velocity=40))
+                if received.wait(timeout):
+                    round_trips.append(timestamps[0] - sent)
+                self.midiports.playport.send(mido.Message('note_off', note=CALIBRATION_NOTE))
+                time.sleep(0.1)
+        finally:
+            self.midiports.input_listeners.remove(listener)
+
+        if not round_trips:
+            raise Exception("No echo received on the input port, use tap-along calibration")
+        return statistics.median(round_trips) / 2
+
+    def measure_tap_along(self, beats=12, interval=0.6, warmup_beats=4):
+        timestamps, _, listener = self.collect_note_ons()
+        start = time.perf_counter() + 1
+        clicks = [start + i * interval for i in range(beats)]
+        for click in clicks:
+            self.note_scheduler.schedule(mido.Message('note_on', note=CALIBRATION_NOTE, velocity=64), click)
+            self.note_scheduler.schedule(mido.Message('note_off', note=CALIBRATION_NOTE), click + 0.05)
+        try:
+            time.sleep(clicks[-1] + interval / 2 - time.perf_counter())
+        finally:
+            self.midiports.input_listeners.remove(listener)
+
+        # the first beats are used by the user to lock onto the tempo
+        offsets = []
+        for click in clicks[warmup_beats:]:
+            nearest = min(timestamps, key=lambda tap: abs(tap - click), default=None)
+            if nearest is not None and abs(nearest - click) < interval / 2:
+                offsets.append(nearest - click)
+
+        if len(offsets) < (beats - warmup_beats) / 2:
+            raise Exception("Not enough taps to calibrate, press a key along with every click")
+        return max(0, statistics.median(offsets))
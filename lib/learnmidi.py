@@ -1,34 +1,34 @@
 import ast
+import bisect
 import threading
 import time
 import json
 
 import mido
-import subprocess
 
 import os
 
-from lib.functions import clamp, fastColorWipe, find_between, get_note_position
+from lib.broadcast import BroadcastHub
+from lib.functions import clamp, fastColorWipe, get_backlight_color, get_note_position
+from lib.latency_calibrator import LatencyCalibrator
+from lib.ledstrip import LedBatch
 from lib.rpi_drivers import Color
 
 import numpy as np
 import pickle
-from lib.log_setup import logger
+from lib.log_setup import logger, score_logger
+from lib.note_scheduler import NoteScheduler
+from lib.note_tracker import NoteTracker, mask_to_notes
+from lib.practice_history import PracticeHistory
 from lib.score_manager import ScoreManager
+from lib.session_stats import SessionRecorder, summarize_session
+from lib.song_timeline import SongTimeline
+from lib.status_board import status_board
 
-import logging
-
-# Create a score logger
-score_logger = logging.getLogger("score_logger")
-score_logger.setLevel(logging.DEBUG)
-score_logger.propagate = False
-file_handler = logging.FileHandler("score_log.txt")
-file_handler.setLevel(logging.DEBUG)
-formatter = logging.Formatter("%(asctime)s - %(name)s - %(levelname)s - %(message)s")
-file_handler.setFormatter(formatter)
-score_logger.addHandler(file_handler)
 score_logger.info("Score logger initialized.")
 
+LOOP_REGION_UNITS = ("percent", "seconds", "bars")
+
 
 def find_nearest(array, target):
     array = np.asarray(array)
@@ -44,6 +44,61 @@ def get_tempo(mid):
     return 500000  # If not found return default tempo
 
 
+def compile_song(song_path, set_loading=None):
+    """Tempo, ticks per beat, merged tracks and message times of a song, what the learning cache holds"""
+    set_loading = set_loading or (lambda loading: None)
+    # Load the midi file
+    mid = mido.MidiFile('Songs/' + song_path, clip=True)  # clip=True fixes some midi files
+
+    # Assign Tracks to different channels before merging to know the message origin
+    set_loading(2)  # 2 = Proces
+    if len(mid.tracks) == 2:  # check if the midi file has only 2 Tracks
+        offset = 1
+    else:
+        offset = 0
+    for k in range(len(mid.tracks)):
+        for msg in mid.tracks[k]:
+            if not msg.is_meta and msg.type in ['note_on', 'note_off']:
+                msg.channel = k + offset
+                if msg.type == 'note_off':
+                    msg.velocity = 0
+
+    # Merge tracks
+    set_loading(3)  # 3 = Merge
+    song_tracks = mido.merge_tracks(mid.tracks)
+    time_passed = 0
+    notes_time = []
+    for msg in mid:
+        if not msg.is_meta:
+            time_passed += msg.time
+            notes_time.append(time_passed)
+    return {'song_tempo': get_tempo(mid), 'ticks_per_beat': mid.ticks_per_beat, 'notes_time': notes_time,
+            'song_tracks': song_tracks}
+
+
+def save_song_cache(song_path, cache):
+    # written aside and renamed, a song being loaded never reads a partial cache
+    temp_path = 'Songs/cache/' + song_path + '.p.tmp'
+    with open(temp_path, 'wb') as handle:
+        pickle.dump(cache, handle, protocol=pickle.HIGHEST_PROTOCOL)
+    os.replace(temp_path, 'Songs/cache/' + song_path + '.p')
+
+
+def precompile_song(song_path):
+    """Write the learning cache of a new song, so its first load doesn't have to parse and merge it"""
+    if os.path.isfile('Songs/cache/' + song_path + '.p'):
+        return
+    try:
+        save_song_cache(song_path, compile_song(song_path))
+    except Exception as e:
+        logger.warning("Can't precompile " + song_path + ": " + str(e))
+
+
+# The learning loop wakes up this long before a message is due, software notes are then handed to the
+# note scheduler with their exact deadline so they are not delayed by LED updates of the loop
+SCHEDULE_AHEAD = 0.02
+
+
 class LearnMIDI:
     def __init__(self, usersettings, ledsettings, midiports, ledstrip):
         self.menu = None
@@ -54,7 +109,7 @@ class LearnMIDI:
         
         # Initialize the score manager
 
-        self.loading = 0
+        self._loading = 0
         self.practice = int(usersettings.get_setting_value("practice"))
         self.hands = int(usersettings.get_setting_value("hands"))
         self.mute_hand = int(usersettings.get_setting_value("mute_hand"))
@@ -70,11 +125,15 @@ class LearnMIDI:
         self.show_future_notes = int(usersettings.get_setting_value("show_future_notes"))
 
         self.notes_time = []
-        self.socket_send = []
+        # messages for the /learning websocket clients
+        self.socket_send = BroadcastHub()
 
         # Store software's notes that need to be played when user presses their key
         self.pending_software_notes = []
-        # Store the next note's timing information
+        # Plays software's notes at their deadlines from its own thread
+        self.note_scheduler = NoteScheduler(midiports)
+        self.latency_calibrator = LatencyCalibrator(midiports, self.note_scheduler)
+        # Store the next note's timing information (next_note_time is a perf_counter deadline)
         self.next_note_time = None
         self.next_note_delay = None
 
@@ -93,7 +152,17 @@ class LearnMIDI:
         self.song_tempo = 500000
         self.song_tracks = []
         self.ticks_per_beat = 240
+        # Timeline index of song_tracks, see build_timeline_index()
+        self.song_ticks = []
+        self.event_counts = [0]
+        self.timeline = SongTimeline(self.ticks_per_beat)
+        # Loop region resolved to song_tracks indexes, read live by the learning thread
+        self.loop_start_idx = 0
+        self.loop_end_idx = 0
+        self.position_idx = 0
+        self.loop_jump_requested = False
         self.is_loaded_midi = {}
+        self.loaded_song = None
         self.is_started_midi = False
         self.t = None
 
@@ -101,16 +170,27 @@ class LearnMIDI:
 
         self.mistakes_count = 0
         self.number_of_mistakes = int(usersettings.get_setting_value("number_of_mistakes"))
-        self.delay_countR = 0
-        self.delay_countL = 0
         self.awaiting_restart_loop = False
         self.score_manager = ScoreManager()
-        self.right_hand_timing = []
-        self.left_hand_timing = []
-        self.right_hand_mistakes = []
-        self.left_hand_mistakes = []
+        self.note_tracker = NoteTracker()
+        # LED changes of the learning thread are staged here and written once per step
+        self.led_batch = LedBatch(ledstrip)
+        # timing of the current pass, summarized off the learning thread when the session ends
+        self.session = SessionRecorder()
+        self.session_started_at = 0
+        self.practice_history = PracticeHistory()
 
 
+    @property
+    def loading(self):
+        return self._loading
+
+    @loading.setter
+    def loading(self, value):
+        # pushed to the web interface, which shows the loading progress
+        self._loading = value
+        status_board.update("learning", {"loading": value})
+
     def add_instance(self, menu):
         self.menu = menu
 
@@ -131,25 +211,118 @@ class LearnMIDI:
 
     def restart_learning(self):
         if self.is_started_midi:
-            self.is_started_midi = False
+            self.stop_learning()
             self.t.join()
             self.t = threading.Thread(target=self.learn_midi)
             self.t.start()
 
+    def stop_learning(self):
+        self.is_started_midi = False
+        self.note_scheduler.cancel()
+        self.midiports.wake_midi_waiters()
+
     def restart_loop(self):
         self.awaiting_restart_loop = True
+        self.note_scheduler.cancel()
+        self.midiports.wake_midi_waiters()
+
+    def wait_for_midi_input(self, timeout=1):
+        # Block until a key event arrives or learning is stopped/restarted.
+        # The timeout is only a safety net for code paths that change is_started_midi without waking us up.
+        with self.midiports.midi_queue_condition:
+            self.midiports.midi_queue_condition.wait_for(
+                lambda: self.midiports.midi_queue or not self.is_started_midi or self.awaiting_restart_loop
+                or self.loop_jump_requested,
+                timeout)
+
+    def build_timeline_index(self):
+        # Absolute tick of every message in song_tracks (sorted, so loop points can be found with bisect)
+        # and the number of non-meta messages before it (index into notes_time for the sheet music sync),
+        # plus the tempo and meter changes to place loop points given in seconds or bars
+        self.song_ticks = []
+        self.event_counts = [0]
+        timeline = SongTimeline(self.ticks_per_beat)
+        tick = 0
+        events = 0
+        for msg in self.song_tracks:
+            tick += msg.time
+            self.song_ticks.append(tick)
+            if not msg.is_meta:
+                events += 1
+            else:
+                timeline.add(tick, msg)
+            self.event_counts.append(events)
+        self.timeline = timeline
+        self.update_loop_region()
+
+    def resolve_loop_region(self):
+        # start_point and end_point are percentages of the song length in ticks
+        if not self.song_ticks:
+            return 0, 0
+        song_length = self.song_ticks[-1]
+        start_idx = bisect.bisect_left(self.song_ticks, song_length * self.start_point / 100)
+        start_idx = min(start_idx, len(self.song_ticks) - 1)
+        if self.end_point >= 100:
+            end_idx = len(self.song_ticks)
+        else:
+            # Releases at the end point still belong to the region (the last notes are awaited on them),
+            # notes starting exactly there belong to the next part of the song
+            end_tick = song_length * self.end_point / 100
+            end_idx = bisect.bisect_right(self.song_ticks, end_tick)
+            while end_idx > start_idx + 1 and self.song_ticks[end_idx - 1] == end_tick \
+                    and self.song_tracks[end_idx - 1].type == 'note_on' and self.song_tracks[end_idx - 1].velocity > 0:
+                end_idx -= 1
+        return start_idx, max(end_idx, start_idx + 1)
+
+    def update_loop_region(self):
+        # Takes effect immediately: the learning thread reads the region on every message
+        # and jumps to the new start if its position falls outside
+        self.loop_start_idx, self.loop_end_idx = self.resolve_loop_region()
+        if self.is_started_midi and not self.loop_start_idx <= self.position_idx < self.loop_end_idx:
+            self.loop_jump_requested = True
+            self.midiports.wake_midi_waiters()
+
+    def set_loop_region(self, start, end, unit="percent"):
+        # unit is "percent", "seconds" (at the song's own tempo changes) or "bars" (1-based, end bar included)
+        if unit not in LOOP_REGION_UNITS:
+            raise ValueError("Unknown loop region unit: " + str(unit))
+        if unit != "percent":
+            song_length = self.song_ticks[-1] if self.song_ticks else 0
+            if not song_length:
+                raise ValueError("No song loaded, the loop region can only be set in percent")
+            if unit == "seconds":
+                start = self.timeline.tick_at_second(start)
+                end = self.timeline.tick_at_second(end)
+            else:
+                start = self.timeline.tick_at_bar(start - 1)
+                end = self.timeline.tick_at_bar(end)
+            start = start * 100 / song_length
+            end = end * 100 / song_length
+
+        self.start_point = round(clamp(start, 0, 99), 3)
+        self.end_point = round(clamp(end, self.start_point + 0.001, 100), 3)
+        self.usersettings.change_setting_value("start_point", self.start_point)
+        self.usersettings.change_setting_value("end_point", self.end_point)
+        self.update_loop_region()
+
+    def get_position_percent(self):
+        # Current playing position as a percentage of the song length, same scale as start_point/end_point
+        if not self.song_ticks or not self.song_ticks[-1]:
+            return 0
+        position_idx = min(self.position_idx, len(self.song_ticks) - 1)
+        return self.song_ticks[position_idx] * 100 / self.song_ticks[-1]
 
     def change_start_point(self, value):
         self.start_point += 5 * value
         self.start_point = clamp(self.start_point, 0, self.end_point - 10)
         self.usersettings.change_setting_value("start_point", self.start_point)
-        self.restart_learning()
+        self.update_loop_region()
 
     def change_end_point(self, value):
         self.end_point += 5 * value
         self.end_point = clamp(self.end_point, self.start_point + 10, 100)
         self.usersettings.change_setting_value("end_point", self.end_point)
-        self.restart_learning()
+        self.update_loop_region()
 
     def change_set_tempo(self, value):
         self.set_tempo += 5 * value
@@ -192,6 +365,7 @@ class LearnMIDI:
                     self.ticks_per_beat = cache['ticks_per_beat']
                     self.song_tracks = cache['song_tracks']
                     self.notes_time = cache['notes_time']
+                    self.build_timeline_index()
                     self.loading = 4
                     return True
             else:
@@ -208,8 +382,9 @@ class LearnMIDI:
 
         self.is_loaded_midi.clear()
         self.is_loaded_midi[song_path] = True
+        self.loaded_song = song_path
         self.loading = 1  # 1 = Load..
-        self.is_started_midi = False  # Stop current learning song
+        self.stop_learning()  # Stop current learning song
         self.t = threading.currentThread()
 
         # Load song from cache
@@ -218,43 +393,16 @@ class LearnMIDI:
         logger.info("Cache not found")
 
         try:
-            # Load the midi file
-            mid = mido.MidiFile('Songs/' + song_path, clip=True)  # clip=True fixes some midi files
-
-            # Get tempo and Ticks per beat
-            self.song_tempo = get_tempo(mid)
-            self.ticks_per_beat = mid.ticks_per_beat
-
-            # Assign Tracks to different channels before merging to know the message origin
-            self.loading = 2  # 2 = Proces
-            if len(mid.tracks) == 2:  # check if the midi file has only 2 Tracks
-                offset = 1
-            else:
-                offset = 0
-            for k in range(len(mid.tracks)):
-                for msg in mid.tracks[k]:
-                    if not msg.is_meta and msg.type in ['note_on', 'note_off']:
-                        msg.channel = k + offset
-                        if msg.type == 'note_off':
-                            msg.velocity = 0
-
-            # Merge tracks
-            self.loading = 3  # 3 = Merge
-            self.song_tracks = mido.merge_tracks(mid.tracks)
-            time_passed = 0
-            self.notes_time.clear()
-            for msg in mid:
-                if not msg.is_meta:
-                    time_passed += msg.time
-                    self.notes_time.append(time_passed)
+            cache = compile_song(song_path, self.set_loading)
+            self.song_tempo = cache['song_tempo']
+            self.ticks_per_beat = cache['ticks_per_beat']
+            self.song_tracks = cache['song_tracks']
+            self.notes_time = cache['notes_time']
+            self.build_timeline_index()
 
             fastColorWipe(self.ledstrip.strip, True, self.ledsettings)
 
-            # Save to cache
-            with open('Songs/cache/' + song_path + '.p', 'wb') as handle:
-                cache = {'song_tempo': self.song_tempo, 'ticks_per_beat': self.ticks_per_beat,
-                         'notes_time': self.notes_time, 'song_tracks': self.song_tracks, }
-                pickle.dump(cache, handle, protocol=pickle.HIGHEST_PROTOCOL)
+            save_song_cache(song_path, cache)
 
             self.loading = 4  # 4 = Done
         except Exception as e:
@@ -262,8 +410,11 @@ class LearnMIDI:
             self.loading = 5  # 5 = Error!
             self.is_loaded_midi.clear()
 
+    def set_loading(self, loading):
+        self.loading = loading
+
     # predict future notes in MIDI messages
-    def predict_future_notes(self, starting_note, ending_note, notes_to_press):
+    def predict_future_notes(self, starting_note, ending_note):
 
         if self.show_future_notes != 1:
             return
@@ -280,8 +431,8 @@ class LearnMIDI:
                 return
 
             if msg.type == 'note_on' and msg.velocity > 0:
-                # make sure msg.note is not in notes_to_press list
-                if msg.note not in notes_to_press:
+                # make sure msg.note is not one of the notes to press
+                if not self.note_tracker.is_expected(msg.note):
                     predicted_future_notes.append(msg)
 
             current_note += 1
@@ -309,10 +460,9 @@ class LearnMIDI:
                         # blue = int(self.hand_colorList[self.hand_colorL][2] * brightness)
                         red, green, blue = [int(c * brightness) for c in self.hand_colorList[self.hand_colorL]]
 
-                    self.ledstrip.strip.setPixelColor(note_position, Color(red, green, blue))
-                    self.ledstrip.strip.show()
+                    self.led_batch.set(note_position, Color(red, green, blue))
 
-    def handle_wrong_notes(self, wrong_notes, hand_hint_notesL, hand_hint_notesR):
+    def handle_wrong_notes(self, wrong_notes):
 
         if self.show_wrong_notes != 1:
             return
@@ -320,30 +470,26 @@ class LearnMIDI:
         brightness = 0.05
         # loop through wrong_notes and light them up
         for msg in wrong_notes:
-            note = int(find_between(str(msg), "note=", " "))
-
-            if "note_off" in str(msg):
-                velocity = 0
-            else:
-                velocity = int(find_between(str(msg), "velocity=", " "))
-
-            note_position = get_note_position(note, self.ledstrip, self.ledsettings)
-            if velocity > 0:
-                self.ledstrip.strip.setPixelColor(note_position, Color(255, 0, 0))
+            note_position = get_note_position(msg.note, self.ledstrip, self.ledsettings)
+            if msg.type == 'note_on' and msg.velocity > 0:
+                self.led_batch.set(note_position, Color(255, 0, 0))
                 self.mistakes_count += 1
+                # hint notes of the hand whose LEDs are hidden, skipping those already held down
                 if self.is_led_activeL == 0:
-                    for expected_note in hand_hint_notesL:
-                        red, green, blue = [int(c * brightness) for c in self.hand_colorList[self.prev_hand_colorL]]
-                        self.ledstrip.strip.setPixelColor(expected_note, Color(red, green, blue))
+                    red, green, blue = [int(c * brightness) for c in self.hand_colorList[self.prev_hand_colorL]]
+                    for expected_note in mask_to_notes(self.note_tracker.missing(2)):
+                        expected_position = get_note_position(expected_note, self.ledstrip, self.ledsettings)
+                        self.led_batch.set(expected_position, Color(red, green, blue))
                 if self.is_led_activeR == 0:
-                    for expected_note in hand_hint_notesR:
-                        red, green, blue = [int(c * brightness) for c in self.hand_colorList[self.prev_hand_colorR]]
-                        self.ledstrip.strip.setPixelColor(expected_note, Color(red, green, blue))
+                    red, green, blue = [int(c * brightness) for c in self.hand_colorList[self.prev_hand_colorR]]
+                    for expected_note in mask_to_notes(self.note_tracker.missing(1)):
+                        expected_position = get_note_position(expected_note, self.ledstrip, self.ledsettings)
+                        self.led_batch.set(expected_position, Color(red, green, blue))
                  
                 # Wrong note penalty
                 self.score_manager.penalize_for_wrong_note()
-                score_logger.debug("wrong note - score:" +str(self.score_manager.get_score()))
-                score_logger.debug("panelty:" +str(self.score_manager.get_last_score_update()))
+                score_logger.debug("wrong note - score: %s, penalty: %s", self.score_manager.get_score(),
+                                   self.score_manager.get_last_score_update())
 
                 # # Send score update to frontend
                 self.socket_send.append(json.dumps({
@@ -354,14 +500,12 @@ class LearnMIDI:
                     "last_update": self.score_manager.get_last_score_update()
                 }))
             else:
-                self.ledstrip.strip.setPixelColor(note_position, Color(0, 0, 0))
+                self.led_batch.set(note_position, get_backlight_color(self.ledsettings))
 
         if self.mistakes_count > self.number_of_mistakes > 0:
             self.mistakes_count = 0
             self.restart_loop()
 
-        self.ledstrip.strip.show()
-
     def learn_midi(self):
         loops_count = 0
         # Preliminary checks
@@ -378,14 +522,8 @@ class LearnMIDI:
             self.is_started_midi = True  # Prevent restarting the Thread
             # Reset the score when starting a new learning session
             self.score_manager.reset()
-            self.right_hand_timing.clear()
-            self.left_hand_timing.clear()
-            self.right_hand_mistakes.clear()
-            self.left_hand_mistakes.clear()
-            midi_time = 0
-            self.delay_countR = 0
-            self.delay_countL = 0
-            score_logger.debug("score reset" +str(self.score_manager.get_score()))
+            self.session.reset()
+            score_logger.debug("score reset %s", self.score_manager.get_score())
                   
             # Send score update to frontend
             self.socket_send.append(json.dumps({
@@ -400,22 +538,18 @@ class LearnMIDI:
             return
 
         self.t = threading.currentThread()
-        hand_hint_notesL = []
-        hand_hint_notesR = []
 
+        self.loop_jump_requested = False
+        self.update_loop_region()
+        # Lead-in before the first pass only, repeating the loop region wraps around without a pause
+        time.sleep(1)
+        first_pass = True
         keep_looping = True
         while keep_looping:
-            time.sleep(1)
             self.score_manager.reset()
-            self.right_hand_timing.clear()
-            self.left_hand_timing.clear()
-            self.right_hand_mistakes.clear()
-            self.left_hand_mistakes.clear()
-            self.delay_countR = 0
-            self.delay_countL = 0
-            midi_time = 0
-            score_logger.debug("midi_time  - reset" +str(midi_time))
-            score_logger.debug("score reset keep looping" +str(self.score_manager.get_score()))
+            self.session.reset()
+            self.session_started_at = time.time()
+            score_logger.debug("score reset keep looping %s", self.score_manager.get_score())
             self.socket_send.append(json.dumps({
                 "type": "score_update",
                 "score": self.score_manager.get_score(),
@@ -424,20 +558,29 @@ class LearnMIDI:
                 "last_update": 0
             }))
             try:
-                fastColorWipe(self.ledstrip.strip, True, self.ledsettings)
-                time_prev = time.time()
-                notes_to_press = []
-
-                start_idx = int(self.start_point * len(self.song_tracks) / 100)
-                end_idx = int(self.end_point * len(self.song_tracks) / 100)
+                if first_pass:
+                    fastColorWipe(self.ledstrip.strip, True, self.ledsettings)
+                    self.led_batch.reset()
+                    first_pass = False
+                else:
+                    # only turn off what the previous pass left lit
+                    self.led_batch.clear_lit(get_backlight_color(self.ledsettings))
+                # release software's notes still sounding from the previous pass
+                self.note_scheduler.cancel()
+                self.pending_software_notes.clear()
+                # absolute time (perf_counter) at which the current message is due
+                msg_deadline = time.perf_counter()
+                self.note_tracker.clear()
 
                 # self.current_idx does not count meta messages (used for sheet music sync in web interface)
                 # absolute_idx counts all messages (used for predicting messages)
+                # The loop region is re-read on every message so it can be changed while learning
+                absolute_idx = self.loop_start_idx
+                self.current_idx = self.event_counts[absolute_idx]
 
-                self.current_idx = start_idx
-                absolute_idx = start_idx
-
-                for msg in self.song_tracks[start_idx:end_idx]:
+                while absolute_idx < self.loop_end_idx:
+                    msg = self.song_tracks[absolute_idx]
+                    self.position_idx = absolute_idx
                     self.midiports.last_activity = time.time()
                     # Exit thread if learning is stopped
                     if not self.is_started_midi:
@@ -445,6 +588,7 @@ class LearnMIDI:
 
                     # Get time delay
                     tDelay = mido.tick2second(msg.time, self.ticks_per_beat, self.song_tempo * 100 / self.set_tempo)
+                    msg_deadline += tDelay
 
                     # Check notes to press
                     if not msg.is_meta:
@@ -456,74 +600,63 @@ class LearnMIDI:
                         self.current_idx += 1
 
                         if tDelay > 0 and (
-                                msg.type == 'note_on' or msg.type == 'note_off') and notes_to_press and self.practice == 0:
-                            notes_pressed = []
+                                msg.type == 'note_on' or msg.type == 'note_off') and self.note_tracker.has_expected() \
+                                and self.practice == 0:
                             wrong_notes = []
-                            self.predict_future_notes(absolute_idx, end_idx, notes_to_press)
+                            self.predict_future_notes(absolute_idx, self.loop_end_idx)
+                            # show the hints of this step together with the predicted notes
+                            self.led_batch.commit()
 
                             # Store timing information for next note
-                            self.next_note_time = time.time() + tDelay
+                            self.next_note_time = msg_deadline
                             self.next_note_delay = tDelay
-                            midi_time += tDelay
+                            # bar (0-based) of the notes expected in this step, they started at the previous message
+                            step_bar = self.timeline.bar_at_tick(self.song_ticks[max(absolute_idx - 1, 0)])
+                            # key events are timestamped when received, minus the calibrated latency of the input
+                            input_latency = self.midiports.get_input_latency()
 
-                            while not set(notes_to_press).issubset(notes_pressed) and self.is_started_midi:
-                                if self.awaiting_restart_loop:
+                            while not self.note_tracker.is_complete() and self.is_started_midi:
+                                if self.awaiting_restart_loop or self.loop_jump_requested:
                                     break
+                                self.wait_for_midi_input()
+                                if not self.midiports.midi_queue:
+                                    continue
                                 while self.midiports.midi_queue:
                                     msg_in, msg_timestamp = self.midiports.midi_queue.popleft()
                                     if msg_in.type not in ("note_on", "note_off"):
                                         continue
 
-                                    note = int(find_between(str(msg_in), "note=", " "))
+                                    note = msg_in.note
+                                    velocity = msg_in.velocity if msg_in.type == "note_on" else 0
 
-                                    if "note_off" in str(msg_in):
-                                        velocity = 0
-                                    else:
-                                        velocity = int(find_between(str(msg_in), "velocity=", " "))
-
-                                    # check if note is NOT in the list of notes to press
-                                    if note not in notes_to_press:
+                                    # check if note is NOT one of the notes to press
+                                    if not self.note_tracker.is_expected(note):
                                         wrong_notes.append(msg_in)
                                         # Clear pending software notes if wrong key is pressed
                                         if velocity > 0:
-                                            if msg.channel == 1:
-                                                self.right_hand_mistakes.append(midi_time)
-                                                score_logger.debug("right hand mistakes: %s", self.right_hand_mistakes)
-                                            if msg.channel == 2:
-                                                self.left_hand_mistakes.append(midi_time)
-                                                score_logger.debug("left hand mistakes: %s", self.left_hand_mistakes)
+                                            self.note_tracker.press(note, msg.channel)
+                                            self.session.add_mistake(msg.channel, step_bar)
+                                            score_logger.debug("mistake - channel %s, bar %s", msg.channel, step_bar + 1)
                                             self.pending_software_notes.clear()
+                                            self.note_scheduler.cancel()
+                                        else:
+                                            self.note_tracker.release(note)
                                         continue
-                                    
-                                    # check if note is in the list of notes to press
+
+                                    # note is one of the notes to press
                                     if velocity > 0:
-                                        if note not in notes_pressed:
-                                            notes_pressed.append(note)
- 
+                                        if self.note_tracker.press(note, msg.channel):
                                             # Calculate delay from ideal hit time
-                                            current_time = time.time()
                                             if self.next_note_time:
                                                 # Get delay in seconds
-                                                delay = current_time - self.next_note_time
+                                                delay = msg_timestamp - input_latency - self.next_note_time
                                                 
                                                 # Add score for correct note
                                                 self.score_manager.add_score_for_correct_note(delay)
 
-                                                note_timing = (midi_time, delay)
-                                               
-                                                score_logger.debug("midi_time" +str(midi_time))
-                                                if msg.channel == 1: 
-                                                    score_logger.debug("channel 1")
-                                                    score_logger.debug("right hand timing note timimg: %s", self.right_hand_timing)
-                                                    self.right_hand_timing.append(note_timing)
-                                                    if delay >= self.score_manager.max_delay:
-                                                        self.delay_countR += 1
-                                                if msg.channel == 2:
-                                                    score_logger.debug("channel- 2")
-                                                    score_logger.debug("left hand timing note timimg: %s", self.left_hand_timing)
-                                                    self.left_hand_timing.append(note_timing)
-                                                    if delay >= self.score_manager.max_delay:
-                                                        self.delay_countR += 1
+                                                self.session.add_note(msg.channel, delay, step_bar)
+                                                score_logger.debug("note timing - channel %s, bar %s, delay %.3f",
+                                                                   msg.channel, step_bar + 1, delay)
 
                                                 # send score update to frontend
                                                 self.socket_send.append(json.dumps({
@@ -537,36 +670,33 @@ class LearnMIDI:
 
 
                                     else:
-                                        try:
-                                            notes_pressed.remove(note)
-                                        except ValueError:
-                                            pass  # do nothing
+                                        self.note_tracker.release(note)
 
-                                self.handle_wrong_notes(wrong_notes, hand_hint_notesL, hand_hint_notesR)
+                                self.handle_wrong_notes(wrong_notes)
                                 wrong_notes.clear()
 
                                 # light up predicted future notes again in case the future note was pressed
                                 # and color was overwritten
-                                self.predict_future_notes(absolute_idx, end_idx, notes_to_press)
-                            
-                            hand_hint_notesL = []
-                            hand_hint_notesR = []
+                                self.predict_future_notes(absolute_idx, self.loop_end_idx)
+                                self.led_batch.commit()
+
                             # Play any pending software notes only after all required notes have been pressed
-                            if set(notes_to_press).issubset(notes_pressed) and self.pending_software_notes:
-                                for software_note in self.pending_software_notes:
-                                    self.midiports.playport.send(software_note)
+                            if self.note_tracker.is_complete() and self.pending_software_notes:
+                                self.note_scheduler.send_now(self.pending_software_notes)
                                 self.pending_software_notes.clear()
 
-                            # Turn off the pressed LEDs
-                            fastColorWipe(self.ledstrip.strip, True,
-                                          self.ledsettings)  # ideally clear only pressed notes!
-                            notes_to_press.clear()
+                            # the song continues from the moment the user finished the step
+                            msg_deadline = max(msg_deadline, time.perf_counter())
 
-                    # Realize time delay, consider also the time lost during computation
-                    delay = max(0, tDelay - (
-                            time.time() - time_prev) - 0.003)  # 0.003 sec calibratable to account for extra time loss
-                    time.sleep(delay)
-                    time_prev = time.time()
+                            # Turn off the LEDs lit for this step, they are written together with the next hints
+                            self.led_batch.clear_lit(get_backlight_color(self.ledsettings))
+                            self.note_tracker.clear()
+
+                    # Realize time delay against the absolute deadline, so time lost during computation does not add up
+                    delay = msg_deadline - SCHEDULE_AHEAD - time.perf_counter()
+                    if delay > 0:
+                        self.led_batch.commit()
+                        time.sleep(delay)
 
                     # Light-up LEDs with the notes to press
                     if not msg.is_meta:
@@ -581,30 +711,13 @@ class LearnMIDI:
                             red, green, blue = [0, 0, 0]
                             if msg.channel == 1:
                                 red, green, blue = [int(c * brightness) for c in self.hand_colorList[self.hand_colorR]]
-                                if self.is_led_activeR == 0:
-                                    if brightness > 0:
-                                        hand_hint_notesR.append(note_position)
-                                    else:
-                                        try:
-                                            hand_hint_notesR.remove(note_position)
-                                        except ValueError:
-                                            pass  # do nothing
                             if msg.channel == 2:
                                 red, green, blue = [int(c * brightness) for c in self.hand_colorList[self.hand_colorL]]
-                                if self.is_led_activeL == 0:
-                                    if brightness > 0:
-                                        hand_hint_notesL.append(note_position)
-                                    else:
-                                        try:
-                                            hand_hint_notesL.remove(note_position)
-                                        except ValueError:
-                                            pass  # do nothing
-                            self.ledstrip.strip.setPixelColor(note_position, Color(red, green, blue))
-                            self.ledstrip.strip.show()
+                            self.led_batch.set(note_position, Color(red, green, blue))
                         # Save notes to press
                         if msg.type == 'note_on' and msg.velocity > 0 and (
                                 msg.channel == self.hands or self.hands == 0):
-                            notes_to_press.append(msg.note)
+                            self.note_tracker.expect(msg.note, msg.channel)
 
                         # Handle software's notes
                         if ((
@@ -615,78 +728,97 @@ class LearnMIDI:
                                 # Right hand notes
                                 self.practice == 2):  # Listen mode
                             if self.practice == 2:
-                                # In Listen mode, play immediately
-                                self.midiports.playport.send(msg)
+                                # In Listen mode, play at the note's time
+                                self.note_scheduler.schedule(msg, msg_deadline)
                             else:
                                 # Check if there are any user notes to press at this moment
-                                if notes_to_press:
+                                if self.note_tracker.has_expected():
                                     # If there are user notes to press, store this software note to play when user presses their key
                                     self.pending_software_notes.append(msg)
                                 else:
-                                    # If no user notes to press, play the software note immediately
-                                    self.midiports.playport.send(msg)
+                                    # If no user notes to press, play the software note at its time
+                                    self.note_scheduler.schedule(msg, msg_deadline)
 
                     absolute_idx += 1
 
                     # If we have pending software notes but no user notes to press,
                     # and we've reached the next note's time, play and clear the pending notes
-                    if (self.pending_software_notes and not notes_to_press and
-                            self.next_note_time and time.time() >= self.next_note_time):
-                        for software_note in self.pending_software_notes:
-                            self.midiports.playport.send(software_note)
+                    if (self.pending_software_notes and not self.note_tracker.has_expected() and
+                            self.next_note_time and time.perf_counter() >= self.next_note_time):
+                        self.note_scheduler.send_now(self.pending_software_notes)
                         self.pending_software_notes.clear()
                         self.next_note_time = None
                         self.next_note_delay = None
 
-                    if self.awaiting_restart_loop:
+                    if self.awaiting_restart_loop or self.loop_jump_requested:
                         self.awaiting_restart_loop = False
                         break
 
+                self.led_batch.commit()
 
             except Exception as e:
                 logger.warning(e)
                 self.is_started_midi = False
 
-            if not self.is_loop_active or self.is_started_midi is False:
+            # the loop region was moved away from the current position, continue from its start
+            region_jump = self.loop_jump_requested
+            self.loop_jump_requested = False
+
+            if (not self.is_loop_active and not region_jump) or self.is_started_midi is False:
                 keep_looping = False
 
-            # Send session summary data
+            # Send session summary data, computed in its own thread so the learning thread can exit right away
             if not keep_looping:
-                try:
-                    # Get actual RGB colors
-                    color_r_rgb = self.hand_colorList[self.hand_colorR]
-                    color_l_rgb = self.hand_colorList[self.hand_colorL]
-
-                    summary_data = {
-                        "type": "session_summary",
-                        # Basic stats
-                        "delay_r": self.delay_countR,
-                        "delay_l": self.delay_countL,
-                        "mistakes_r_count": len(self.right_hand_mistakes),
-                        "mistakes_l_count": len(self.left_hand_mistakes),
-                        # Data for graph
-                        "timing_r": self.right_hand_timing,
-                        "timing_l": self.left_hand_timing,
-                        "mistakes_r_times": self.right_hand_mistakes,
-                        "mistakes_l_times": self.left_hand_mistakes,
-                        "max_delay": self.score_manager.max_delay,
-                        "color_r": f'rgb({color_r_rgb[0]}, {color_r_rgb[1]}, {color_r_rgb[2]})',
-                        "color_l": f'rgb({color_l_rgb[0]}, {color_l_rgb[1]}, {color_l_rgb[2]})'
-                    }
-                    self.socket_send.append(json.dumps(summary_data))
-                    score_logger.info(f"Sent session summary (length: {len(json.dumps(summary_data))})") # Log length for debugging if needed
-                except Exception as e:
-                    score_logger.error(f"Error preparing/sending session summary: {e}")
-
-    def convert_midi_to_abc(self, midi_file):
-        if not os.path.isfile('Songs/' + midi_file.replace(".mid", ".abc")):
-            # subprocess.call(['midi2abc',  'Songs/' + midi_file, '-o', 'Songs/' + midi_file.replace(".mid", ".abc")])
-            try:
-                subprocess.check_output(
-                    ['midi2abc', 'Songs/' + midi_file, '-o', 'Songs/' + midi_file.replace(".mid", ".abc")])
-            except Exception as e:
-                # check if e contains the string 'No such file or directory'
-                if 'No such file or directory' in str(e):
-                    logger.info("midi2abc not found")
-        else:
-            logger.info("file already converted")
+                session_info = {
+                    "song": self.loaded_song,
+                    "started_at": self.session_started_at,
+                    "duration": round(time.time() - self.session_started_at, 1),
+                    "score": self.score_manager.get_score(),
+                    "max_combo": self.score_manager.get_max_combo(),
+                    "tempo": self.set_tempo,
+                    "hands": self.hands,
+                    "practice": self.practice,
+                    "start_point": self.start_point,
+                    "end_point": self.end_point,
+                }
+                threading.Thread(target=self.send_session_summary, args=(self.session.snapshot(), session_info),
+                                 daemon=True).start()
+
+    def send_session_summary(self, snapshot, session_info):
+        try:
+            # Get actual RGB colors
+            color_r_rgb = self.hand_colorList[self.hand_colorR]
+            color_l_rgb = self.hand_colorList[self.hand_colorL]
+
+            summary_data = summarize_session(snapshot, self.score_manager.max_delay)
+            summary_data.update({
+                "type": "session_summary",
+                # Basic stats
+                "delay_r": summary_data["r"]["late_notes"],
+                "delay_l": summary_data["l"]["late_notes"],
+                "mistakes_r_count": summary_data["r"]["mistakes"],
+                "mistakes_l_count": summary_data["l"]["mistakes"],
+                "color_r": f'rgb({color_r_rgb[0]}, {color_r_rgb[1]}, {color_r_rgb[2]})',
+                "color_l": f'rgb({color_l_rgb[0]}, {color_l_rgb[1]}, {color_l_rgb[2]})'
+            })
+            message = json.dumps(summary_data)
+            self.socket_send.append(message)
+            score_logger.info("Sent session summary (length: %d)", len(message))
+        except Exception as e:
+            score_logger.error("Error preparing/sending session summary: %s", e)
+            return
+
+        # Sessions without a single played note are not worth keeping
+        notes = summary_data["r"]["notes"] + summary_data["l"]["notes"]
+        mistakes = summary_data["r"]["mistakes"] + summary_data["l"]["mistakes"]
+        if notes + mistakes == 0 or session_info["song"] is None:
+            return
+        mean_delay = (summary_data["r"]["mean_delay"] * summary_data["r"]["notes"] +
+                      summary_data["l"]["mean_delay"] * summary_data["l"]["notes"]) / max(notes, 1)
+        session_info.update({
+            "notes": notes,
+            "mistakes": mistakes,
+            "mean_delay": round(mean_delay, 3),
+            "summary": {key: summary_data[key] for key in ("first_bar", "bar_count", "histogram_edges", "r", "l")},
+        })
+        self.practice_history.record_session(session_info)
@@ -0,0 +1,182 @@
+import asyncio
+import struct
+import time
+
+import numpy as np
+
+from lib.log_setup import logger
+
+# Binary frames sent to the LED emulator:
+#   keyframe: b"K", uint16 led count, then 3 bytes (r, g, b) per led
+#   delta:    b"D", then runs of uint16 first led, uint16 run length, 3 bytes per led of the run
+# All integers are little endian.
+KEYFRAME = b"K"
+DELTA = b"D"
+RUN_HEADER = struct.Struct("<HH")
+
+
+def pixels_to_array(pixels):
+    """Strip pixels (24-bit color values, white is ignored) as an (n, 3) uint8 array"""
+    colors = np.fromiter(pixels, dtype=np.uint32, count=len(pixels))
+    rgb = np.empty((len(colors), 3), dtype=np.uint8)
+    rgb[:, 0] = (colors >> 16) & 0xFF
+    rgb[:, 1] = (colors >> 8) & 0xFF
+    rgb[:, 2] = colors & 0xFF
+    return rgb
+
+
+def encode_keyframe(rgb):
+    return KEYFRAME + struct.pack("<H", len(rgb)) + rgb.tobytes()
+
+
+def encode_delta(previous, rgb):
+    """Delta frame with the runs of leds that differ from previous, None when nothing changed"""
+    changed = np.flatnonzero((previous != rgb).any(axis=1))
+    if not len(changed):
+        return None
+    # a gap of one unchanged led is cheaper to resend (3 bytes) than a new run header (4 bytes)
+    breaks = np.flatnonzero(np.diff(changed) > 2) + 1
+    parts = [DELTA]
+    for run in np.split(changed, breaks):
+        start, end = int(run[0]), int(run[-1]) + 1
+        parts.append(RUN_HEADER.pack(start, end - start))
+        parts.append(rgb[start:end].tobytes())
+    return b"".join(parts)
+
+
+class LedFrameEncoder:
+    """Turns successive strip states into keyframes and delta frames"""
+
+    def __init__(self):
+        self.previous = None
+
+    def reset(self):
+        """Next frame will be a keyframe"""
+        self.previous = None
+
+    def encode(self, pixels):
+        """Encoded frame for the current pixels, None when they did not change since the last frame"""
+        return self.encode_array(pixels_to_array(pixels))
+
+    def encode_array(self, rgb):
+        if self.previous is None or len(self.previous) != len(rgb):
+            frame = encode_keyframe(rgb)
+        else:
+            frame = encode_delta(self.previous, rgb)
+            if frame is not None and len(frame) > 3 + rgb.size:
+                frame = encode_keyframe(rgb)
+        self.previous = rgb
+        return frame
+
+
+class LedFrameClient:
+    def __init__(self, websocket, fps):
+        self.websocket = websocket
+        self.fps = fps
+        self.need_keyframe = True
+        self.sending = False
+
+
+class LedFrameStream:
+    """Clients sharing a frame rate, they all receive the same encoded delta chain"""
+
+    def __init__(self, fps):
+        self.fps = fps
+        self.encoder = LedFrameEncoder()
+        self.clients = set()
+        self.next_due = time.perf_counter()
+        self.keyframe = None
+
+
+class LedFrameProducer:
+    """Single task feeding every LED emulator client.
+
+    Each tick the strip is read once and every frame is encoded once per frame rate, the same bytes
+    go to all clients of that rate. A client still busy with the previous frame skips the new one
+    and gets a keyframe when it is ready again, so slow connections never queue frames.
+    """
+
+    def __init__(self, get_pixels, is_paused=lambda: False):
+        self.get_pixels = get_pixels
+        self.is_paused = is_paused
+        self.streams = {}
+        self.task = None
+
+    def add_client(self, websocket, fps):
+        """Must be called from the event loop, starts the producer task for the first client"""
+        client = LedFrameClient(websocket, fps)
+        self.stream(fps).clients.add(client)
+        if self.task is None or self.task.done():
+            self.task = asyncio.ensure_future(self.run())
+        return client
+
+    def remove_client(self, client):
+        stream = self.streams.get(client.fps)
+        if stream is not None:
+            stream.clients.discard(client)
+            if not stream.clients:
+                del self.streams[client.fps]
+
+    def set_fps(self, client, fps):
+        self.remove_client(client)
+        client.fps = fps
+        client.need_keyframe = True
+        self.stream(fps).clients.add(client)
+
+    @staticmethod
+    def request_keyframe(client):
+        client.need_keyframe = True
+
+    def stream(self, fps):
+        if fps not in self.streams:
+            self.streams[fps] = LedFrameStream(fps)
+        return self.streams[fps]
+
+    async def run(self):
+        while self.streams:
+            now = time.perf_counter()
+            due = [stream for stream in self.streams.values() if stream.next_due <= now]
+            if due and not self.is_paused():
+                try:
+                    rgb = pixels_to_array(self.get_pixels())
+                    for stream in due:
+                        self.publish(stream, rgb)
+                except Exception as e:
+                    logger.warning(f"LED emulator error: {str(e)}")
+            for stream in due:
+                stream.next_due += 1 / stream.fps
+                if stream.next_due < now:
+                    stream.next_due = now + 1 / stream.fps
+            if self.streams:
+                await asyncio.sleep(max(0.0, min(stream.next_due for stream in self.streams.values())
+                                        - time.perf_counter()))
+
+    def publish(self, stream, rgb):
+        delta = stream.encoder.encode_array(rgb)
+        stream.keyframe = None
+        for client in list(stream.clients):
+            if client.sending:
+                # the frame is dropped for this client, its delta chain is broken
+                if delta is not None:
+                    client.need_keyframe = True
+            elif client.need_keyframe:
+                if stream.keyframe is None:
+                    stream.keyframe = encode_keyframe(rgb)
+                client.need_keyframe = False
+                self.deliver(client, stream.keyframe)
+            elif delta is not None:
+                self.deliver(client, delta)
+
+    def deliver(self, client, frame):
+        client.sending = True
+        asyncio.ensure_future(self.send(client, frame))
+
+    @staticmethod
+    async def send(client, frame):
+        try:
+            await client.websocket.send(frame)
+        except Exception:
+            # closed connections are removed by their handler
+            client.need_keyframe = True
+        finally:
+            client.sending = False
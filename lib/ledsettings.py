@@ -4,6 +4,7 @@ from xml.dom import minidom
 
 from lib.functions import fastColorWipe, find_between, clamp
 from lib.rpi_drivers import Color
+from lib.settings_bus import settings_bus, COLOR_MODE
 
 
 class LedSettings:
@@ -24,7 +25,8 @@ class LedSettings:
         self.mode = usersettings.get_setting_value("mode")
         self.fadingspeed = int(usersettings.get_setting_value("fadingspeed"))
         self.fadepedal_notedrop = int(usersettings.get_setting_value("fadepedal_notedrop"))
-        self.color_mode = usersettings.get_setting_value("color_mode")
+        # no event for the initial value, whoever creates LedSettings builds its ColorMode
+        self._color_mode = usersettings.get_setting_value("color_mode")
         self.rainbow_offset = int(usersettings.get_setting_value("rainbow_offset"))
         self.rainbow_scale = int(usersettings.get_setting_value("rainbow_scale"))
         self.rainbow_timeshift = int(usersettings.get_setting_value("rainbow_timeshift"))
@@ -96,11 +98,19 @@ class LedSettings:
 
         self.sequence_number = 0
 
-        self.incoming_setting_change = False
-
         # if self.mode == "Disabled" and self.color_mode != "disabled":
         #    usersettings.change_setting_value("color_mode", "disabled")
 
+    @property
+    def color_mode(self):
+        return self._color_mode
+
+    @color_mode.setter
+    def color_mode(self, value):
+        if value != self._color_mode:
+            self._color_mode = value
+            settings_bus.publish(COLOR_MODE)
+
     def add_instance(self, menu, ledstrip):
         self.menu = menu
         self.ledstrip = ledstrip
@@ -141,7 +151,7 @@ class LedSettings:
 
         self.menu.update_multicolor(self.multicolor)
         self.menu.show()
-        self.incoming_setting_change = True
+        settings_bus.publish(COLOR_MODE)
 
     def deletecolor(self, key):
         del self.multicolor[int(key) - 1]
@@ -153,7 +163,7 @@ class LedSettings:
         self.menu.update_multicolor(self.multicolor)
         self.menu.go_back()
         self.menu.show()
-        self.incoming_setting_change = True
+        settings_bus.publish(COLOR_MODE)
 
     def change_multicolor(self, choice, location, value):
         self.sequence_active = False
@@ -169,7 +179,7 @@ class LedSettings:
         self.multicolor[int(location)][choice] = clamp(self.multicolor[int(location)][choice], 0, 255)
 
         self.usersettings.change_setting_value("multicolor", self.multicolor)
-        self.incoming_setting_change = True
+        settings_bus.publish(COLOR_MODE)
 
     def change_multicolor_range(self, choice, location, value):
         location = location.replace('Key_range', '')
@@ -181,7 +191,7 @@ class LedSettings:
 
         self.multicolor_range[int(location)][choice] += int(value)
         self.usersettings.change_setting_value("multicolor_range", self.multicolor_range)
-        self.incoming_setting_change = True
+        settings_bus.publish(COLOR_MODE)
 
     def get_multicolors(self, number):
         number = int(number) - 1
@@ -242,7 +252,7 @@ class LedSettings:
                 self.blue += int(value)
                 self.blue = clamp(self.blue, 0, 255)
                 self.usersettings.change_setting_value("blue", self.blue)
-        self.incoming_setting_change = True
+        settings_bus.publish(COLOR_MODE)
 
     def change_color_name(self, color):
         self.sequence_active = False
@@ -532,7 +542,7 @@ class LedSettings:
                         multicolor_range_number += 1
                     except:
                         break
-            self.incoming_setting_change = True
+            settings_bus.publish(COLOR_MODE)
         except:
             return False
 
@@ -36,7 +36,9 @@ class LedStrip:
         self.LED_INVERT = False  # True to invert the signal (when using NPN transistor level shift)
         self.LED_CHANNEL = 0  # set to '1' for GPIOs 13, 19, 41, 45 or 53
 
+        # LED emulator frame rate, clients can ask for any rate up to WEBEMU_MAX_FPS
         self.WEBEMU_FPS = 10
+        self.WEBEMU_MAX_FPS = 60
 
         self.init_strip()
 
@@ -132,3 +134,48 @@ class LedStrip:
 
                 if self.keylist_status[int(note) - 2] == 0:
                     self.strip.setPixelColor(int(note) - 1, color)
+
+
+class LedBatch:
+    """Stages pixel changes and writes them with a single show(), skipping pixels that already have the color.
+
+    Positions set through the batch are remembered as lit, so they can be cleared without wiping the whole strip.
+    """
+
+    def __init__(self, ledstrip):
+        self.ledstrip = ledstrip
+        self.staged = {}
+        self.lit = set()
+
+    def set(self, position, color):
+        self.staged[position] = color
+        self.lit.add(position)
+
+    def clear_lit(self, color):
+        """Stage `color` (usually the backlight) for every position lit since the last clear"""
+        for position in self.lit:
+            self.staged[position] = color
+        self.lit.clear()
+
+    def reset(self):
+        """Drop staged changes, e.g. after the strip has been wiped by other means"""
+        self.staged.clear()
+        self.lit.clear()
+
+    def commit(self):
+        if not self.staged:
+            return False
+
+        strip = self.ledstrip.strip
+        pixels = strip.getPixels()
+        led_count = strip.numPixels()
+        changed = False
+        for position, color in self.staged.items():
+            if 0 <= position < led_count and pixels[position] != color:
+                strip.setPixelColor(position, color)
+                changed = True
+        self.staged.clear()
+
+        if changed:
+            strip.show()
+        return changed
@@ -1,31 +1,144 @@
+import atexit
+import collections
 import logging
-from logging.handlers import RotatingFileHandler
+import queue
+import threading
+from logging.handlers import QueueHandler, QueueListener, RotatingFileHandler
 import sys
 
+
+class LazyQueueHandler(QueueHandler):
+    # The default QueueHandler formats every record in the calling thread.
+    # Records whose arguments are plain immutable values are passed as they are and formatted
+    # by the listener thread, anything else is formatted now because it could change before that.
+    LAZY_TYPES = (str, int, float, bool, type(None))
+
+    def prepare(self, record):
+        if record.exc_info or record.stack_info:
+            return super().prepare(record)
+        if record.args and not (isinstance(record.args, tuple) and
+                                all(isinstance(arg, self.LAZY_TYPES) for arg in record.args)):
+            record.msg = record.getMessage()
+            record.args = None
+        return record
+
+
+class RingBufferHandler(logging.Handler):
+    """Keeps the last `capacity` formatted lines in memory for the web interface.
+
+    Every line gets an increasing sequence number used as pagination/streaming cursor.
+    """
+
+    def __init__(self, capacity=2000):
+        super().__init__()
+        self.lines = collections.deque(maxlen=capacity)
+        self.last_seq = 0
+        self.new_lines = threading.Condition()
+
+    def append_line(self, line):
+        with self.new_lines:
+            self.last_seq += 1
+            self.lines.append((self.last_seq, line))
+            self.new_lines.notify_all()
+
+    def emit(self, record):
+        try:
+            for line in self.format(record).splitlines():
+                self.append_line(line)
+        except Exception:
+            self.handleError(record)
+
+    def preload(self, file_path):
+        # continue where the previous run left off, the log file is read once at startup
+        try:
+            with open(file_path, errors='replace') as log_file:
+                for line in collections.deque(log_file, maxlen=self.lines.maxlen):
+                    self.append_line(line.rstrip('\n'))
+        except OSError:
+            pass
+
+    def get_lines(self, after=None, before=None, limit=100):
+        """Up to `limit` (seq, line) pairs: the oldest ones after `after`, the newest ones before `before`,
+        or the newest ones when no cursor is given"""
+        with self.new_lines:
+            lines = list(self.lines)
+        if after is not None:
+            return [item for item in lines if item[0] > after][:limit]
+        if before is not None:
+            lines = [item for item in lines if item[0] < before]
+        return lines[-limit:] if limit > 0 else []
+
+    def wait_for_lines(self, after, timeout):
+        with self.new_lines:
+            self.new_lines.wait_for(lambda: self.last_seq > after, timeout)
+        return self.get_lines(after=after, limit=self.lines.maxlen)
+
+
 # Create a custom logger
 logger = logging.getLogger("my_app")
 
 # Set the level of this logger.
 logger.setLevel(logging.DEBUG)
 
+# Logger for learning mode scores and timings, written to its own file
+score_logger = logging.getLogger("score_logger")
+score_logger.setLevel(logging.DEBUG)
+score_logger.propagate = False
+
 # Create handlers
 console_handler = logging.StreamHandler()
-file_handler = RotatingFileHandler('/home/Piano-LED-Visualizer/visualizer.log', maxBytes=500000, backupCount=10)
+LOG_FILE = '/home/Piano-LED-Visualizer/visualizer.log'
+file_handler = RotatingFileHandler(LOG_FILE, maxBytes=500000, backupCount=10)
+memory_handler = RingBufferHandler()
+memory_handler.preload(LOG_FILE)
+score_file_handler = logging.FileHandler("score_log.txt", delay=True)
 
 
 # Set the level for handlers
 console_handler.setLevel(logging.DEBUG)
 file_handler.setLevel(logging.DEBUG)
+memory_handler.setLevel(logging.DEBUG)
+score_file_handler.setLevel(logging.DEBUG)
 
 # Create formatters and add it to handlers
 formatter = logging.Formatter('[%(asctime)s] %(levelname)s - %(message)s',
                               datefmt='%Y-%m-%d %H:%M:%S')
 console_handler.setFormatter(formatter)
 file_handler.setFormatter(formatter)
+memory_handler.setFormatter(formatter)
+score_file_handler.setFormatter(logging.Formatter("%(asctime)s - %(name)s - %(levelname)s - %(message)s"))
+
+# Both loggers only put records on a queue, the handlers run in the listener thread
+# so logging never blocks on console or SD card writes
+console_handler.addFilter(lambda record: record.name != score_logger.name)
+file_handler.addFilter(lambda record: record.name != score_logger.name)
+memory_handler.addFilter(lambda record: record.name != score_logger.name)
+score_file_handler.addFilter(lambda record: record.name == score_logger.name)
+
+log_queue = queue.SimpleQueue()
+queue_handler = LazyQueueHandler(log_queue)
+log_listener = QueueListener(log_queue, console_handler, file_handler, memory_handler, score_file_handler,
+                             respect_handler_level=True)
+log_listener.start()
+atexit.register(log_listener.stop)
 
 # Add handlers to the logger
-logger.addHandler(console_handler)
-logger.addHandler(file_handler)
+logger.addHandler(queue_handler)
+score_logger.addHandler(queue_handler)
+
+LOGGERS = {logger.name: logger, score_logger.name: score_logger}
+
+
+def get_log_levels():
+    return {name: logging.getLevelName(log.level) for name, log in LOGGERS.items()}
+
+
+def set_log_level(name, level):
+    """Change the level of one of the application loggers at runtime, level is a name like "INFO" """
+    level = str(level).upper()
+    if name not in LOGGERS or not isinstance(logging.getLevelName(level), int):
+        raise ValueError("Unknown logger or level: " + str(name) + ", " + level)
+    LOGGERS[name].setLevel(level)
 
 
 # Custom exception handler to log unhandled exceptions
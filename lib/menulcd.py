@@ -13,6 +13,7 @@ from lib.rpi_drivers import GPIO
 
 import lib.colormaps as cmap
 from lib.log_setup import logger
+from lib.song_library import song_library
 
 
 class MenuLCD:
@@ -116,7 +117,7 @@ class MenuLCD:
         load_song_mc.appendChild(self.DOMTree.createTextNode(""))
         load_song_mc.setAttribute("text", "Load song")
         replace_node.parentNode.replaceChild(load_song_mc, replace_node)
-        songs_list = os.listdir("Songs")
+        songs_list = song_library.names()
         for song in songs_list:
             # List of songs for Play_MIDI
             element = self.DOMTree.createElement("Choose_song")
@@ -886,7 +887,7 @@ class MenuLCD:
                 self.render_message("Recording canceled", "", 2000)
                 self.saving.cancel_recording()
             if choice == "Stop playing":
-                self.saving.is_playing_midi.clear()
+                self.saving.stop_playing()
                 self.render_message("Playing stopped", "", 2000)
                 fastColorWipe(self.ledstrip.strip, True, self.ledsettings)
 
@@ -901,7 +902,7 @@ class MenuLCD:
                     self.learning.t = threading.Thread(target=self.learning.learn_midi)
                     self.learning.t.start()
                 else:
-                    self.learning.is_started_midi = False
+                    self.learning.stop_learning()
                     fastColorWipe(self.ledstrip.strip, True, self.ledsettings)
                 self.show(location)
 
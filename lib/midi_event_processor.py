@@ -19,6 +19,12 @@ class MIDIEventProcessor:
         self.last_sustain = 0  # Initialize last_sustain
         # Add a timestamp for the last sequence advance
         self.last_sequence_advance = 0
+        # read for every event, kept up to date by the settings instead
+        self.midi_logging = usersettings.typed("midi_logging")
+        usersettings.subscribe("midi_logging", self.set_midi_logging)
+
+    def set_midi_logging(self, value):
+        self.midi_logging = value
 
     def process_midi_events(self):
         if len(self.saving.is_playing_midi) == 0 and self.learning.is_started_midi is False:
@@ -29,7 +35,7 @@ class MIDIEventProcessor:
         while self.midiports.midipending:
             msg, msg_timestamp = self.midiports.midipending.popleft()
 
-            if int(self.usersettings.get_setting_value("midi_logging")) == 1:
+            if self.midi_logging == 1:
                 if not msg.is_meta:
                     try:
                         self.learning.socket_send.append("midi_event" + str(msg))
@@ -1,5 +1,8 @@
+import ast
+
 import mido
 from lib import connectall
+import threading
 import time
 from collections import deque
 from lib.log_setup import logger
@@ -10,6 +13,16 @@ class MidiPorts:
         # midi queues will contain a tuple (midi_msg, timestamp)
         self.midifile_queue = deque()
         self.midi_queue = deque()
+        # notified on every incoming message so consumers can block instead of polling midi_queue
+        self.midi_queue_condition = threading.Condition()
+        # callables receiving (msg, timestamp) of every incoming message, used by the latency calibration
+        self.input_listeners = []
+        # measured input latency in seconds per input port name
+        try:
+            self.input_latencies = ast.literal_eval(self.usersettings.get_setting_value("input_latencies"))
+        except Exception as e:
+            logger.warning(e)
+            self.input_latencies = {}
         self.last_activity = 0
         self.inport = None
         self.playport = None
@@ -116,4 +129,20 @@ class MidiPorts:
             logger.info("Can't reconnect play port: " + port)
 
     def msg_callback(self, msg):
-        self.midi_queue.append((msg, time.perf_counter()))
+        timestamp = time.perf_counter()
+        self.midi_queue.append((msg, timestamp))
+        for listener in self.input_listeners:
+            listener(msg, timestamp)
+        self.wake_midi_waiters()
+
+    def get_input_latency(self):
+        return self.input_latencies.get(self.usersettings.get_setting_value("input_port"), 0)
+
+    def set_input_latency(self, latency):
+        self.input_latencies[self.usersettings.get_setting_value("input_port")] = round(latency, 4)
+        self.usersettings.change_setting_value("input_latencies", self.input_latencies)
+
+    def wake_midi_waiters(self):
+        # wake up threads blocked on midi_queue_condition, e.g. when learning is stopped or restarted
+        with self.midi_queue_condition:
+            self.midi_queue_condition.notify_all()
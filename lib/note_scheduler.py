@@ -0,0 +1,79 @@
+import heapq
+import threading
+import time
+
+import mido
+
+from lib.log_setup import logger
+
+
+class NoteScheduler:
+    """Sends output notes to the play port at absolute deadlines from a dedicated thread.
+
+    Deadlines (time.perf_counter() seconds) are hashed into slots of a timer wheel, every message of a slot
+    is sent in one burst so chords leave together no matter how busy the caller is.
+    """
+
+    def __init__(self, midiports, resolution=0.001):
+        self.midiports = midiports
+        self.resolution = resolution
+        # slot number -> messages due in that slot
+        self.slots = {}
+        # slot numbers with pending messages, earliest first
+        self.slot_heap = []
+        # (channel, note) sent as note_on and not released yet
+        self.sounding = set()
+        self.condition = threading.Condition()
+        self.thread = None
+
+    def schedule(self, msg, deadline):
+        slot = int(deadline / self.resolution)
+        with self.condition:
+            if slot not in self.slots:
+                self.slots[slot] = []
+                heapq.heappush(self.slot_heap, slot)
+            self.slots[slot].append(msg)
+            if self.thread is None:
+                self.thread = threading.Thread(target=self.run, daemon=True)
+                self.thread.start()
+            self.condition.notify()
+
+    def send_now(self, messages):
+        with self.condition:
+            self.send(messages)
+
+    def cancel(self):
+        """Drop every scheduled message and release the notes that are still sounding"""
+        with self.condition:
+            self.slots.clear()
+            self.slot_heap.clear()
+            self.send([mido.Message('note_off', channel=channel, note=note) for channel, note in self.sounding])
+
+    def send(self, messages):
+        # called with the condition held, so bursts from send_now and the scheduler thread never interleave
+        port = self.midiports.playport
+        for msg in messages:
+            if msg.type == 'note_on' and msg.velocity > 0:
+                self.sounding.add((msg.channel, msg.note))
+            elif msg.type in ('note_on', 'note_off'):
+                self.sounding.discard((msg.channel, msg.note))
+            if port is None:
+                continue
+            try:
+                port.send(msg)
+            except Exception as e:
+                logger.warning(e)
+
+    def run(self):
+        with self.condition:
+            while True:
+                if not self.slot_heap:
+                    self.condition.wait()
+                    continue
+                slot = self.slot_heap[0]
+                timeout = slot * self.resolution - time.perf_counter()
+                if timeout > 0:
+                    self.condition.wait(timeout)
+                    continue
+                heapq.heappop(self.slot_heap)
+                self.send(self.slots.pop(slot))
@@ -0,0 +1,95 @@
+class NoteTracker:
+    """Expected/pressed/wrong keys of a single learning step, stored as 128-bit masks (bit n = MIDI note n).
+
+    Masks are kept per hand (the song channel: 1 = right, 2 = left) together with combined masks,
+    so completion and progress checks are single integer operations.
+    """
+
+    def __init__(self):
+        self.expected = {}
+        self.pressed = {}
+        self.wrong = {}
+        self.expected_all = 0
+        self.pressed_all = 0
+        self.wrong_all = 0
+
+    def clear(self):
+        """Forget everything, called when moving to the next step"""
+        self.expected.clear()
+        self.pressed.clear()
+        self.wrong.clear()
+        self.expected_all = 0
+        self.pressed_all = 0
+        self.wrong_all = 0
+
+    def expect(self, note, hand):
+        """Add a note that has to be pressed in the current step"""
+        bit = 1 << note
+        self.expected[hand] = self.expected.get(hand, 0) | bit
+        self.expected_all |= bit
+
+    def is_expected(self, note):
+        return bool(self.expected_all >> note & 1)
+
+    def press(self, note, hand):
+        """Register a key press.
+
+        A correct note is marked as pressed for every hand expecting it, a wrong note is attributed to `hand`.
+        Returns True only for an expected note that was not already held down.
+        """
+        bit = 1 << note
+        if not self.expected_all & bit:
+            self.wrong[hand] = self.wrong.get(hand, 0) | bit
+            self.wrong_all |= bit
+            return False
+
+        if self.pressed_all & bit:
+            return False
+
+        for expected_hand, mask in self.expected.items():
+            if mask & bit:
+                self.pressed[expected_hand] = self.pressed.get(expected_hand, 0) | bit
+        self.pressed_all |= bit
+        return True
+
+    def release(self, note):
+        bit = 1 << note
+        if self.pressed_all & bit:
+            self.pressed_all &= ~bit
+            for hand in self.pressed:
+                self.pressed[hand] &= ~bit
+        if self.wrong_all & bit:
+            self.wrong_all &= ~bit
+            for hand in self.wrong:
+                self.wrong[hand] &= ~bit
+
+    def has_expected(self):
+        return self.expected_all != 0
+
+    def is_complete(self):
+        """True when every expected note is held down"""
+        return self.expected_all & ~self.pressed_all == 0
+
+    def missing(self, hand=None):
+        """Mask of expected notes that are not pressed yet"""
+        if hand is None:
+            return self.expected_all & ~self.pressed_all
+        return self.expected.get(hand, 0) & ~self.pressed.get(hand, 0)
+
+    def progress(self, hand=None):
+        """Fraction (0-1) of expected notes currently pressed"""
+        if hand is None:
+            expected, pressed = self.expected_all, self.pressed_all
+        else:
+            expected, pressed = self.expected.get(hand, 0), self.pressed.get(hand, 0)
+        if not expected:
+            return 1.0
+        return (expected & pressed).bit_count() / expected.bit_count()
+
+
+def mask_to_notes(mask):
+    """Yield note numbers of the set bits, lowest first"""
+    while mask:
+        low_bit = mask & -mask
+        yield low_bit.bit_length() - 1
+        mask ^= low_bit
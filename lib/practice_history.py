@@ -0,0 +1,119 @@
+import json
+import queue
+import sqlite3
+import threading
+
+from lib.log_setup import logger
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS sessions (
+    id INTEGER PRIMARY KEY,
+    song TEXT NOT NULL,
+    started_at REAL NOT NULL,
+    duration REAL NOT NULL,
+    score INTEGER NOT NULL,
+    max_combo INTEGER NOT NULL,
+    tempo INTEGER NOT NULL,
+    hands INTEGER NOT NULL,
+    practice INTEGER NOT NULL,
+    start_point REAL NOT NULL,
+    end_point REAL NOT NULL,
+    notes INTEGER NOT NULL,
+    mistakes INTEGER NOT NULL,
+    mean_delay REAL NOT NULL,
+    summary TEXT NOT NULL
+);
+CREATE INDEX IF NOT EXISTS sessions_song_date ON sessions (song, started_at);
+CREATE INDEX IF NOT EXISTS sessions_date ON sessions (started_at);
+"""
+
+SESSION_COLUMNS = ("song", "started_at", "duration", "score", "max_combo", "tempo", "hands", "practice",
+                   "start_point", "end_point", "notes", "mistakes", "mean_delay", "summary")
+
+# columns returned for progress charts, the per bar summary is only loaded for a single session
+HISTORY_COLUMNS = ("id", "started_at", "duration", "score", "max_combo", "tempo", "hands", "practice",
+                   "start_point", "end_point", "notes", "mistakes", "mean_delay")
+
+
+class PracticeHistory:
+    """Learning sessions stored in a local SQLite database.
+
+    Sessions are written by a background thread so callers never wait for the disk,
+    reads open their own connection (WAL mode lets them run next to the writer).
+    """
+
+    def __init__(self, db_path="config/practice_history.db"):
+        self.db_path = db_path
+        self.write_queue = queue.Queue()
+        self.writer = None
+        self.lock = threading.Lock()
+        self.schema_ready = False
+
+    def connect(self):
+        connection = sqlite3.connect(self.db_path, timeout=5)
+        connection.row_factory = sqlite3.Row
+        if not self.schema_ready:
+            connection.execute("PRAGMA journal_mode=WAL")
+            connection.executescript(SCHEMA)
+            self.schema_ready = True
+        connection.execute("PRAGMA synchronous=NORMAL")
+        return connection
+
+    def query(self, sql, parameters=()):
+        connection = self.connect()
+        try:
+            return [dict(row) for row in connection.execute(sql, parameters).fetchall()]
+        finally:
+            connection.close()
+
+    def record_session(self, session):
+        """Queue a session (dict with SESSION_COLUMNS, summary as dict) for writing"""
+        with self.lock:
+            if self.writer is None:
+                self.writer = threading.Thread(target=self.write_sessions, daemon=True)
+                self.writer.start()
+        self.write_queue.put(session)
+
+    def write_sessions(self):
+        connection = None
+        while True:
+            sessions = [self.write_queue.get()]
+            # everything queued meanwhile goes into the same transaction
+            while not self.write_queue.empty():
+                sessions.append(self.write_queue.get_nowait())
+            try:
+                if connection is None:
+                    connection = self.connect()
+                rows = [tuple(json.dumps(session[column]) if column == "summary" else session[column]
+                              for column in SESSION_COLUMNS) for session in sessions]
+                with connection:
+                    connection.executemany(
+                        "INSERT INTO sessions (" + ", ".join(SESSION_COLUMNS) + ") VALUES ("
+                        + ", ".join("?" * len(SESSION_COLUMNS)) + ")", rows)
+            except Exception as e:
+                logger.warning("Can't save practice session: " + str(e))
+            for _ in sessions:
+                self.write_queue.task_done()
+
+    def flush(self):
+        """Wait until all queued sessions are written"""
+        self.write_queue.join()
+
+    def get_song_history(self, song, since=0, limit=500):
+        """Most recent sessions of a song, oldest first"""
+        rows = self.query("SELECT " + ", ".join(HISTORY_COLUMNS) + " FROM sessions WHERE song = ? AND started_at >= ? "
+                          "ORDER BY started_at DESC LIMIT ?", (song, since, limit))
+        return rows[::-1]
+
+    def get_session(self, session_id):
+        rows = self.query("SELECT * FROM sessions WHERE id = ?", (session_id,))
+        if not rows:
+            return None
+        session = rows[0]
+        session["summary"] = json.loads(session["summary"])
+        return session
+
+    def get_songs_overview(self):
+        """Number of sessions, best score and last practice time of every practiced song"""
+        return self.query("SELECT song, COUNT(*) AS sessions, MAX(score) AS best_score, MAX(started_at) AS last_played "
+                          "FROM sessions GROUP BY song ORDER BY last_played DESC")
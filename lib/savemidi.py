@@ -2,6 +2,9 @@ import time
 
 from mido import MidiFile, MidiTrack, Message
 
+from lib.song_library import song_library
+from lib.status_board import status_board
+
 
 class SaveMIDI:
     def __init__(self):
@@ -11,10 +14,28 @@ class SaveMIDI:
         self.first_note_time = None
         self.messages_to_save = None
         self.menu = None
-        self.is_recording = False
+        self._is_recording = False
         self.is_playing_midi = {}
         self.start_time = time.perf_counter()
 
+    @property
+    def is_recording(self):
+        return self._is_recording
+
+    @is_recording.setter
+    def is_recording(self, value):
+        self._is_recording = value
+        status_board.update("recording", {"isrecording": value})
+
+    def start_playing(self, song_path):
+        self.is_playing_midi.clear()
+        self.is_playing_midi[song_path] = True
+        status_board.update("recording", {"isplaying": True})
+
+    def stop_playing(self):
+        self.is_playing_midi.clear()
+        status_board.update("recording", {"isplaying": False})
+
     def add_instance(self, menu):
         self.menu = menu
 
@@ -69,6 +90,7 @@ class SaveMIDI:
                 self.last_note_time = message[1]
 
             self.mid.save('Songs/' + filename + '_' + str(key) + '.mid')
+            song_library.add(filename + '_' + str(key) + '.mid')
 
         self.messages_to_save = []
         self.is_recording = False
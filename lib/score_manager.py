@@ -14,6 +14,7 @@ class ScoreManager:
         """Reset score and combo at the start of a learning session"""
         self.score = 0
         self.combo = 0
+        self.max_combo = 0
         self.last_score_update = 0
     
     def get_score_multiplier(self):
@@ -44,6 +45,7 @@ class ScoreManager:
         
         # Increment combo
         self.combo += 1
+        self.max_combo = max(self.max_combo, self.combo)
         
         
         # Round to nearest integer
@@ -71,6 +73,10 @@ class ScoreManager:
         """Get current combo"""
         return self.combo
     
+    def get_max_combo(self):
+        """Get the longest combo since the last reset"""
+        return self.max_combo
+
     def get_multiplier(self):
         """Get current multiplier"""
         return self.get_score_multiplier()
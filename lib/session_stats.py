@@ -0,0 +1,107 @@
+from array import array
+
+import numpy as np
+
+# Edges (seconds) of the timing histogram, delays outside are counted in the first/last bin
+HISTOGRAM_EDGES = np.linspace(-0.5, 0.5, 21)
+# Mean delay (seconds) beyond which a hand is reported as rushing or dragging
+TENDENCY_THRESHOLD = 0.03
+
+HANDS = {1: "r", 2: "l"}
+
+
+class SessionRecorder:
+    """Timing data of a learning pass kept in compact typed arrays, one set per hand (song channel)"""
+
+    def __init__(self):
+        self.notes = {}
+        self.mistakes = {}
+        self.reset()
+
+    def reset(self):
+        # per hand: (delays in seconds, bar numbers) of correctly pressed notes, bar numbers of wrong notes
+        self.notes = {hand: (array('d'), array('q')) for hand in HANDS}
+        self.mistakes = {hand: array('q') for hand in HANDS}
+
+    def add_note(self, hand, delay, bar):
+        if hand in self.notes:
+            delays, bars = self.notes[hand]
+            delays.append(delay)
+            bars.append(bar)
+
+    def add_mistake(self, hand, bar):
+        if hand in self.mistakes:
+            self.mistakes[hand].append(bar)
+
+    def snapshot(self):
+        """Copy of the recorded arrays, safe to summarize from another thread"""
+        return ({hand: (array('d', delays), array('q', bars)) for hand, (delays, bars) in self.notes.items()},
+                {hand: array('q', bars) for hand, bars in self.mistakes.items()})
+
+
+def rounded_list(values):
+    # NaN (bars without notes) becomes None so the list stays valid JSON
+    return [None if np.isnan(value) else round(float(value), 3) for value in values]
+
+
+def summarize_hand(delays, bars, mistake_bars, first_bar, bar_count, max_delay):
+    delays = np.frombuffer(delays, dtype=np.float64) if len(delays) else np.zeros(0)
+    bars = np.frombuffer(bars, dtype=np.int64) if len(bars) else np.zeros(0, dtype=np.int64)
+    mistake_bars = np.frombuffer(mistake_bars, dtype=np.int64) if len(mistake_bars) else np.zeros(0, dtype=np.int64)
+
+    bar_idx = bars - first_bar
+    # same curve as ScoreManager, 1 = perfect timing, 0 = max_delay or worse
+    accuracy = np.clip((max_delay - np.abs(delays)) / max_delay, 0, 1) ** 2
+
+    notes_per_bar = np.bincount(bar_idx, minlength=bar_count)
+    with np.errstate(invalid='ignore', divide='ignore'):
+        bar_accuracy = np.bincount(bar_idx, weights=accuracy, minlength=bar_count) / notes_per_bar
+        bar_delay = np.bincount(bar_idx, weights=delays, minlength=bar_count) / notes_per_bar
+
+    histogram, _ = np.histogram(np.clip(delays, HISTOGRAM_EDGES[0], HISTOGRAM_EDGES[-1]), HISTOGRAM_EDGES)
+
+    # rushing (negative) or dragging (positive) over the session, seconds per bar
+    trend = 0.0
+    if len(np.unique(bars)) > 1:
+        trend = float(np.polyfit(bars, delays, 1)[0])
+
+    mean_delay = float(delays.mean()) if len(delays) else 0.0
+    if mean_delay < -TENDENCY_THRESHOLD:
+        tendency = "rushing"
+    elif mean_delay > TENDENCY_THRESHOLD:
+        tendency = "dragging"
+    else:
+        tendency = "steady"
+
+    return {
+        "notes": int(len(delays)),
+        "late_notes": int(np.count_nonzero(delays >= max_delay)),
+        "mistakes": int(len(mistake_bars)),
+        "mean_delay": round(mean_delay, 3),
+        "std_delay": round(float(delays.std()), 3) if len(delays) else 0.0,
+        "tendency": tendency,
+        "trend": round(trend, 4),
+        "histogram": histogram.tolist(),
+        "bar_accuracy": rounded_list(bar_accuracy),
+        "bar_delay": rounded_list(bar_delay),
+        "bar_mistakes": np.bincount(mistake_bars - first_bar, minlength=bar_count).tolist(),
+    }
+
+
+def summarize_session(snapshot, max_delay):
+    """Compact session summary: per hand statistics plus per bar series covering the bars that were played"""
+    notes, mistakes = snapshot
+    played_bars = [bars for _, bars in notes.values() if len(bars)] + [bars for bars in mistakes.values() if len(bars)]
+    first_bar = min((min(bars) for bars in played_bars), default=0)
+    bar_count = max((max(bars) for bars in played_bars), default=-1) - first_bar + 1
+
+    summary = {
+        "first_bar": first_bar + 1,
+        "bar_count": bar_count,
+        "histogram_edges": rounded_list(HISTOGRAM_EDGES),
+        "max_delay": max_delay,
+    }
+    for hand, name in HANDS.items():
+        delays, bars = notes[hand]
+        summary[name] = summarize_hand(delays, bars, mistakes[hand], first_bar, bar_count, max_delay)
+    return summary
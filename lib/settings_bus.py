@@ -0,0 +1,84 @@
+import threading
+
+from lib.log_setup import logger
+
+# Events published on the bus, the value that comes with them is in the comment
+COLOR_MODE = "color_mode"  # the color mode or its colors changed, the ColorMode is rebuilt (None)
+SETTINGS = "settings"  # settings changed in the web interface, to be applied ([(name, parsed value)])
+SETTINGS_CHANGED = "settings_changed"  # a setting read by the color modes changed, they reload it (None)
+SETTINGS_RESET = "settings_reset"  # the user settings were restored to defaults (None)
+
+# events published by handlers are handled in the same dispatch, up to this many rounds
+DISPATCH_ROUNDS = 3
+
+
+class SettingsBus:
+    """Hands setting changes from any thread (web requests, menu, GPIO) to the main loop.
+
+    publish() only records the event, the handlers run when the main loop calls dispatch()
+    between two frames, so they never race the rendering. An event published several times
+    with the same key before the next dispatch is handled once, with the last value.
+    """
+
+    def __init__(self):
+        self.lock = threading.Lock()
+        # (event, key) -> value, in order of publishing
+        self.pending = {}
+        self.handlers = {}
+        # number of finished dispatch() calls, for publishers waiting until their event was handled
+        self.dispatches = 0
+        self.dispatched = threading.Condition(self.lock)
+
+    def subscribe(self, event, handler):
+        """Call handler(value) on the dispatching thread whenever event was published"""
+        with self.lock:
+            self.handlers.setdefault(event, []).append(handler)
+        return handler
+
+    def subscriber(self, event):
+        # decorator form of subscribe()
+        return lambda handler: self.subscribe(event, handler)
+
+    def unsubscribe(self, event, handler):
+        with self.lock:
+            try:
+                self.handlers[event].remove(handler)
+            except (KeyError, ValueError):
+                pass
+
+    def publish(self, event, value=None, key=None):
+        """Record an event, returns a ticket for wait_until_handled()"""
+        with self.lock:
+            # moved to the end, so events are handled in the order they were last published
+            self.pending.pop((event, key), None)
+            self.pending[(event, key)] = value
+            return self.dispatches
+
+    def wait_until_handled(self, ticket, timeout=None):
+        """Wait for the next dispatch after the publish which returned ticket, False on timeout"""
+        with self.dispatched:
+            return self.dispatched.wait_for(lambda: self.dispatches > ticket, timeout)
+
+    def dispatch(self):
+        """Run the handlers of the events published since the last call, returns how many there were"""
+        handled = 0
+        for _ in range(DISPATCH_ROUNDS):
+            with self.lock:
+                if not self.pending:
+                    break
+                pending, self.pending = self.pending, {}
+                handlers = {event: list(self.handlers.get(event, ())) for event, _ in pending}
+            for (event, _), value in pending.items():
+                for handler in handlers[event]:
+                    try:
+                        handler(value)
+                    except Exception as e:
+                        logger.warning("Handling " + event + " failed: " + str(e))
+            handled += len(pending)
+        with self.dispatched:
+            self.dispatches += 1
+            self.dispatched.notify_all()
+        return handled
+
+
+settings_bus = SettingsBus()
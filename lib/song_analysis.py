@@ -0,0 +1,138 @@
+import json
+import sys
+
+import mido
+import numpy as np
+
+DEFAULT_TEMPO = 500000
+# Notes starting within this many seconds are counted as one chord
+CHORD_WINDOW = 0.03
+# Wider intervals between neighbouring notes of a chord are played by two hands
+HAND_GAP = 12
+# Values at which each difficulty component is maxed out
+DIFFICULTY_SCALE = {
+    "notes_per_second": 16.0,
+    "peak_notes_per_second": 48.0,
+    "max_chord": 8.0,
+    "hand_span": 24.0,
+    "pitch_range": 88.0,
+    "tempo_changes": 30.0,
+}
+DIFFICULTY_WEIGHTS = {
+    "notes_per_second": 3.0,
+    "peak_notes_per_second": 2.0,
+    "max_chord": 1.5,
+    "hand_span": 1.5,
+    "pitch_range": 1.0,
+    "tempo_changes": 1.0,
+}
+
+
+def song_timeline(mid):
+    """Note onsets of a MIDI file as arrays (seconds, pitch, track), the tempo values used and the length in seconds"""
+    times, pitches, tracks, tempos = [], [], [], []
+    # note_on messages keep their track in the channel, like LearnMIDI does before merging
+    for track_index, track in enumerate(mid.tracks):
+        for msg in track:
+            if msg.type == 'note_on':
+                msg.channel = track_index % 16
+    tempo = DEFAULT_TEMPO
+    current_time = 0.0
+    for msg in mido.merge_tracks(mid.tracks):
+        if msg.time:
+            current_time += mido.tick2second(msg.time, mid.ticks_per_beat, tempo)
+        if msg.type == 'note_on' and msg.velocity > 0:
+            times.append(current_time)
+            pitches.append(msg.note)
+            tracks.append(msg.channel)
+        elif msg.type == 'set_tempo':
+            tempo = msg.tempo
+            tempos.append(msg.tempo)
+    return (np.array(times), np.array(pitches, dtype=np.int64), np.array(tracks, dtype=np.int64), tempos,
+            current_time)
+
+
+def chord_statistics(times, pitches, tracks):
+    """(largest chord, widest chord in semitones) played by one hand.
+
+    Notes of a track starting together form a chord, a chord is split between hands where two
+    neighbouring notes are more than HAND_GAP semitones apart (tracks often hold both hands).
+    """
+    if not len(times):
+        return 0, 0
+    # chords are found in time order per track, then sorted by pitch inside each chord
+    order = np.lexsort((times, tracks))
+    times, pitches, tracks = times[order], pitches[order], tracks[order]
+    new_chord = np.ones(len(times), dtype=bool)
+    new_chord[1:] = (np.diff(times) > CHORD_WINDOW) | (np.diff(tracks) != 0)
+    chord_ids = np.cumsum(new_chord)
+    order = np.lexsort((pitches, chord_ids))
+    pitches, chord_ids = pitches[order], chord_ids[order]
+
+    new_hand = np.ones(len(pitches), dtype=bool)
+    new_hand[1:] = (np.diff(chord_ids) != 0) | (np.diff(pitches) > HAND_GAP)
+    starts = np.flatnonzero(new_hand)
+    sizes = np.diff(np.append(starts, len(pitches)))
+    spans = np.maximum.reduceat(pitches, starts) - np.minimum.reduceat(pitches, starts)
+    return int(sizes.max()), int(spans.max())
+
+
+def difficulty_score(analysis):
+    """0 (trivial) to 10, weighted sum of the analysis values scaled by DIFFICULTY_SCALE"""
+    values = np.array([analysis[key] for key in DIFFICULTY_SCALE], dtype=np.float64)
+    scale = np.array(list(DIFFICULTY_SCALE.values()))
+    weights = np.array([DIFFICULTY_WEIGHTS[key] for key in DIFFICULTY_SCALE])
+    score = np.clip(values / scale, 0, 1) @ weights / weights.sum() * 10
+    return round(float(score), 1)
+
+
+def analyze_song(path):
+    """Metadata and playing difficulty of a MIDI file.
+
+    Runs in a worker process of the song library, so it only takes and returns plain values.
+    """
+    mid = mido.MidiFile(path, clip=True)
+    if mid.type == 2:
+        # asynchronous tracks have no common timeline
+        analysis = dict.fromkeys(DIFFICULTY_SCALE, 0)
+        analysis.update(duration=0, tracks=len(mid.tracks), notes=0, difficulty=0)
+        return analysis
+
+    times, pitches, tracks, tempos, duration = song_timeline(mid)
+    notes = len(times)
+    max_chord, hand_span = chord_statistics(times, pitches, tracks)
+    # busiest second of the song
+    peak = int((np.searchsorted(times, times + 1.0) - np.arange(notes)).max()) if notes else 0
+
+    analysis = {
+        "duration": round(duration, 2),
+        "tracks": len(mid.tracks),
+        "notes": notes,
+        "notes_per_second": round(notes / duration, 2) if duration > 0 else 0,
+        "peak_notes_per_second": peak,
+        "max_chord": max_chord,
+        "hand_span": hand_span,
+        "pitch_range": int(pitches.max() - pitches.min()) if notes else 0,
+        "tempo_changes": max(0, len(set(tempos)) - 1),
+    }
+    analysis["difficulty"] = difficulty_score(analysis)
+    return analysis
+
+
+def serve(requests=sys.stdin, responses=sys.stdout):
+    """Analysis worker of the song library, started as `python -m lib.song_analysis`.
+
+    Reads a JSON encoded song path per line and writes {"analysis": ...} or {"error": ...} per line.
+    Only mido and numpy are imported here, none of the LED, MIDI or web interface modules.
+    """
+    for line in requests:
+        try:
+            result = {"analysis": analyze_song(json.loads(line))}
+        except Exception as e:
+            result = {"error": str(e)}
+        responses.write(json.dumps(result) + "\n")
+        responses.flush()
+
+
+if __name__ == "__main__":
+    serve()
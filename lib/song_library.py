@@ -0,0 +1,367 @@
+import json
+import os
+import queue
+import subprocess
+import sys
+import threading
+import time
+
+from lib.conversion_jobs import SCORE_EXTENSIONS
+from lib.log_setup import logger
+from lib.song_analysis import analyze_song
+from lib.song_search import SongSearchIndex
+
+SONG_EXTENSION = ".mid"
+# computed by analyze_song in the background, None until then
+METADATA_KEYS = ("duration", "tracks", "notes", "notes_per_second", "peak_notes_per_second", "max_chord",
+                 "hand_span", "pitch_range", "tempo_changes", "difficulty")
+# analysis worker processes are stopped after this many idle seconds
+WORKER_IDLE_TIMEOUT = 30
+# seconds a stopped worker gets to exit before it is killed
+WORKER_STOP_TIMEOUT = 5
+# the directory holding the lib package, analysis workers import lib.song_analysis from it
+PACKAGE_ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+
+def split_title(name):
+    """"Artist - Title.mid" naming convention used by most downloaded songs"""
+    base = name[:-len(SONG_EXTENSION)] if name.endswith(SONG_EXTENSION) else name
+    if " - " in base:
+        artist, title = base.split(" - ", 1)
+        return title.strip(), artist.strip()
+    return base, ""
+
+
+def needs_analysis(song):
+    return any(song.get(key) is None for key in METADATA_KEYS)
+
+
+def is_listed(name):
+    # recordings are saved as <date>_main.mid plus one <date>_#<color>.mid per color, only _main is listed
+    return name.endswith(SONG_EXTENSION) and "_#" not in name
+
+
+class AnalysisWorker:
+    """A `python -m lib.song_analysis` process analysing one song at a time.
+
+    It is a fresh interpreter which imports mido and numpy only: neither forked from this process
+    (its threads, held locks and LED, MIDI and socket handles) nor re-importing the main script
+    the way multiprocessing's spawn and forkserver workers do.
+    """
+
+    def __init__(self):
+        self.process = subprocess.Popen([sys.executable, "-m", "lib.song_analysis"], cwd=PACKAGE_ROOT,
+                                        stdin=subprocess.PIPE, stdout=subprocess.PIPE, text=True)
+
+    def analyze(self, path):
+        """The analysis of a song, raises ValueError for an unreadable file and OSError if the worker died"""
+        try:
+            self.process.stdin.write(json.dumps(os.path.abspath(path)) + "\n")
+            self.process.stdin.flush()
+            line = self.process.stdout.readline()
+        except (OSError, ValueError) as e:
+            raise OSError("analysis worker failed: " + str(e))
+        if not line:
+            raise OSError("analysis worker exited with " + str(self.process.wait()))
+        result = json.loads(line)
+        if "error" in result:
+            raise ValueError(result["error"])
+        return result["analysis"]
+
+    def stop(self):
+        try:
+            # end of input ends the worker loop
+            self.process.stdin.close()
+        except OSError:
+            pass
+        try:
+            self.process.wait(timeout=WORKER_STOP_TIMEOUT)
+        except subprocess.TimeoutExpired:
+            self.process.kill()
+            self.process.wait()
+        self.process.stdout.close()
+
+
+class SongLibrary:
+    """Index of the MIDI files in the songs folder.
+
+    The index lives in memory and is persisted to a JSON file, it is kept up to date by a watcher
+    thread (a cheap stat of the folder, full rescans are rare) and by explicit add/remove/rename
+    calls from upload, recording and the song actions. New and modified songs are analysed by worker
+    processes, one per core except one left for the LED loop.
+    """
+
+    def __init__(self, songs_dir="Songs", index_path="Songs/cache/library.json", watch_interval=2, rescan_interval=60):
+        self.songs_dir = songs_dir
+        self.index_path = index_path
+        self.watch_interval = watch_interval
+        self.rescan_interval = rescan_interval
+        self.songs = {}
+        self.lock = threading.RLock()
+        self.loaded = False
+        self.dir_mtime = None
+        self.by_date = []
+        self.by_name = []
+        self.by_difficulty = []
+        self.search_index = SongSearchIndex()
+        self.metadata_queue = queue.Queue()
+        self.analyzing = set()
+        self.analysis_workers = max(1, (os.cpu_count() or 2) - 1)
+        self.watcher = None
+        self.save_pending = False
+
+    # ---- index maintenance ----
+
+    def load(self):
+        with self.lock:
+            if self.loaded:
+                return
+            try:
+                with open(self.index_path) as index_file:
+                    self.songs = {song["name"]: song for song in json.load(index_file).get("songs", [])}
+            except (OSError, ValueError):
+                self.songs = {}
+            self.loaded = True
+            self.refresh()
+
+    def start(self):
+        """Load the index and keep it in sync with the songs folder in the background"""
+        self.load()
+        with self.lock:
+            if self.watcher is not None:
+                return
+            self.watcher = threading.Thread(target=self.watch, daemon=True)
+        self.watcher.start()
+        for _ in range(self.analysis_workers):
+            threading.Thread(target=self.analyze_songs, daemon=True).start()
+
+    def watch(self):
+        last_rescan = time.time()
+        while True:
+            time.sleep(self.watch_interval)
+            try:
+                # adding, removing or renaming a file changes the folder mtime
+                dir_mtime = os.stat(self.songs_dir).st_mtime
+                if dir_mtime != self.dir_mtime or time.time() - last_rescan > self.rescan_interval:
+                    self.refresh()
+                    last_rescan = time.time()
+                if self.save_pending and self.metadata_queue.empty() and not self.analyzing:
+                    self.save()
+            except Exception as e:
+                logger.warning("Song library watcher: " + str(e))
+
+    @staticmethod
+    def stat_entry(name, stat, previous=None):
+        title, artist = split_title(name)
+        song = {"name": name, "title": title, "artist": artist, "mtime": stat.st_mtime, "size": stat.st_size,
+                "tags": []}
+        song.update(dict.fromkeys(METADATA_KEYS))
+        if previous is not None:
+            song["tags"] = previous.get("tags", [])
+            if previous.get("mtime") == stat.st_mtime and previous.get("size") == stat.st_size:
+                # unchanged file, keep what was read before
+                song.update((key, previous.get(key)) for key in METADATA_KEYS)
+        return song
+
+    def refresh(self):
+        """Rescan the songs folder, only new or modified files are read again"""
+        with self.lock:
+            try:
+                self.dir_mtime = os.stat(self.songs_dir).st_mtime
+                found = {}
+                with os.scandir(self.songs_dir) as entries:
+                    for entry in entries:
+                        if entry.name.endswith(SONG_EXTENSION) and entry.is_file():
+                            found[entry.name] = self.stat_entry(entry.name, entry.stat(), self.songs.get(entry.name))
+            except OSError as e:
+                logger.warning("Can't scan songs folder: " + str(e))
+                return
+            changed = found.keys() != self.songs.keys() or any(found[name] != self.songs[name] for name in found)
+            for name in self.songs.keys() - found.keys():
+                self.search_index.remove(name)
+            self.songs = found
+            for song in found.values():
+                self.index_song(song)
+                if needs_analysis(song):
+                    self.metadata_queue.put(song["name"])
+            if changed:
+                self.rebuild_views()
+
+    def add(self, name):
+        """Index (or re-index) a single file of the songs folder"""
+        with self.lock:
+            path = os.path.join(self.songs_dir, name)
+            if not name.endswith(SONG_EXTENSION) or not os.path.isfile(path):
+                return
+            self.songs[name] = self.stat_entry(name, os.stat(path), self.songs.get(name))
+            self.index_song(self.songs[name])
+            if needs_analysis(self.songs[name]):
+                self.metadata_queue.put(name)
+            self.rebuild_views()
+
+    def remove(self, name):
+        with self.lock:
+            if self.songs.pop(name, None) is not None:
+                self.search_index.remove(name)
+                self.rebuild_views()
+
+    def rename(self, old_name, new_name):
+        with self.lock:
+            song = self.songs.pop(old_name, None)
+            self.search_index.remove(old_name)
+            if song is not None:
+                # metadata and tags follow the file
+                song = dict(song, name=new_name)
+                song["title"], song["artist"] = split_title(new_name)
+                self.songs[new_name] = song
+            self.add(new_name)
+            self.rebuild_views()
+
+    def set_tags(self, name, tags):
+        with self.lock:
+            if name not in self.songs:
+                return False
+            self.songs[name]["tags"] = [str(tag).strip() for tag in tags if str(tag).strip()]
+            self.index_song(self.songs[name])
+            self.rebuild_views()
+            return True
+
+    def index_song(self, song):
+        self.search_index.add(song["name"], song["title"], song["artist"], " ".join(song["tags"]))
+
+    def rebuild_views(self):
+        # sorted name lists, pages are slices of these
+        listed = [song for song in self.songs.values() if is_listed(song["name"])]
+        self.by_date = [song["name"] for song in sorted(listed, key=lambda song: song["mtime"])]
+        self.by_name = sorted(song["name"] for song in listed)
+        # songs not analysed yet come first
+        self.by_difficulty = [song["name"] for song in sorted(
+            listed, key=lambda song: (song["difficulty"] if song["difficulty"] is not None else -1, song["name"]))]
+        self.save_pending = True
+
+    def analyze_songs(self):
+        # one of the analysis threads, each feeding its own worker process
+        worker = None
+        while True:
+            try:
+                name = self.metadata_queue.get(timeout=WORKER_IDLE_TIMEOUT)
+            except queue.Empty:
+                if worker is not None:
+                    worker.stop()
+                    worker = None
+                continue
+            with self.lock:
+                song = self.songs.get(name)
+                if song is None or not needs_analysis(song) or name in self.analyzing:
+                    continue
+                self.analyzing.add(name)
+            if worker is None:
+                worker = AnalysisWorker()
+            try:
+                analysis = worker.analyze(os.path.join(self.songs_dir, name))
+            except ValueError as e:
+                logger.warning("Can't analyse " + name + ": " + str(e))
+                analysis = None
+            except OSError as e:
+                # e.g. killed for using too much memory, the next song gets a new worker
+                logger.warning("Can't analyse " + name + ": " + str(e))
+                analysis = None
+                worker.stop()
+                worker = None
+            self.store_analysis(name, song, analysis)
+
+    def update_metadata(self, name):
+        """Analyse one song in the calling thread"""
+        with self.lock:
+            song = self.songs.get(name)
+            if song is None:
+                return
+            path = os.path.join(self.songs_dir, name)
+            self.analyzing.add(name)
+        try:
+            analysis = analyze_song(path)
+        except Exception as e:
+            logger.warning("Can't analyse " + name + ": " + str(e))
+            analysis = None
+        self.store_analysis(name, song, analysis)
+
+    def store_analysis(self, name, song, analysis):
+        if analysis is None:
+            # unreadable file, not retried until it changes
+            analysis = dict.fromkeys(METADATA_KEYS, 0)
+        with self.lock:
+            self.analyzing.discard(name)
+            # the file may have been replaced or renamed meanwhile
+            if self.songs.get(name) is song:
+                song.update((key, analysis.get(key, 0)) for key in METADATA_KEYS)
+                self.rebuild_views()
+
+    def save(self):
+        with self.lock:
+            data = json.dumps({"songs": list(self.songs.values())})
+            self.save_pending = False
+        try:
+            os.makedirs(os.path.dirname(self.index_path), exist_ok=True)
+            temp_path = self.index_path + ".tmp"
+            with open(temp_path, "w") as index_file:
+                index_file.write(data)
+            os.replace(temp_path, self.index_path)
+        except OSError as e:
+            logger.warning("Can't save song library: " + str(e))
+
+    # ---- queries ----
+
+    def song_files(self, name):
+        """(path, name in an archive) of a song and the files that go with it: the other colors of a
+        recording, its sheet music and the learning cache"""
+        files = [(os.path.join(self.songs_dir, name), name)]
+        base = name[:-len(SONG_EXTENSION)]
+        if base.endswith("_main"):
+            prefix = base[:-len("_main")] + "_#"
+            with self.lock:
+                files += [(os.path.join(self.songs_dir, other), other) for other in sorted(self.songs)
+                          if other.startswith(prefix)]
+        for extension in SCORE_EXTENSIONS:
+            if os.path.isfile(os.path.join(self.songs_dir, base + extension)):
+                files.append((os.path.join(self.songs_dir, base + extension), base + extension))
+        cache = os.path.join(self.songs_dir, "cache", name + ".p")
+        if os.path.isfile(cache):
+            files.append((cache, "cache/" + name + ".p"))
+        return files
+
+    def get(self, name):
+        self.load()
+        with self.lock:
+            song = self.songs.get(name)
+            return dict(song) if song is not None else None
+
+    def names(self):
+        """Every MIDI file of the library sorted by name"""
+        self.load()
+        with self.lock:
+            return sorted(self.songs)
+
+    def query(self, sortby=None, search=None, start=0, length=10):
+        """One page of listed songs as (list of song dicts, total number of matching songs)"""
+        self.load()
+        with self.lock:
+            if sortby in ("nameAsc", "nameDesc"):
+                names = self.by_name
+            elif sortby in ("difficultyAsc", "difficultyDesc"):
+                names = self.by_difficulty
+            else:
+                names = self.by_date
+            reverse = sortby in ("dateAsc", "nameDesc", "difficultyDesc")
+            if search:
+                # ranked by relevance, best match first whatever the sort order
+                names = [name for name in self.search_index.search(search) if is_listed(name)]
+                reverse = False
+            total = len(names)
+            if reverse:
+                page = names[max(0, total - start - length):max(0, total - start)][::-1]
+            else:
+                page = names[start:start + length]
+            return [dict(self.songs[name]) for name in page], total
+
+
+song_library = SongLibrary()
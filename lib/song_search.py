@@ -0,0 +1,82 @@
+import math
+import re
+import unicodedata
+
+# Share of the query trigrams a song needs to match, lower values tolerate more typos
+MIN_SIMILARITY = 0.5
+
+
+def normalize(text):
+    # lowercase ascii words: "Für Elise_(2)" -> "fur elise 2"
+    text = unicodedata.normalize("NFKD", text).encode("ascii", "ignore").decode().lower()
+    return " ".join(re.findall(r"[a-z0-9]+", text))
+
+
+def trigrams(text):
+    """Trigrams of every word, padded so word starts weigh more: "elise" -> "  e", " el", "eli", ..."""
+    grams = set()
+    for word in text.split():
+        padded = "  " + word + " "
+        grams.update(padded[i:i + 3] for i in range(len(padded) - 2))
+    return grams
+
+
+class SongSearchIndex:
+    """Trigram index over song title, artist and tags for ranked, typo tolerant search.
+
+    Songs are added and removed one at a time by the song library, a search only looks at the
+    songs sharing one of the query's rarest trigrams.
+    """
+
+    def __init__(self):
+        self.postings = {}
+        self.documents = {}
+
+    def add(self, name, *fields):
+        text = normalize(" ".join(str(field) for field in fields if field))
+        document = self.documents.get(name)
+        if document is not None:
+            if document[0] == text:
+                return
+            self.remove(name)
+        grams = trigrams(text)
+        self.documents[name] = (text, grams)
+        for gram in grams:
+            self.postings.setdefault(gram, set()).add(name)
+
+    def remove(self, name):
+        document = self.documents.pop(name, None)
+        if document is None:
+            return
+        for gram in document[1]:
+            names = self.postings[gram]
+            names.discard(name)
+            if not names:
+                del self.postings[gram]
+
+    def search(self, query):
+        """Names of the matching songs, best match first"""
+        query = normalize(query)
+        query_grams = trigrams(query)
+        if not query_grams:
+            return []
+        required = math.ceil(len(query_grams) * MIN_SIMILARITY)
+        # a song matching `required` trigrams contains at least one of the len - required + 1 rarest ones
+        rarest = sorted(query_grams, key=lambda gram: len(self.postings.get(gram, ())))
+        candidates = set()
+        for gram in rarest[:len(query_grams) - required + 1]:
+            candidates.update(self.postings.get(gram, ()))
+
+        results = []
+        for name in candidates:
+            text, grams = self.documents[name]
+            matched = len(query_grams & grams)
+            if matched < required:
+                continue
+            score = matched / len(query_grams)
+            if query in text:
+                # exact substring, word start first
+                score += 2 if (" " + query) in (" " + text) else 1
+            results.append((-score, len(text), name))
+        results.sort()
+        return [name for _, _, name in results]
@@ -0,0 +1,58 @@
+import bisect
+
+import mido
+
+DEFAULT_TEMPO = 500000
+
+
+class SongTimeline:
+    """Tempo and meter changes of a song, to convert seconds and bars to ticks and back.
+
+    Every change is kept in parallel lists sorted by tick, each one valid until the next. A time
+    signature starts a new bar, like in the score, even if the previous bar isn't complete.
+    """
+
+    def __init__(self, ticks_per_beat=240):
+        self.ticks_per_beat = ticks_per_beat
+        self.tempo_ticks = [0]
+        self.tempo_seconds = [0.0]
+        self.tempos = [DEFAULT_TEMPO]
+        self.meter_ticks = [0]
+        # 0-based number of the first bar of each meter
+        self.meter_bars = [0]
+        self.bar_lengths = [4 * ticks_per_beat]
+
+    def add(self, tick, msg):
+        """Record msg at the absolute tick if it's a tempo or time signature change, ticks must not decrease"""
+        if msg.type == 'set_tempo':
+            seconds = self.tempo_seconds[-1] + mido.tick2second(tick - self.tempo_ticks[-1], self.ticks_per_beat,
+                                                                self.tempos[-1])
+            self.append((self.tempo_ticks, self.tempo_seconds, self.tempos), (tick, seconds, msg.tempo))
+        elif msg.type == 'time_signature':
+            bar = self.meter_bars[-1] - (self.meter_ticks[-1] - tick) // self.bar_lengths[-1]
+            bar_length = max(1, int(self.ticks_per_beat * 4 * msg.numerator / msg.denominator))
+            self.append((self.meter_ticks, self.meter_bars, self.bar_lengths), (tick, bar, bar_length))
+
+    @staticmethod
+    def append(lists, entry):
+        # a change at the tick of the previous one replaces it
+        if lists[0][-1] == entry[0]:
+            for values in lists:
+                values.pop()
+        for values, value in zip(lists, entry):
+            values.append(value)
+
+    def tick_at_second(self, seconds):
+        i = max(bisect.bisect_right(self.tempo_seconds, seconds) - 1, 0)
+        return self.tempo_ticks[i] + mido.second2tick(seconds - self.tempo_seconds[i], self.ticks_per_beat,
+                                                      self.tempos[i])
+
+    def tick_at_bar(self, bar):
+        """Tick at which the 0-based bar starts"""
+        i = max(bisect.bisect_right(self.meter_bars, bar) - 1, 0)
+        return self.meter_ticks[i] + (bar - self.meter_bars[i]) * self.bar_lengths[i]
+
+    def bar_at_tick(self, tick):
+        """0-based bar of the tick"""
+        i = max(bisect.bisect_right(self.meter_ticks, tick) - 1, 0)
+        return self.meter_bars[i] + (tick - self.meter_ticks[i]) // self.bar_lengths[i]
@@ -0,0 +1,47 @@
+import threading
+
+
+class StatusBoard:
+    """Current status of the application for the web interface, grouped by topic.
+
+    Every field remembers the version in which it last changed, so listeners can ask for
+    "what changed after version N" and wait for the next change instead of polling.
+    The code changing a value publishes it with update(), nothing reads the sources periodically.
+    """
+
+    def __init__(self):
+        self.values = {}
+        self.versions = {}
+        self.version = 0
+        self.changed = threading.Condition()
+
+    def update(self, topic, fields):
+        with self.changed:
+            current = self.values.setdefault(topic, {})
+            changed = False
+            for name, value in fields.items():
+                if name not in current or current[name] != value:
+                    self.version += 1
+                    current[name] = value
+                    self.versions[(topic, name)] = self.version
+                    changed = True
+            if changed:
+                self.changed.notify_all()
+
+    def changes(self, after=0, topics=None):
+        """({topic: {field: value}} changed after version `after`, current version)"""
+        with self.changed:
+            changes = {}
+            for (topic, name), version in self.versions.items():
+                if version > after and (topics is None or topic in topics):
+                    changes.setdefault(topic, {})[name] = self.values[topic][name]
+            return changes, self.version
+
+    def wait_for_changes(self, after, topics=None, timeout=None):
+        with self.changed:
+            self.changed.wait_for(lambda: any(version > after and (topics is None or topic in topics)
+                                              for (topic, _), version in self.versions.items()), timeout)
+        return self.changes(after, topics)
+
+
+status_board = StatusBoard()
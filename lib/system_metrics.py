@@ -0,0 +1,130 @@
+import collections
+import os
+import threading
+import time
+
+import psutil
+
+from lib.log_setup import logger
+
+# same fields as psutil.disk_usage(), rebuilt from a sample for the LCD screensaver
+DiskUsage = collections.namedtuple("DiskUsage", "total used free percent")
+
+
+class MetricsSampler:
+    """Samples system and process statistics in a background thread.
+
+    Readers (web API, LCD screensaver) get the latest sample or a slice of the history without
+    touching psutil themselves, so they never block on cpu_percent intervals or /proc reads.
+    """
+
+    def __init__(self, interval=1.0, capacity=600):
+        self.interval = interval
+        self.samples = collections.deque(maxlen=capacity)
+        self.lock = threading.Lock()
+        self.process = psutil.Process(os.getpid())
+        self.cpu_count = psutil.cpu_count()
+        self.get_led_fps = lambda: 0
+        self.thread = None
+        self.last_net = None
+        self.listeners = []
+
+    def start(self, get_led_fps=None):
+        """Start sampling, get_led_fps returns the current LED strip frame rate"""
+        if get_led_fps is not None:
+            self.get_led_fps = get_led_fps
+        with self.lock:
+            if self.thread is not None:
+                return
+            self.thread = threading.Thread(target=self.run, daemon=True)
+        self.thread.start()
+
+    def subscribe(self, callback):
+        """Call callback(sample) on the sampler thread after every sample"""
+        self.listeners.append(callback)
+        return callback
+
+    def run(self):
+        next_sample = time.perf_counter()
+        while True:
+            try:
+                sample = self.sample()
+                with self.lock:
+                    self.samples.append(sample)
+                for callback in list(self.listeners):
+                    callback(sample)
+            except Exception as e:
+                logger.warning("Can't sample system metrics: " + str(e))
+            next_sample += self.interval
+            time.sleep(max(0.0, next_sample - time.perf_counter()))
+
+    @staticmethod
+    def read_temperature():
+        try:
+            return round(float(psutil.sensors_temperatures()["cpu_thermal"][0].current), 1)
+        except Exception:
+            return 0
+
+    def sample(self):
+        now = time.time()
+        memory = psutil.virtual_memory()
+        net = psutil.net_io_counters()
+        card_space = psutil.disk_usage('/')
+        cpu_freq = psutil.cpu_freq()
+
+        # network rates in bytes per second since the previous sample
+        upload_rate = download_rate = 0
+        if self.last_net is not None:
+            elapsed = now - self.last_net[0]
+            if elapsed > 0:
+                upload_rate = max(0, net.bytes_sent - self.last_net[1]) / elapsed
+                download_rate = max(0, net.bytes_recv - self.last_net[2]) / elapsed
+        self.last_net = (now, net.bytes_sent, net.bytes_recv)
+
+        try:
+            led_fps = round(float(self.get_led_fps()), 2)
+        except Exception:
+            led_fps = 0
+
+        return {
+            'time': now,
+            # without interval both return the usage since the previous call, i.e. over the last interval
+            'cpu_usage': psutil.cpu_percent(),
+            'cpu_pid': self.process.cpu_percent(),
+            'cpu_freq': cpu_freq.current if cpu_freq else 0,
+            'memory_usage_percent': memory.percent,
+            'memory_usage_total': memory.total,
+            'memory_usage_used': memory.used,
+            'memory_pid': self.process.memory_info().rss,
+            'cpu_temp': self.read_temperature(),
+            'upload': net.bytes_sent,
+            'download': net.bytes_recv,
+            'upload_rate': round(upload_rate),
+            'download_rate': round(download_rate),
+            'card_space_used': card_space.used,
+            'card_space_total': card_space.total,
+            'card_space_percent': card_space.percent,
+            'led_fps': led_fps,
+        }
+
+    def latest(self):
+        """Most recent sample, taken right away if the sampler has not produced one yet"""
+        with self.lock:
+            if self.samples:
+                return dict(self.samples[-1])
+        sample = self.sample()
+        with self.lock:
+            self.samples.append(sample)
+        return dict(sample)
+
+    def history(self, seconds=None):
+        """Samples of the last `seconds` (all kept samples if None), oldest first"""
+        with self.lock:
+            samples = list(self.samples)
+        if seconds is not None:
+            since = time.time() - seconds
+            samples = [sample for sample in samples if sample['time'] >= since]
+        return samples
+
+
+metrics_sampler = MetricsSampler()
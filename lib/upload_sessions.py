@@ -0,0 +1,157 @@
+import hashlib
+import json
+import os
+import threading
+import time
+import zlib
+
+from lib.log_setup import logger
+
+# request bodies are read and written this many bytes at a time
+WRITE_CHUNK_SIZE = 64 * 1024
+# unfinished uploads are deleted after this many seconds
+UPLOAD_EXPIRY = 24 * 60 * 60
+
+
+def file_crc32(path):
+    crc = 0
+    with open(path, "rb") as source:
+        for chunk in iter(lambda: source.read(WRITE_CHUNK_SIZE), b""):
+            crc = zlib.crc32(chunk, crc)
+    return "%08x" % crc
+
+
+class UploadSessions:
+    """Chunked uploads into the songs folder which survive dropped connections and restarts.
+
+    An upload is identified by its file name, size and CRC-32, so starting the same upload again
+    returns the offset to continue from. Chunks are appended to a .part file in the uploads
+    folder (on the same file system as the songs folder) and the finished file is checked and
+    renamed into place, the songs folder never holds a partial file.
+    """
+
+    def __init__(self, songs_dir="Songs", uploads_dir="Songs/cache/uploads", max_size=32 * 1000 * 1000):
+        self.songs_dir = songs_dir
+        self.uploads_dir = uploads_dir
+        self.max_size = max_size
+        self.lock = threading.Lock()
+        self.busy = set()
+
+    def paths(self, upload_id):
+        base = os.path.join(self.uploads_dir, upload_id)
+        return base + ".part", base + ".json"
+
+    def read_session(self, upload_id):
+        if not upload_id or not upload_id.isalnum():
+            raise ValueError("unknown upload")
+        part_path, info_path = self.paths(upload_id)
+        try:
+            with open(info_path) as info_file:
+                session = json.load(info_file)
+            session["offset"] = os.path.getsize(part_path)
+        except (OSError, ValueError):
+            raise ValueError("unknown upload") from None
+        return session
+
+    def init(self, filename, size, checksum):
+        """Start or resume an upload, returns (upload id, offset to continue from)"""
+        checksum = checksum.lower()
+        if size > self.max_size:
+            raise ValueError("file too large")
+        if len(checksum) != 8 or any(char not in "0123456789abcdef" for char in checksum):
+            raise ValueError("invalid checksum")
+        upload_id = hashlib.sha1((filename + "\0" + str(size) + "\0" + checksum).encode()).hexdigest()[:20]
+        part_path, info_path = self.paths(upload_id)
+        with self.lock:
+            self.remove_expired()
+            if not (os.path.isfile(info_path) and os.path.isfile(part_path)):
+                os.makedirs(self.uploads_dir, exist_ok=True)
+                open(part_path, "wb").close()
+                with open(info_path, "w") as info_file:
+                    json.dump({"filename": filename, "size": size, "checksum": checksum, "created": time.time()},
+                              info_file)
+        return upload_id, os.path.getsize(part_path)
+
+    def append(self, upload_id, offset, stream, length):
+        """Write `length` bytes of `stream` at `offset`, returns the new offset.
+
+        The offset must be where the upload stands, a chunk that was already received is not
+        written twice. A chunk cut short is dropped, the upload continues from before it.
+        """
+        with self.lock:
+            session = self.read_session(upload_id)
+            if upload_id in self.busy:
+                raise ValueError("upload busy")
+            if offset != session["offset"]:
+                raise ValueError("offset mismatch")
+            if offset + length > session["size"]:
+                raise ValueError("chunk beyond the end of the file")
+            self.busy.add(upload_id)
+        part_path, _ = self.paths(upload_id)
+        try:
+            received = 0
+            with open(part_path, "r+b") as part:
+                part.seek(offset)
+                while received < length:
+                    chunk = stream.read(min(WRITE_CHUNK_SIZE, length - received))
+                    if not chunk:
+                        break
+                    part.write(chunk)
+                    received += len(chunk)
+                if received < length:
+                    part.truncate(offset)
+                    raise ValueError("incomplete chunk")
+            return offset + received
+        finally:
+            with self.lock:
+                self.busy.discard(upload_id)
+
+    def offset(self, upload_id):
+        return self.read_session(upload_id)["offset"]
+
+    def commit(self, upload_id):
+        """Check the finished upload and move it into the songs folder, returns its file name"""
+        with self.lock:
+            session = self.read_session(upload_id)
+            if upload_id in self.busy:
+                raise ValueError("upload busy")
+            if session["offset"] != session["size"]:
+                raise ValueError("upload incomplete")
+            part_path, info_path = self.paths(upload_id)
+            if file_crc32(part_path) != session["checksum"]:
+                # corrupted on the way, start over
+                self.remove(upload_id)
+                raise ValueError("checksum mismatch")
+            target = os.path.join(self.songs_dir, session["filename"])
+            if os.path.exists(target):
+                raise ValueError("file already exists")
+            os.replace(part_path, target)
+            os.remove(info_path)
+        return session["filename"]
+
+    def remove(self, upload_id):
+        for path in self.paths(upload_id):
+            try:
+                os.remove(path)
+            except OSError:
+                pass
+
+    def remove_expired(self):
+        try:
+            names = os.listdir(self.uploads_dir)
+        except OSError:
+            return
+        now = time.time()
+        for name in names:
+            upload_id, extension = os.path.splitext(name)
+            if extension != ".json" or upload_id in self.busy:
+                continue
+            try:
+                if now - os.path.getmtime(os.path.join(self.uploads_dir, upload_id + ".part")) > UPLOAD_EXPIRY:
+                    logger.info("Removing expired upload of " + self.read_session(upload_id)["filename"])
+                    self.remove(upload_id)
+            except (OSError, ValueError):
+                self.remove(upload_id)
+
+
+upload_sessions = UploadSessions()
@@ -1,27 +1,86 @@
 from xml.etree import ElementTree as ET
+import ast
+import os
+import threading
 import time
 from functools import reduce
 from lib.log_setup import logger
+from lib.settings_bus import settings_bus, SETTINGS_RESET
+
+# Parsers of the settings read as typed values, settings not listed here are plain strings.
+# literal_eval is kept where the stored text may be a Python literal (lists, True/False).
+SETTING_TYPES = {
+    "midi_logging": int,
+    "practice": int,
+    "hands": int,
+    "mute_hand": int,
+    "start_point": float,
+    "end_point": float,
+    "set_tempo": int,
+    "hand_colorR": int,
+    "hand_colorL": int,
+    "show_wrong_notes": int,
+    "show_future_notes": int,
+    "hand_colorList": ast.literal_eval,
+    "is_loop_active": ast.literal_eval,
+    "number_of_mistakes": ast.literal_eval,
+    "is_led_activeL": ast.literal_eval,
+    "is_led_activeR": ast.literal_eval,
+    "input_latencies": ast.literal_eval,
+    "brightness_percent": int,
+    "led_count": int,
+    "led_gamma": float,
+    "screen_on": int,
+}
+
+# changes are written once no setting changed for SAVE_DELAY seconds, at the latest MAX_SAVE_DELAY
+# seconds after the first unsaved change (a dragged slider changes a setting many times a second)
+SAVE_DELAY = 1
+MAX_SAVE_DELAY = 10
+
+
+class TypedSettings:
+    """Attribute view of the typed settings: usersettings.values.midi_logging"""
+
+    def __init__(self, usersettings):
+        self._usersettings = usersettings
+
+    def __getattr__(self, name):
+        return self._usersettings.typed(name)
 
 
 class UserSettings:
-    def __init__(self, config="config/settings.xml", default_config="config/default_settings.xml"):
+    def __init__(self, config="config/settings.xml", default_config="config/default_settings.xml",
+                 save_delay=SAVE_DELAY, max_save_delay=MAX_SAVE_DELAY):
         self.cache = {}
+        # parsed values by key, dropped when the setting changes
+        self.typed_cache = {}
+        # held while a value changes in the cache and while a parsed value is stored, so a value
+        # parsed from a string which was replaced in the meantime is never cached
+        self.typed_lock = threading.Lock()
+        self.subscribers = {}
+        self.values = TypedSettings(self)
 
         self.CONFIG_FILE = config
         self.DEFAULT_CONFIG_FILE = default_config
         self.pending_changes = False
         self.last_save = 0
+        self.save_delay = save_delay
+        self.max_save_delay = max_save_delay
+        # time of the first and the last change since the last save
+        self.first_change = 0
+        self.last_change = 0
+        # the file as last written, a save which wouldn't change it is skipped
+        self.saved_content = None
 
         try:
             self.tree = ET.parse(self.CONFIG_FILE)
             self.root = self.tree.getroot()
             self.xml_to_dict(self.cache, self.root)
+            self.saved_content = ET.tostring(self.root)
         except:
             logger.warning("Can't load settings file, restoring defaults")
-            self.reset_to_default()
-
-        self.pending_reset = False
+            self.load_defaults()
 
         self.copy_missing()
         if self.pending_changes:
@@ -49,6 +108,62 @@ class UserSettings:
     def get_copy(self):
         return self.cache.copy()
 
+    def typed(self, key):
+        """Value of a setting parsed with its SETTING_TYPES parser, parsed once per change.
+
+        The returned value is shared by all readers and must not be modified.
+        """
+        cache_key = key if isinstance(key, str) else tuple(key)
+        try:
+            return self.typed_cache[cache_key]
+        except KeyError:
+            pass
+        raw = self[key]
+        value = raw
+        if isinstance(key, str) and key in SETTING_TYPES:
+            value = SETTING_TYPES[key](raw)
+        with self.typed_lock:
+            if self.get(key) is raw:
+                self.typed_cache[cache_key] = value
+        return value
+
+    def subscribe(self, key, callback):
+        """Call callback(typed value) whenever the setting changes, e.g. to keep a copy on a hot path"""
+        cache_key = key if isinstance(key, str) else tuple(key)
+        self.subscribers.setdefault(cache_key, []).append(callback)
+        return callback
+
+    def unsubscribe(self, key, callback):
+        cache_key = key if isinstance(key, str) else tuple(key)
+        try:
+            self.subscribers[cache_key].remove(callback)
+        except (KeyError, ValueError):
+            pass
+
+    def notify(self, keys):
+        for cache_key in keys:
+            with self.typed_lock:
+                self.typed_cache.pop(cache_key, None)
+            callbacks = self.subscribers.get(cache_key)
+            if not callbacks:
+                continue
+            try:
+                value = self.typed(cache_key)
+            except Exception as e:
+                logger.warning("Invalid value of setting " + str(cache_key) + ": " + str(e))
+                continue
+            for callback in list(callbacks):
+                try:
+                    callback(value)
+                except Exception as e:
+                    logger.warning("Setting subscriber of " + str(cache_key) + " failed: " + str(e))
+
+    def notify_all(self):
+        # the whole cache was reloaded
+        with self.typed_lock:
+            self.typed_cache.clear()
+        self.notify(list(self.subscribers))
+
 
     # set setting
 
@@ -56,11 +171,20 @@ class UserSettings:
         val = str(value)
         self._xml_set(key, val)
 
-        if isinstance(key, str):
-            self.cache[key] = val
-        elif hasattr(key, '__iter__'):
-            d = reduce(dict.__getitem__, key[:-1], self.cache)
-            d[key[-1]] = val
+        with self.typed_lock:
+            if isinstance(key, str):
+                changed = self.cache.get(key) != val
+                self.cache[key] = val
+            elif hasattr(key, '__iter__'):
+                d = reduce(dict.__getitem__, key[:-1], self.cache)
+                changed = d.get(key[-1]) != val
+                d[key[-1]] = val
+                key = tuple(key)
+            if changed:
+                self.typed_cache.pop(key, None)
+
+        if changed:
+            self.notify([key])
 
     def set(self, key, value):
         self.__setitem__(key, value)
@@ -91,24 +215,69 @@ class UserSettings:
             raise Exception("XML path not found: " + xpath) 
 
         elem.text = str(value)
+        self.mark_changed()
+
+    def mark_changed(self):
+        now = time.time()
+        if not self.pending_changes:
+            self.first_change = now
+        self.last_change = now
         self.pending_changes = True
 
+    def save_due(self):
+        """True when there are unsaved changes and the save shouldn't be put off any longer"""
+        if not self.pending_changes:
+            return False
+        now = time.time()
+        return now - self.last_change >= self.save_delay or now - self.first_change >= self.max_save_delay
+
     def save_changes(self):
         if self.pending_changes:
+            # cleared first, a change made while writing is saved the next time
             self.pending_changes = False
-
-            self.tree.write(self.CONFIG_FILE)
-            self.tree = ET.parse(self.CONFIG_FILE)
-            self.root = self.tree.getroot()
-            self.xml_to_dict(self.cache, self.root)
+            try:
+                self.write_file(ET.tostring(self.root))
+            except OSError as e:
+                logger.warning("Can't save settings file: " + str(e))
+                self.mark_changed()
             self.last_save = time.time()
 
+    def write_file(self, content):
+        """Replace the settings file with content, unless it already holds it.
+
+        The content goes to a temporary file which is synced and renamed over the settings
+        file, so a crash or power loss leaves either the old or the new file, never a partial one.
+        """
+        if content == self.saved_content:
+            return
+        temp_file = self.CONFIG_FILE + ".tmp"
+        with open(temp_file, "wb") as file:
+            file.write(content)
+            file.flush()
+            os.fsync(file.fileno())
+        os.replace(temp_file, self.CONFIG_FILE)
+        try:
+            # make the rename itself durable
+            directory = os.open(os.path.dirname(os.path.abspath(self.CONFIG_FILE)), os.O_RDONLY)
+            try:
+                os.fsync(directory)
+            finally:
+                os.close(directory)
+        except OSError:
+            pass
+        self.saved_content = content
+
     def reset_to_default(self):
+        self.load_defaults()
+        # the main loop recreates everything that was set up from the old settings
+        settings_bus.publish(SETTINGS_RESET)
+
+    def load_defaults(self):
         self.tree = ET.parse(self.DEFAULT_CONFIG_FILE)
-        self.tree.write(self.CONFIG_FILE)
         self.root = self.tree.getroot()
+        self.write_file(ET.tostring(self.root))
         self.xml_to_dict(self.cache, self.root)
-        self.pending_reset = True
+        self.notify_all()
         self.last_save = time.time()
 
     def xml_to_dict(self, dict, node):
@@ -150,10 +319,11 @@ class UserSettings:
                         parent_elem = self.root.find(parent_find)
                     
                     parent_elem.insert(0, def_elem)     # better indentation preservation when inserting at top, vs append
-                    self.pending_changes = True
+                    self.mark_changed()
 
             elif event == 'end':
                 path.pop()
 
         if self.pending_changes:
             self.xml_to_dict(self.cache, self.root)
+            self.notify_all()
@@ -37,6 +37,7 @@ class WebInterfaceManager:
             app_state.menu = self.menu
             app_state.hotspot = self.hotspot
             app_state.platform = self.platform
+            web_mod.views_api.start_status_updates()
 
             webinterface.jinja_env.auto_reload = True
             webinterface.config['TEMPLATES_AUTO_RELOAD'] = True
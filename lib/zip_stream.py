@@ -0,0 +1,62 @@
+import zipfile
+
+from lib.log_setup import logger
+
+# bytes read from a file at a time, about the most a single yielded piece holds
+CHUNK_SIZE = 64 * 1024
+
+
+class ChunkWriter:
+    """Write-only sink for ZipFile, the written bytes are taken out after every chunk.
+
+    It has no tell() or seek(), so ZipFile writes sizes and checksums after the data
+    (data descriptors) instead of going back to patch the headers.
+    """
+
+    def __init__(self):
+        self.chunks = []
+
+    def write(self, data):
+        self.chunks.append(bytes(data))
+        return len(data)
+
+    def flush(self):
+        pass
+
+    def take(self):
+        data = b"".join(self.chunks)
+        self.chunks.clear()
+        return data
+
+
+def stream_zip(files, chunk_size=CHUNK_SIZE):
+    """Yield a ZIP archive of (path, name in the archive) pairs piece by piece.
+
+    Nothing is written to disk and only one chunk is held in memory, so it can be returned
+    as a streamed response. Files which can't be read are left out.
+    """
+    output = ChunkWriter()
+    with zipfile.ZipFile(output, "w", zipfile.ZIP_DEFLATED) as archive:
+        for path, name in files:
+            try:
+                source = open(path, "rb")
+            except OSError as e:
+                logger.warning("Can't add " + path + " to the archive: " + str(e))
+                continue
+            with source:
+                info = zipfile.ZipInfo.from_file(path, name)
+                info.compress_type = zipfile.ZIP_DEFLATED
+                with archive.open(info, "w") as entry:
+                    while True:
+                        chunk = source.read(chunk_size)
+                        if not chunk:
+                            break
+                        entry.write(chunk)
+                        data = output.take()
+                        if data:
+                            yield data
+            data = output.take()
+            if data:
+                yield data
+    # central directory
+    yield output.take()
@@ -0,0 +1,52 @@
+#!/usr/bin/env python3
+
+import sys
+sys.path.append('./')
+sys.path.append('../')
+import asyncio
+import threading
+import unittest
+from lib.broadcast import BroadcastHub
+
+
+class TestBroadcastHub(unittest.TestCase):
+    def test_01_cursors(self):
+        hub = BroadcastHub(capacity=3)
+        hub.append("before")
+
+        async def subscribe():
+            return hub.subscribe()
+        cursor, _ = asyncio.run(subscribe())
+
+        for i in range(2):
+            hub.append(i)
+        self.assertEqual(hub.read(cursor), ([0, 1], 3))
+        self.assertEqual(hub.read(3), ([], 3))
+
+        # a subscriber that fell behind the buffer skips the dropped messages
+        for i in range(2, 6):
+            hub.append(i)
+        self.assertEqual(hub.read(3), ([3, 4, 5], 7))
+
+    def test_02_fan_out_from_thread(self):
+        hub = BroadcastHub()
+
+        async def main():
+            hub.attach_loop(asyncio.get_running_loop())
+            clients = [hub.subscribe() for _ in range(2)]
+            threading.Thread(target=lambda: [hub.append(i) for i in range(10)]).start()
+            received = []
+            for cursor, wakeup in clients:
+                await asyncio.wait_for(wakeup.wait(), 2)
+                await asyncio.sleep(0.05)
+                received.append(hub.read(cursor)[0])
+                hub.unsubscribe(wakeup)
+            return received
+
+        received = asyncio.run(main())
+        self.assertEqual(received, [list(range(10))] * 2)
+        self.assertEqual(hub.subscribers, set())
+
+
+if __name__ == '__main__':
+    unittest.main()
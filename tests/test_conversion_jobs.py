@@ -0,0 +1,97 @@
+#!/usr/bin/env python3
+
+import sys
+sys.path.append('./')
+sys.path.append('../')
+import os
+import shutil
+import tempfile
+import threading
+import time
+import unittest
+from lib.conversion_jobs import ConversionQueue, CONVERTER_NICENESS
+from lib.status_board import status_board
+
+# stand-ins for the external converters: copy the source, sleep for a while or fail
+COPY = [sys.executable, "-c", "import shutil, sys; shutil.copy(sys.argv[1], sys.argv[2])", "{source}", "{target}"]
+SLOW = [sys.executable, "-c", "import time; time.sleep(30)", "{source}", "{target}"]
+FAIL = [sys.executable, "-c", "import sys; sys.exit('bad score')", "{source}", "{target}"]
+NICENESS = [sys.executable, "-c", "import os, sys; open(sys.argv[2], 'w').write(str(os.nice(0)))", "{source}", "{target}"]
+
+
+def wait_for(queue, job_id, timeout=10):
+    deadline = time.time() + timeout
+    while time.time() < deadline:
+        job = queue.get(job_id)
+        if job["state"] in ("done", "failed", "cancelled"):
+            return job
+        time.sleep(0.02)
+    raise AssertionError("job did not finish")
+
+
+class TestConversionJobs(unittest.TestCase):
+    def setUp(self):
+        self.folder = tempfile.mkdtemp()
+        for name in ("song.abc", "slow.musicxml", "bad.mxl", "song.mid"):
+            with open(os.path.join(self.folder, name), "w") as song_file:
+                song_file.write("X:1\n")
+        self.queue = ConversionQueue(self.folder, converters={
+            (".abc", ".mid"): [["missing-converter"], COPY],
+            (".musicxml", ".mid"): [SLOW],
+            (".mxl", ".mid"): [FAIL],
+        })
+
+    def tearDown(self):
+        shutil.rmtree(self.folder)
+
+    def test_01_convert_and_cache(self):
+        os.remove(os.path.join(self.folder, "song.mid"))
+        finished = threading.Event()
+        job = self.queue.submit("song.abc", ".mid", lambda job: finished.set())
+        result = wait_for(self.queue, job.id)
+        self.assertEqual(result["state"], "done")
+        self.assertEqual(result["target"], "song.mid")
+        self.assertTrue(finished.wait(1))
+        # the finished job was pushed to the status board
+        self.assertIn(result, status_board.values["conversion"]["jobs"])
+        self.assertTrue(os.path.isfile(os.path.join(self.folder, "song.mid")))
+        # nothing left behind in the cache folder
+        self.assertEqual(os.listdir(os.path.join(self.folder, "cache")), [])
+
+        # up to date result is reused without running the converter
+        cached = self.queue.submit("song.abc", ".mid")
+        self.assertEqual(cached.state, "done")
+        self.assertTrue(cached.cached)
+
+    def test_02_cancel_running_job(self):
+        job = self.queue.submit("slow.musicxml", ".mid")
+        # the same conversion is not queued twice
+        self.assertIs(self.queue.submit("slow.musicxml", ".mid"), job)
+        deadline = time.time() + 5
+        while job.state != "running" and time.time() < deadline:
+            time.sleep(0.01)
+        self.assertTrue(self.queue.cancel(job.id))
+        self.assertEqual(wait_for(self.queue, job.id)["state"], "cancelled")
+        self.assertFalse(os.path.exists(os.path.join(self.folder, "slow.mid")))
+        self.assertFalse(self.queue.cancel(job.id))
+
+    def test_03_failures(self):
+        job = self.queue.submit("bad.mxl", ".mid")
+        result = wait_for(self.queue, job.id)
+        self.assertEqual(result["state"], "failed")
+        self.assertEqual(result["error"], "bad score")
+        with self.assertRaises(ValueError):
+            self.queue.submit("song.mid", ".abc")
+        with self.assertRaises(ValueError):
+            self.queue.submit("missing.abc", ".mid")
+
+    def test_04_lower_priority(self):
+        queue = ConversionQueue(self.folder, converters={(".abc", ".mid"): [NICENESS]})
+        os.remove(os.path.join(self.folder, "song.mid"))
+        self.assertEqual(wait_for(queue, queue.submit("song.abc", ".mid").id)["state"], "done")
+        with open(os.path.join(self.folder, "song.mid")) as result:
+            self.assertEqual(int(result.read()), min(19, os.nice(0) + CONVERTER_NICENESS))
+
+
+if __name__ == '__main__':
+    unittest.main()
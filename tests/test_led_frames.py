@@ -0,0 +1,99 @@
+#!/usr/bin/env python3
+
+import asyncio
+import struct
+import sys
+sys.path.append('./')
+sys.path.append('../')
+import unittest
+from lib.led_frames import LedFrameEncoder, LedFrameProducer, RUN_HEADER
+
+
+def decode(frame, leds):
+    if frame[:1] == b"K":
+        count = struct.unpack_from("<H", frame, 1)[0]
+        return [int.from_bytes(frame[3 + i * 3:6 + i * 3], "big") for i in range(count)]
+    leds = list(leds)
+    offset = 1
+    while offset < len(frame):
+        start, length = RUN_HEADER.unpack_from(frame, offset)
+        offset += RUN_HEADER.size
+        for i in range(length):
+            leds[start + i] = int.from_bytes(frame[offset:offset + 3], "big")
+            offset += 3
+    return leds
+
+
+class TestLedFrames(unittest.TestCase):
+    def setUp(self):
+        self.encoder = LedFrameEncoder()
+
+    def test_01_keyframe_then_delta(self):
+        pixels = [0] * 176
+        frame = self.encoder.encode(pixels)
+        self.assertEqual(frame[:1], b"K")
+        self.assertEqual(len(frame), 3 + 176 * 3)
+        leds = decode(frame, None)
+
+        pixels[10] = 0xFF0000
+        pixels[12] = 0x00FF00
+        pixels[100] = 0x0000FF | (0x20 << 24)
+        frame = self.encoder.encode(pixels)
+        self.assertEqual(frame[:1], b"D")
+        # leds 10-12 in one run, led 100 in another
+        self.assertEqual(len(frame), 1 + 2 * RUN_HEADER.size + 4 * 3)
+        leds = decode(frame, leds)
+        self.assertEqual(leds, [pixel & 0xFFFFFF for pixel in pixels])
+
+    def test_02_unchanged_and_reset(self):
+        pixels = [0x101010] * 20
+        self.encoder.encode(pixels)
+        self.assertIsNone(self.encoder.encode(pixels))
+        self.encoder.reset()
+        self.assertEqual(self.encoder.encode(pixels)[:1], b"K")
+        # a delta that would be larger than a keyframe is sent as keyframe
+        self.assertEqual(self.encoder.encode([0x202020 if i % 2 else 0 for i in range(20)])[:1], b"K")
+
+    def test_03_shared_producer(self):
+        class FakeSocket:
+            def __init__(self, delay):
+                self.delay = delay
+                self.frames = []
+
+            async def send(self, frame):
+                await asyncio.sleep(self.delay)
+                self.frames.append(frame)
+
+        pixels = [0] * 50
+        reads = []
+
+        def get_pixels():
+            reads.append(1)
+            pixels[len(reads) % 50] = len(reads)
+            return pixels
+
+        async def run():
+            producer = LedFrameProducer(get_pixels)
+            fast, slow = FakeSocket(0), FakeSocket(0.05)
+            clients = [producer.add_client(fast, 50), producer.add_client(slow, 50)]
+            await asyncio.sleep(0.3)
+            for client in clients:
+                producer.remove_client(client)
+            await producer.task
+            return fast, slow
+
+        fast, slow = asyncio.run(run())
+        # one strip read per tick for both clients, the slow one skipped frames
+        self.assertLessEqual(len(reads), 20)
+        self.assertGreater(len(fast.frames), 2 * len(slow.frames))
+        # every frame decodes to the strip state at some tick
+        for socket in (fast, slow):
+            leds = None
+            for frame in socket.frames:
+                leds = decode(frame, leds)
+            self.assertEqual(len(leds), 50)
+        self.assertEqual(slow.frames[0][:1], b"K")
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,35 @@
+#!/usr/bin/env python3
+
+import sys
+sys.path.append('./')
+sys.path.append('../')
+import threading
+import unittest
+from lib.log_setup import RingBufferHandler
+
+
+class TestRingBufferHandler(unittest.TestCase):
+    def setUp(self):
+        self.handler = RingBufferHandler(capacity=5)
+        for i in range(8):
+            self.handler.append_line("line " + str(i))
+
+    def test_01_capacity(self):
+        lines = self.handler.get_lines(limit=10)
+        self.assertEqual([line for _, line in lines], ["line 3", "line 4", "line 5", "line 6", "line 7"])
+        self.assertEqual(self.handler.last_seq, 8)
+
+    def test_02_cursors(self):
+        self.assertEqual([seq for seq, _ in self.handler.get_lines(limit=2)], [7, 8])
+        self.assertEqual([seq for seq, _ in self.handler.get_lines(before=7, limit=2)], [5, 6])
+        self.assertEqual([seq for seq, _ in self.handler.get_lines(after=5, limit=2)], [6, 7])
+        self.assertEqual(self.handler.get_lines(after=8), [])
+
+    def test_03_wait_for_lines(self):
+        threading.Timer(0.05, self.handler.append_line, args=("new",)).start()
+        self.assertEqual(self.handler.wait_for_lines(8, timeout=2), [(9, "new")])
+        self.assertEqual(self.handler.wait_for_lines(9, timeout=0.01), [])
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,72 @@
+#!/usr/bin/env python3
+
+import sys
+sys.path.append('./')
+sys.path.append('../')
+import time
+import unittest
+import mido
+from lib.note_scheduler import NoteScheduler
+
+
+class RecordingPort:
+    def __init__(self):
+        self.sent = []
+
+    def send(self, msg):
+        self.sent.append((time.perf_counter(), msg))
+
+
+class Ports:
+    def __init__(self):
+        self.playport = RecordingPort()
+
+
+class TestNoteScheduler(unittest.TestCase):
+    def setUp(self):
+        self.ports = Ports()
+        self.scheduler = NoteScheduler(self.ports)
+
+    def wait_for_sent(self, count, timeout=2):
+        # generous, the scheduler thread may be late on a loaded machine
+        give_up = time.perf_counter() + timeout
+        while len(self.ports.playport.sent) < count and time.perf_counter() < give_up:
+            time.sleep(0.01)
+        return self.ports.playport.sent
+
+    def test_01_deadlines(self):
+        start = time.perf_counter()
+        self.scheduler.schedule(mido.Message('note_on', note=62, velocity=64), start + 0.1)
+        self.scheduler.schedule(mido.Message('note_on', note=60, velocity=64), start + 0.05)
+
+        sent = self.wait_for_sent(2)
+        self.assertEqual([msg.note for _, msg in sent], [60, 62])
+        self.assertGreaterEqual(sent[0][0], start + 0.049)
+        self.assertGreaterEqual(sent[1][0], start + 0.099)
+
+    def test_02_same_instant_burst(self):
+        deadline = time.perf_counter() + 0.05
+        for note in (60, 64, 67):
+            self.scheduler.schedule(mido.Message('note_on', note=note, velocity=64), deadline)
+
+        sent = self.wait_for_sent(3)
+        # in scheduling order, none of them early
+        self.assertEqual([msg.note for _, msg in sent], [60, 64, 67])
+        for sent_at, _ in sent:
+            self.assertGreaterEqual(sent_at, deadline - 0.001)
+
+    def test_03_cancel(self):
+        self.scheduler.send_now([mido.Message('note_on', note=48, velocity=64)])
+        self.scheduler.schedule(mido.Message('note_off', note=48), time.perf_counter() + 0.05)
+        self.scheduler.schedule(mido.Message('note_on', note=50, velocity=64), time.perf_counter() + 0.05)
+        self.scheduler.cancel()
+        time.sleep(0.1)
+
+        sent = [msg for _, msg in self.ports.playport.sent]
+        self.assertEqual(len(sent), 2)
+        self.assertEqual((sent[1].type, sent[1].note), ('note_off', 48))
+        self.assertEqual(self.scheduler.sounding, set())
+
+
+if __name__ == '__main__':
+    unittest.main()
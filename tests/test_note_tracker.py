@@ -0,0 +1,63 @@
+#!/usr/bin/env python3
+
+import sys
+sys.path.append('./')
+sys.path.append('../')
+import unittest
+from lib.note_tracker import NoteTracker, mask_to_notes
+
+
+class TestNoteTracker(unittest.TestCase):
+    def setUp(self):
+        self.nt = NoteTracker()
+        self.nt.expect(60, 1)
+        self.nt.expect(64, 1)
+        self.nt.expect(40, 2)
+
+    def test_01_complete(self):
+        self.assertTrue(self.nt.has_expected())
+        self.assertFalse(self.nt.is_complete())
+
+        self.assertTrue(self.nt.press(60, 1))
+        self.assertTrue(self.nt.press(64, 1))
+        self.assertFalse(self.nt.is_complete())
+        self.assertEqual(self.nt.missing(), 1 << 40)
+
+        self.assertTrue(self.nt.press(40, 1))
+        self.assertTrue(self.nt.is_complete())
+
+    def test_02_repeat_and_release(self):
+        self.assertTrue(self.nt.press(60, 1))
+        self.assertFalse(self.nt.press(60, 1))
+
+        self.nt.release(60)
+        self.assertEqual(self.nt.progress(), 0)
+        self.assertTrue(self.nt.press(60, 1))
+
+    def test_03_wrong(self):
+        self.assertFalse(self.nt.press(61, 2))
+        self.assertEqual(self.nt.wrong[2], 1 << 61)
+        self.assertEqual(self.nt.wrong_all, 1 << 61)
+        self.assertFalse(self.nt.is_complete())
+
+        self.nt.release(61)
+        self.assertEqual(self.nt.wrong_all, 0)
+
+    def test_04_per_hand(self):
+        self.nt.press(60, 2)
+        self.assertEqual(self.nt.progress(1), 0.5)
+        self.assertEqual(self.nt.progress(2), 0)
+        self.assertEqual(list(mask_to_notes(self.nt.missing(1))), [64])
+        self.assertEqual(list(mask_to_notes(self.nt.missing())), [40, 64])
+
+    def test_05_clear(self):
+        self.nt.press(60, 1)
+        self.nt.clear()
+        self.assertFalse(self.nt.has_expected())
+        self.assertTrue(self.nt.is_complete())
+        self.assertFalse(self.nt.is_expected(60))
+        self.assertEqual(self.nt.progress(), 1.0)
+
+
+if __name__ == '__main__':
+    unittest.main()
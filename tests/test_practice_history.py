@@ -0,0 +1,56 @@
+#!/usr/bin/env python3
+
+import sys
+sys.path.append('./')
+sys.path.append('../')
+import os
+import tempfile
+import unittest
+from lib.practice_history import PracticeHistory
+
+
+def make_session(song, started_at, score):
+    return {"song": song, "started_at": started_at, "duration": 60.0, "score": score, "max_combo": 12,
+            "tempo": 100, "hands": 0, "practice": 0, "start_point": 0.0, "end_point": 100.0,
+            "notes": 40, "mistakes": 3, "mean_delay": 0.05, "summary": {"bar_count": 4}}
+
+
+class TestPracticeHistory(unittest.TestCase):
+    def setUp(self):
+        self.tmpdir = tempfile.TemporaryDirectory()
+        self.history = PracticeHistory(os.path.join(self.tmpdir.name, "history.db"))
+
+    def tearDown(self):
+        self.tmpdir.cleanup()
+
+    def test_01_song_history(self):
+        for i in range(5):
+            self.history.record_session(make_session("a.mid", 1000 + i, 100 * i))
+        self.history.record_session(make_session("b.mid", 2000, 50))
+        self.history.flush()
+
+        sessions = self.history.get_song_history("a.mid")
+        self.assertEqual([s["score"] for s in sessions], [0, 100, 200, 300, 400])
+        self.assertNotIn("summary", sessions[0])
+
+        sessions = self.history.get_song_history("a.mid", since=1002, limit=2)
+        self.assertEqual([s["started_at"] for s in sessions], [1003, 1004])
+
+        session = self.history.get_session(sessions[0]["id"])
+        self.assertEqual(session["summary"], {"bar_count": 4})
+        self.assertIsNone(self.history.get_session(12345))
+
+    def test_02_overview(self):
+        self.history.record_session(make_session("a.mid", 1000, 100))
+        self.history.record_session(make_session("a.mid", 1001, 300))
+        self.history.record_session(make_session("b.mid", 900, 50))
+        self.history.flush()
+
+        overview = self.history.get_songs_overview()
+        self.assertEqual([row["song"] for row in overview], ["a.mid", "b.mid"])
+        self.assertEqual(overview[0]["sessions"], 2)
+        self.assertEqual(overview[0]["best_score"], 300)
+
+
+if __name__ == '__main__':
+    unittest.main()
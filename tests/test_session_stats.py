@@ -0,0 +1,47 @@
+#!/usr/bin/env python3
+
+import sys
+sys.path.append('./')
+sys.path.append('../')
+import unittest
+from lib.session_stats import SessionRecorder, summarize_session
+
+
+class TestSessionStats(unittest.TestCase):
+    def setUp(self):
+        self.recorder = SessionRecorder()
+
+    def test_01_per_bar_series(self):
+        for bar, delay in ((2, 0.1), (2, 0.3), (4, -0.2)):
+            self.recorder.add_note(1, delay, bar)
+        self.recorder.add_mistake(2, 3)
+        self.recorder.add_mistake(2, 3)
+
+        summary = summarize_session(self.recorder.snapshot(), 2.0)
+        self.assertEqual(summary["first_bar"], 3)
+        self.assertEqual(summary["bar_count"], 3)
+        self.assertEqual(summary["r"]["bar_delay"], [0.2, None, -0.2])
+        self.assertEqual(summary["r"]["notes"], 3)
+        self.assertEqual(summary["l"]["bar_mistakes"], [0, 2, 0])
+        self.assertEqual(summary["l"]["mistakes"], 2)
+        self.assertEqual(sum(summary["r"]["histogram"]), 3)
+
+    def test_02_tendency(self):
+        for bar in range(8):
+            self.recorder.add_note(1, 0.02 * bar, bar)
+            self.recorder.add_note(2, -0.1, bar)
+
+        summary = summarize_session(self.recorder.snapshot(), 2.0)
+        self.assertEqual(summary["r"]["tendency"], "dragging")
+        self.assertAlmostEqual(summary["r"]["trend"], 0.02, places=3)
+        self.assertEqual(summary["l"]["tendency"], "rushing")
+
+    def test_03_empty(self):
+        summary = summarize_session(self.recorder.snapshot(), 2.0)
+        self.assertEqual(summary["bar_count"], 0)
+        self.assertEqual(summary["r"]["bar_accuracy"], [])
+        self.assertEqual(summary["l"]["notes"], 0)
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,102 @@
+#!/usr/bin/env python3
+
+import sys
+sys.path.append('./')
+sys.path.append('../')
+import types
+import unittest
+from unittest import mock
+from webinterface import app_state
+import webinterface.setting_handlers as setting_handlers
+from lib.settings_bus import settings_bus, COLOR_MODE
+
+
+class FakeUserSettings:
+    def __init__(self):
+        self.values = {}
+
+    def change_setting_value(self, name, value):
+        self.values[name] = str(value)
+
+
+class TestSettingHandlers(unittest.TestCase):
+    def setUp(self):
+        self.ledsettings = types.SimpleNamespace(color_mode="Rainbow", red=0, green=0, blue=0, rainbow_offset=0,
+                                                 multicolor=[[0, 0, 0], [0, 0, 0]],
+                                                 multicolor_range=[[20, 60], [60, 108]])
+        self.usersettings = FakeUserSettings()
+        self.patches = [mock.patch.object(app_state, "ledsettings", self.ledsettings),
+                        mock.patch.object(app_state, "usersettings", self.usersettings),
+                        mock.patch.object(setting_handlers.cmap, "update_multicolor")]
+        self.update_multicolor = [patch.start() for patch in self.patches][-1]
+        settings_bus.dispatch()
+        self.rebuilds = []
+        settings_bus.subscribe(COLOR_MODE, self.rebuilds.append)
+
+    def tearDown(self):
+        settings_bus.unsubscribe(COLOR_MODE, self.rebuilds.append)
+        for patch in self.patches:
+            patch.stop()
+
+    def test_01_batch(self):
+        response = setting_handlers.apply_settings([("led_color", "ff8000", None),
+                                                    ("rainbow_offset", "12", None),
+                                                    ("multicolor", "0000ff", "1"),
+                                                    ("multicolor_range_left", "30", "0")], timeout=0)
+        self.assertTrue(response["reload_sequence"])
+        # applied by the main loop, not the request thread
+        self.assertEqual(self.ledsettings.color_mode, "Rainbow")
+        self.assertEqual(settings_bus.dispatch(), 2)
+        self.assertEqual((self.ledsettings.red, self.ledsettings.green, self.ledsettings.blue), (255, 128, 0))
+        self.assertEqual(self.ledsettings.color_mode, "Single")
+        self.assertEqual(self.ledsettings.rainbow_offset, 12)
+        self.assertEqual(self.ledsettings.multicolor[1], [0, 0, 255])
+        self.assertEqual(self.ledsettings.multicolor_range[0], [30, 60])
+        self.assertEqual(self.usersettings.values["rainbow_offset"], "12")
+        # side effects run once for the whole batch
+        self.assertEqual(self.rebuilds, [None])
+        self.update_multicolor.assert_called_once()
+
+    def test_02_repeated_changes(self):
+        self.ledsettings.addcolor = lambda: self.ledsettings.multicolor.append([0, 0, 0])
+        for offset in ("10", "11", "12"):
+            setting_handlers.apply_settings([("rainbow_offset", offset, None)], timeout=0)
+        for _ in range(2):
+            setting_handlers.apply_settings([("add_multicolor", None, None)], timeout=0)
+        settings_bus.dispatch()
+        # a dragged slider is applied once with its last value, actions every time
+        self.assertEqual(self.ledsettings.rainbow_offset, 12)
+        self.assertEqual(self.usersettings.values["rainbow_offset"], "12")
+        self.assertEqual(len(self.ledsettings.multicolor), 4)
+
+    def test_03_indexed_changes(self):
+        setting_handlers.apply_settings([("multicolor", "ff0000", "0")], timeout=0)
+        setting_handlers.apply_settings([("multicolor", "00ff00", "1")], timeout=0)
+        setting_handlers.apply_settings([("multicolor_range_left", "30", "0")], timeout=0)
+        setting_handlers.apply_settings([("multicolor_range_left", "70", "1")], timeout=0)
+        settings_bus.dispatch()
+        # edits of different colors in the same frame are all applied
+        self.assertEqual(self.ledsettings.multicolor[:2], [[255, 0, 0], [0, 255, 0]])
+        self.assertEqual(self.ledsettings.multicolor_range[:2], [[30, 60], [70, 108]])
+
+    def test_04_pending(self):
+        response = setting_handlers.apply_settings([("rainbow_offset", "12", None)], timeout=0.01)
+        # the main loop didn't dispatch in time
+        self.assertTrue(response["pending"])
+        settings_bus.dispatch()
+        self.assertEqual(self.ledsettings.rainbow_offset, 12)
+
+    def test_05_nothing_applied_on_error(self):
+        with self.assertRaises(ValueError):
+            setting_handlers.apply_settings([("led_color", "ff8000", None), ("rainbow_offset", "abc", None)])
+        with self.assertRaises(ValueError):
+            setting_handlers.apply_settings([("multicolor", "ff8000", "5")])
+        with self.assertRaises(KeyError):
+            setting_handlers.apply_settings([("no_such_setting", "1", None)])
+        self.assertEqual(settings_bus.dispatch(), 0)
+        self.assertEqual(self.ledsettings.color_mode, "Rainbow")
+        self.assertEqual(self.usersettings.values, {})
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,79 @@
+#!/usr/bin/env python3
+
+import sys
+sys.path.append('./')
+sys.path.append('../')
+import threading
+import unittest
+from lib.settings_bus import SettingsBus
+
+
+class TestSettingsBus(unittest.TestCase):
+    def setUp(self):
+        self.bus = SettingsBus()
+        self.handled = []
+        self.bus.subscribe("color_mode", lambda value: self.handled.append(("color_mode", value)))
+        self.bus.subscribe("reset", lambda value: self.handled.append(("reset", value)))
+
+    def test_01_dispatch_coalesces(self):
+        self.bus.publish("color_mode", "Rainbow")
+        self.bus.publish("reset")
+        self.bus.publish("color_mode", "Single")
+        self.bus.publish("not_subscribed")
+        # nothing runs until the main loop dispatches
+        self.assertEqual(self.handled, [])
+        self.assertEqual(self.bus.dispatch(), 3)
+        self.assertEqual(self.handled, [("reset", None), ("color_mode", "Single")])
+        self.assertEqual(self.bus.dispatch(), 0)
+
+    def test_02_publish_from_threads(self):
+        threads = [threading.Thread(target=self.bus.publish, args=("color_mode", i)) for i in range(20)]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+        self.bus.dispatch()
+        self.assertEqual(len(self.handled), 1)
+
+    def test_03_failing_handler(self):
+        def fail(value):
+            raise RuntimeError("broken")
+        self.bus.subscribe("reset", fail)
+        self.bus.subscribe("reset", self.handled.append)
+        self.bus.publish("reset", 1)
+        self.bus.dispatch()
+        # the other handlers still run
+        self.assertEqual(self.handled, [("reset", 1), 1])
+
+        self.bus.unsubscribe("reset", fail)
+        self.bus.publish("reset", 2)
+        self.bus.dispatch()
+        self.assertEqual(self.handled, [("reset", 1), 1, ("reset", 2), 2])
+
+    def test_04_keys(self):
+        self.bus.publish("color_mode", "Rainbow", key="left")
+        self.bus.publish("color_mode", "Single", key="right")
+        self.bus.publish("color_mode", "Fading", key="left")
+        self.bus.dispatch()
+        # only events with the same key replace each other
+        self.assertEqual(self.handled, [("color_mode", "Single"), ("color_mode", "Fading")])
+
+    def test_05_published_by_handler(self):
+        self.bus.subscribe("settings", lambda value: self.bus.publish("color_mode", value))
+        self.bus.publish("settings", "Rainbow")
+        # handled in the same dispatch, not a frame later
+        self.assertEqual(self.bus.dispatch(), 2)
+        self.assertEqual(self.handled, [("color_mode", "Rainbow")])
+
+    def test_06_wait_until_handled(self):
+        ticket = self.bus.publish("reset")
+        self.assertFalse(self.bus.wait_until_handled(ticket, 0.01))
+        dispatcher = threading.Timer(0.05, self.bus.dispatch)
+        dispatcher.start()
+        self.assertTrue(self.bus.wait_until_handled(ticket, 5))
+        dispatcher.join()
+        self.assertEqual(self.handled, [("reset", None)])
+
+
+if __name__ == '__main__':
+    unittest.main()
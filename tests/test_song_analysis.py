@@ -0,0 +1,58 @@
+#!/usr/bin/env python3
+
+import sys
+sys.path.append('./')
+sys.path.append('../')
+import os
+import tempfile
+import unittest
+import mido
+from lib.song_analysis import analyze_song, difficulty_score
+
+
+def track_of(chords, step=480):
+    # every chord is held for one beat (0.5 s at the default tempo)
+    track = mido.MidiTrack()
+    for chord in chords:
+        for note in chord:
+            track.append(mido.Message('note_on', note=note, velocity=64, time=0))
+        for i, note in enumerate(chord):
+            track.append(mido.Message('note_off', note=note, velocity=0, time=step if i == 0 else 0))
+    return track
+
+
+class TestSongAnalysis(unittest.TestCase):
+    def test_01_analysis(self):
+        mid = mido.MidiFile(ticks_per_beat=480)
+        right = track_of([[60, 64, 67], [72], [74]])
+        right.insert(0, mido.MetaMessage('set_tempo', tempo=500000, time=0))
+        mid.tracks.append(right)
+        mid.tracks.append(track_of([[36, 48], [40], [43]]))
+        with tempfile.TemporaryDirectory() as folder:
+            path = os.path.join(folder, "song.mid")
+            mid.save(path)
+            analysis = analyze_song(path)
+
+        self.assertEqual(analysis["tracks"], 2)
+        self.assertEqual(analysis["notes"], 9)
+        self.assertAlmostEqual(analysis["duration"], 1.5, places=2)
+        self.assertEqual(analysis["notes_per_second"], 6.0)
+        # the left hand octave is a chord of its own, not merged with the right hand triad
+        self.assertEqual(analysis["max_chord"], 3)
+        self.assertEqual(analysis["hand_span"], 12)
+        self.assertEqual(analysis["pitch_range"], 74 - 36)
+        self.assertEqual(analysis["peak_notes_per_second"], 7)
+        self.assertEqual(analysis["tempo_changes"], 0)
+        self.assertTrue(0 < analysis["difficulty"] < 10)
+
+    def test_02_difficulty_bounds(self):
+        easy = dict(notes_per_second=0.5, peak_notes_per_second=1, max_chord=1, hand_span=0, pitch_range=5,
+                    tempo_changes=0)
+        hard = dict(notes_per_second=20, peak_notes_per_second=60, max_chord=10, hand_span=30, pitch_range=88,
+                    tempo_changes=50)
+        self.assertLess(difficulty_score(easy), 2)
+        self.assertEqual(difficulty_score(hard), 10)
+
+
+if __name__ == '__main__':
+    unittest.main()
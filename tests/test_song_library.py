@@ -0,0 +1,107 @@
+#!/usr/bin/env python3
+
+import sys
+sys.path.append('./')
+sys.path.append('../')
+import os
+import shutil
+import tempfile
+import unittest
+import mido
+from lib.song_library import SongLibrary, AnalysisWorker
+
+
+def write_song(path, notes=3, mtime=None):
+    mid = mido.MidiFile()
+    track = mido.MidiTrack()
+    for i in range(notes):
+        track.append(mido.Message('note_on', note=60 + i, velocity=64, time=0))
+        track.append(mido.Message('note_off', note=60 + i, velocity=0, time=240))
+    mid.tracks.append(track)
+    mid.save(path)
+    if mtime is not None:
+        os.utime(path, (mtime, mtime))
+
+
+class TestSongLibrary(unittest.TestCase):
+    def setUp(self):
+        self.folder = tempfile.mkdtemp()
+        self.index_path = os.path.join(self.folder, "cache", "library.json")
+        write_song(os.path.join(self.folder, "Artist - B song.mid"), mtime=100)
+        write_song(os.path.join(self.folder, "a song.mid"), mtime=300)
+        write_song(os.path.join(self.folder, "2024-01-01 10:00_main.mid"), mtime=200)
+        write_song(os.path.join(self.folder, "2024-01-01 10:00_#ff0000.mid"), mtime=200)
+        self.library = SongLibrary(self.folder, self.index_path)
+
+    def tearDown(self):
+        shutil.rmtree(self.folder)
+
+    def test_01_sort_and_paginate(self):
+        songs, total = self.library.query(None, None, 0, 2)
+        self.assertEqual(total, 3)
+        self.assertEqual([song["name"] for song in songs], ["Artist - B song.mid", "2024-01-01 10:00_main.mid"])
+        songs, _ = self.library.query("dateAsc", None, 0, 1)
+        self.assertEqual(songs[0]["name"], "a song.mid")
+        songs, _ = self.library.query("nameDesc", None, 2, 10)
+        self.assertEqual(songs[0]["name"], "2024-01-01 10:00_main.mid")
+        songs, total = self.library.query("nameAsc", "artst song", 0, 10)
+        self.assertEqual(total, 2)
+        # searches are ranked, the typo still finds the artist first
+        self.assertEqual(songs[0]["artist"], "Artist")
+        # the recording color tracks are indexed but not listed
+        self.assertEqual(len(self.library.names()), 4)
+
+    def test_02_incremental_updates(self):
+        name = "a song.mid"
+        self.library.load()
+        self.library.update_metadata(name)
+        song = self.library.get(name)
+        self.assertEqual((song["tracks"], song["notes"]), (1, 3))
+        self.assertGreater(song["duration"], 0)
+        self.library.set_tags(name, ["etude", " "])
+
+        os.rename(os.path.join(self.folder, name), os.path.join(self.folder, "renamed.mid"))
+        self.library.rename(name, "renamed.mid")
+        self.assertIsNone(self.library.get(name))
+        self.assertEqual(self.library.get("renamed.mid")["tags"], ["etude"])
+
+        write_song(os.path.join(self.folder, "new.mid"), notes=5)
+        self.library.add("new.mid")
+        self.assertEqual(self.library.query("dateAsc", None, 0, 1)[0][0]["name"], "new.mid")
+        os.remove(os.path.join(self.folder, "new.mid"))
+        self.library.refresh()
+        self.assertEqual(self.library.query()[1], 3)
+
+        # the persisted index is reused, metadata and tags included
+        self.library.save()
+        library = SongLibrary(self.folder, self.index_path)
+        self.assertEqual(library.get("renamed.mid")["tags"], ["etude"])
+        self.assertEqual(library.get("renamed.mid")["notes"], 3)
+
+    def test_03_song_files(self):
+        self.library.load()
+        with open(os.path.join(self.folder, "2024-01-01 10:00_main.abc"), "w") as sheet:
+            sheet.write("X:1\n")
+        names = [name for _, name in self.library.song_files("2024-01-01 10:00_main.mid")]
+        self.assertEqual(names, ["2024-01-01 10:00_main.mid", "2024-01-01 10:00_#ff0000.mid",
+                                 "2024-01-01 10:00_main.abc"])
+        self.assertEqual(len(self.library.song_files("a song.mid")), 1)
+
+    def test_04_analysis_worker(self):
+        broken = os.path.join(self.folder, "broken.mid")
+        with open(broken, "w") as broken_file:
+            broken_file.write("not a MIDI file")
+        worker = AnalysisWorker()
+        try:
+            self.assertEqual(worker.analyze(os.path.join(self.folder, "a song.mid"))["notes"], 3)
+            with self.assertRaises(ValueError):
+                worker.analyze(broken)
+            # still usable after a failed song
+            self.assertEqual(worker.analyze(os.path.join(self.folder, "Artist - B song.mid"))["tracks"], 1)
+        finally:
+            worker.stop()
+        self.assertEqual(worker.process.returncode, 0)
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,47 @@
+#!/usr/bin/env python3
+
+import sys
+sys.path.append('./')
+sys.path.append('../')
+import random
+import unittest
+from lib.song_search import SongSearchIndex
+
+
+class TestSongSearch(unittest.TestCase):
+    def setUp(self):
+        self.index = SongSearchIndex()
+        self.index.add("fur_elise.mid", "Für Elise", "Ludwig van Beethoven", "classical")
+        self.index.add("moonlight.mid", "Moonlight Sonata", "Ludwig van Beethoven", "")
+        self.index.add("campanella.mid", "La Campanella", "Franz Liszt", "etude")
+
+    def test_01_ranked_and_typo_tolerant(self):
+        self.assertEqual(self.index.search("fur elise"), ["fur_elise.mid"])
+        self.assertEqual(self.index.search("beethovne")[:2], ["moonlight.mid", "fur_elise.mid"])
+        self.assertEqual(self.index.search("campanela"), ["campanella.mid"])
+        self.assertEqual(self.index.search("etu"), ["campanella.mid"])
+        self.assertEqual(self.index.search("xyz"), [])
+
+    def test_02_incremental(self):
+        self.index.add("campanella.mid", "La Campanella", "Franz Liszt", "virtuoso")
+        self.assertEqual(self.index.search("etude"), [])
+        self.assertEqual(self.index.search("virtuoso"), ["campanella.mid"])
+        self.index.remove("moonlight.mid")
+        self.assertEqual(self.index.search("sonata"), [])
+        self.assertNotIn("  m", self.index.postings)
+
+    def test_03_large_library(self):
+        random.seed(1)
+        words = ["".join(random.choice("abcdefghijklmnopqrstuvwxyz") for _ in range(random.randint(3, 9)))
+                 for _ in range(2000)]
+        for i in range(5000):
+            self.index.add("song_%d.mid" % i, " ".join(random.sample(words, 3)), random.choice(words), "")
+        self.index.add("gymnopedie.mid", "Gymnopedie No 1", "Erik Satie", "")
+        # still found first among thousands of songs, with a typo or a prefix
+        self.assertEqual(self.index.search("gymnopdie")[0], "gymnopedie.mid")
+        self.assertEqual(self.index.search("satie gymno")[0], "gymnopedie.mid")
+        self.assertEqual(self.index.search("beethovne")[:2], ["moonlight.mid", "fur_elise.mid"])
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,40 @@
+#!/usr/bin/env python3
+
+import sys
+sys.path.append('./')
+sys.path.append('../')
+import unittest
+import mido
+from lib.song_timeline import SongTimeline
+
+
+class TestSongTimeline(unittest.TestCase):
+    def setUp(self):
+        # 480 ticks per beat: 4/4 at 120 bpm, then 3/4 at 60 bpm from the third bar
+        self.timeline = SongTimeline(480)
+        self.timeline.add(0, mido.MetaMessage('set_tempo', tempo=500000))
+        self.timeline.add(0, mido.MetaMessage('time_signature', numerator=4, denominator=4))
+        self.timeline.add(3840, mido.MetaMessage('set_tempo', tempo=1000000))
+        self.timeline.add(3840, mido.MetaMessage('time_signature', numerator=3, denominator=4))
+
+    def test_01_seconds(self):
+        self.assertEqual(self.timeline.tick_at_second(2), 1920)
+        # two bars of 4 beats take 4 seconds, the beats after the tempo change one second each
+        self.assertEqual(self.timeline.tick_at_second(4), 3840)
+        self.assertEqual(self.timeline.tick_at_second(6), 3840 + 960)
+
+    def test_02_bars(self):
+        self.assertEqual(self.timeline.tick_at_bar(1), 1920)
+        self.assertEqual(self.timeline.tick_at_bar(3), 3840 + 1440)
+        self.assertEqual(self.timeline.bar_at_tick(3839), 1)
+        self.assertEqual(self.timeline.bar_at_tick(3840 + 1440), 3)
+
+    def test_03_meter_change_within_bar(self):
+        # the new meter starts a new bar, the incomplete one still counts
+        self.timeline.add(3840 + 480, mido.MetaMessage('time_signature', numerator=6, denominator=8))
+        self.assertEqual(self.timeline.tick_at_bar(3), 3840 + 480)
+        self.assertEqual(self.timeline.bar_at_tick(3840 + 480 + 1440), 4)
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,41 @@
+#!/usr/bin/env python3
+
+import sys
+sys.path.append('./')
+sys.path.append('../')
+import threading
+import time
+import unittest
+from lib.status_board import StatusBoard
+
+
+class TestStatusBoard(unittest.TestCase):
+    def setUp(self):
+        self.board = StatusBoard()
+
+    def test_01_only_changed_fields(self):
+        self.board.update("learning", {"loading": 0, "hands": "1"})
+        changes, version = self.board.changes()
+        self.assertEqual(changes, {"learning": {"loading": 0, "hands": "1"}})
+
+        self.board.update("learning", {"loading": 1, "hands": "1"})
+        self.board.update("recording", {"isrecording": False})
+        changes, _ = self.board.changes(version)
+        self.assertEqual(changes, {"learning": {"loading": 1}, "recording": {"isrecording": False}})
+        changes, _ = self.board.changes(version, topics={"recording"})
+        self.assertEqual(changes, {"recording": {"isrecording": False}})
+
+    def test_02_wait_for_changes(self):
+        self.board.update("system", {"led_fps": 60})
+        _, version = self.board.changes()
+        self.assertEqual(self.board.wait_for_changes(version, timeout=0.05), ({}, version))
+
+        threading.Timer(0.05, self.board.update, ("system", {"led_fps": 59})).start()
+        start = time.perf_counter()
+        changes, _ = self.board.wait_for_changes(version, timeout=2)
+        self.assertEqual(changes, {"system": {"led_fps": 59}})
+        self.assertLess(time.perf_counter() - start, 1)
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,32 @@
+#!/usr/bin/env python3
+
+import sys
+sys.path.append('./')
+sys.path.append('../')
+import time
+import unittest
+from lib.system_metrics import MetricsSampler
+
+
+class TestSystemMetrics(unittest.TestCase):
+    def test_01_latest_without_thread(self):
+        sampler = MetricsSampler()
+        sample = sampler.latest()
+        for key in ('cpu_usage', 'memory_usage_percent', 'card_space_total', 'upload_rate', 'led_fps'):
+            self.assertIn(key, sample)
+        # the first sample is kept, later reads don't sample again
+        self.assertEqual(sampler.latest()['time'], sample['time'])
+
+    def test_02_background_history(self):
+        sampler = MetricsSampler(interval=0.05, capacity=5)
+        sampler.start(lambda: 42.123)
+        time.sleep(0.5)
+        history = sampler.history()
+        self.assertEqual(len(history), 5)
+        self.assertEqual(history[-1]['led_fps'], 42.12)
+        self.assertLessEqual(len(sampler.history(0.12)), 3)
+        self.assertGreaterEqual(min(sample['upload_rate'] for sample in history[1:]), 0)
+
+
+if __name__ == '__main__':
+    unittest.main()
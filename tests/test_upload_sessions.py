@@ -0,0 +1,65 @@
+#!/usr/bin/env python3
+
+import sys
+sys.path.append('./')
+sys.path.append('../')
+import io
+import os
+import shutil
+import tempfile
+import unittest
+import zlib
+from lib.upload_sessions import UploadSessions
+
+
+class TestUploadSessions(unittest.TestCase):
+    def setUp(self):
+        self.folder = tempfile.mkdtemp()
+        self.sessions = UploadSessions(self.folder, os.path.join(self.folder, "cache", "uploads"), max_size=1000)
+        self.data = os.urandom(600)
+        self.checksum = "%08x" % zlib.crc32(self.data)
+
+    def tearDown(self):
+        shutil.rmtree(self.folder)
+
+    def test_01_resume_and_commit(self):
+        upload_id, offset = self.sessions.init("song.mid", 600, self.checksum)
+        self.assertEqual(offset, 0)
+        offset = self.sessions.append(upload_id, 0, io.BytesIO(self.data[:250]), 250)
+
+        # connection dropped in the middle of the next chunk, nothing of it is kept
+        with self.assertRaises(ValueError):
+            self.sessions.append(upload_id, offset, io.BytesIO(self.data[250:300]), 350)
+        # a new session of the same file continues where the upload stands
+        self.assertEqual(self.sessions.init("song.mid", 600, self.checksum), (upload_id, 250))
+        with self.assertRaises(ValueError):
+            self.sessions.append(upload_id, 0, io.BytesIO(self.data[:250]), 250)
+        with self.assertRaises(ValueError):
+            self.sessions.commit(upload_id)
+
+        self.assertEqual(self.sessions.append(upload_id, 250, io.BytesIO(self.data[250:]), 350), 600)
+        self.assertFalse(os.path.exists(os.path.join(self.folder, "song.mid")))
+        self.assertEqual(self.sessions.commit(upload_id), "song.mid")
+        with open(os.path.join(self.folder, "song.mid"), "rb") as song:
+            self.assertEqual(song.read(), self.data)
+        self.assertEqual(os.listdir(os.path.join(self.folder, "cache", "uploads")), [])
+
+    def test_02_rejected(self):
+        with self.assertRaises(ValueError):
+            self.sessions.init("big.mid", 2000, self.checksum)
+        with self.assertRaises(ValueError):
+            self.sessions.init("song.mid", 600, "not a crc")
+        with self.assertRaises(ValueError):
+            self.sessions.append("../etc", 0, io.BytesIO(b""), 0)
+
+        upload_id, _ = self.sessions.init("song.mid", 600, "00000000")
+        self.sessions.append(upload_id, 0, io.BytesIO(self.data), 600)
+        with self.assertRaises(ValueError):
+            self.sessions.commit(upload_id)
+        # a corrupted upload starts over
+        self.assertEqual(self.sessions.init("song.mid", 600, "00000000")[1], 0)
+        self.assertFalse(os.path.exists(os.path.join(self.folder, "song.mid")))
+
+
+if __name__ == '__main__':
+    unittest.main()
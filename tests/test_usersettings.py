@@ -5,6 +5,8 @@ sys.path.append('./')
 sys.path.append('../')
 import os
 import unittest
+from unittest import mock
+import lib.usersettings as usersettings
 from lib.usersettings import UserSettings
 
 
@@ -91,6 +93,66 @@ class TestUserSettings(unittest.TestCase):
 
         self.assertEqual(self.us.get_cms("VelocityRainbow", "offset"), "210")
 
+    def test_08_typed(self):
+        self.assertEqual(self.us.typed("brightness_percent"), 50)
+        self.assertEqual(self.us.values.brightness_percent, 50)
+        self.assertEqual(self.us.typed("mode"), "Normal")
+
+        received = []
+        self.us.subscribe("brightness_percent", received.append)
+        self.us.set("brightness_percent", "70")
+        self.assertEqual(received, [70])
+        self.assertEqual(self.us.values.brightness_percent, 70)
+        # same value again is not a change
+        self.us.set("brightness_percent", "70")
+        self.assertEqual(received, [70])
+
+        self.us.unsubscribe("brightness_percent", received.append)
+        self.us.set("brightness_percent", "50")
+        self.assertEqual(received, [70])
+        self.assertEqual(self.us.typed("brightness_percent"), 50)
+
+    def test_09_save_atomic(self):
+        settings_file = self.config_path + "settings-test.xml"
+        self.us.set("screen_on", "0")
+        self.us.save_changes()
+        self.assertFalse(os.path.exists(settings_file + ".tmp"))
+        self.assertEqual(UserSettings(settings_file, self.config_path + "default-test1.xml").get("screen_on"), "0")
+
+        # setting a value back and forth doesn't rewrite the file
+        mtime = os.stat(settings_file).st_mtime_ns
+        self.us.set("screen_on", "1")
+        self.us.set("screen_on", "0")
+        self.us.save_changes()
+        self.assertEqual(os.stat(settings_file).st_mtime_ns, mtime)
+        self.assertFalse(self.us.pending_changes)
+
+    def test_10_save_due(self):
+        self.us.save_delay = 60
+        self.us.max_save_delay = 120
+        self.assertFalse(self.us.save_due())
+        self.us.set("screen_on", "0")
+        self.assertFalse(self.us.save_due())
+        # no change for save_delay seconds
+        self.us.last_change -= 60
+        self.assertTrue(self.us.save_due())
+        # or changing all the time for max_save_delay seconds
+        self.us.set("screen_on", "1")
+        self.assertFalse(self.us.save_due())
+        self.us.first_change -= 120
+        self.assertTrue(self.us.save_due())
+
+    def test_11_typed_changed_while_parsing(self):
+        def parse(value):
+            if value == "50":
+                # another thread sets a new value while this one parses the old
+                self.us.set("brightness_percent", "60")
+            return int(value)
+
+        with mock.patch.dict(usersettings.SETTING_TYPES, {"brightness_percent": parse}):
+            self.assertEqual(self.us.typed("brightness_percent"), 50)
+            self.assertEqual(self.us.typed("brightness_percent"), 60)
+
 
 if __name__ == '__main__':
     unittest.main()
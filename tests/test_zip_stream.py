@@ -0,0 +1,42 @@
+#!/usr/bin/env python3
+
+import sys
+sys.path.append('./')
+sys.path.append('../')
+import io
+import os
+import shutil
+import tempfile
+import unittest
+import zipfile
+from lib.zip_stream import stream_zip
+
+
+class TestZipStream(unittest.TestCase):
+    def setUp(self):
+        self.folder = tempfile.mkdtemp()
+        self.contents = {"song.mid": b"MThd" * 10, "cache/song.mid.p": os.urandom(300000)}
+        for name, data in self.contents.items():
+            with open(os.path.join(self.folder, name.replace("/", "_")), "wb") as output:
+                output.write(data)
+
+    def tearDown(self):
+        shutil.rmtree(self.folder)
+
+    def test_01_stream(self):
+        files = [(os.path.join(self.folder, name.replace("/", "_")), name) for name in self.contents]
+        files.append((os.path.join(self.folder, "missing.abc"), "missing.abc"))
+        chunks = list(stream_zip(files, chunk_size=16384))
+        # written piece by piece, never the whole archive at once
+        self.assertGreater(len(chunks), 10)
+        self.assertLess(max(len(chunk) for chunk in chunks), 2 * 16384)
+
+        archive = zipfile.ZipFile(io.BytesIO(b"".join(chunks)))
+        self.assertIsNone(archive.testzip())
+        self.assertEqual(archive.namelist(), list(self.contents))
+        for name, data in self.contents.items():
+            self.assertEqual(archive.read(name), data)
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -15,8 +15,11 @@ from lib.ledsettings import LedSettings
 from lib.ledstrip import LedStrip
 from lib.menulcd import MenuLCD
 from lib.midi_event_processor import MIDIEventProcessor
-from lib.color_mode import ColorMode
+from lib.color_mode import ColorMode, LOADED_SETTINGS
 from lib.webinterface_manager import WebInterfaceManager
+from lib.system_metrics import metrics_sampler
+from lib.song_library import song_library
+from lib.settings_bus import settings_bus, COLOR_MODE, SETTINGS_CHANGED, SETTINGS_RESET
 
 from lib.log_setup import logger
 
@@ -75,6 +78,19 @@ class VisualizerApp:
                                                          self.last_sustain,
                                                          self.pedal_deadzone)
 
+        # System statistics for the web interface and the screensaver, sampled in the background
+        metrics_sampler.start(lambda: self.component_initializer.ledstrip.current_fps)
+        song_library.start()
+
+        # Setting changes from the web interface, menu and GPIO are applied between two frames
+        settings_bus.subscribe(COLOR_MODE, self.rebuild_color_mode)
+        settings_bus.subscribe(SETTINGS_CHANGED, self.reload_color_mode_settings)
+        settings_bus.subscribe(SETTINGS_RESET, self.reset_settings)
+        # only settings a color mode reads, reloading restarts animations like the rainbow time shift
+        for name in LOADED_SETTINGS:
+            self.component_initializer.usersettings.subscribe(
+                name, lambda value: settings_bus.publish(SETTINGS_CHANGED))
+
         # Frame rate counters
         self.event_loop_stamp = time.perf_counter()
         self.frame_count = 0
@@ -111,7 +127,7 @@ class VisualizerApp:
                                   self.component_initializer.menu, self.component_initializer.midiports)
             self.check_activity_backlight()
             self.update_display(elapsed_time)
-            self.check_color_mode()
+            settings_bus.dispatch()
             self.check_settings_changes()
             self.component_initializer.platform.manage_hotspot(self.component_initializer.hotspot,
                                                                 self.component_initializer.usersettings,
@@ -166,40 +182,40 @@ class VisualizerApp:
                 self.component_initializer.menu.show()
         self.display_cycle += 1
 
-    def check_color_mode(self):
-        if self.component_initializer.ledsettings.color_mode != self.color_mode_name or self.component_initializer.ledsettings.incoming_setting_change:
-            self.component_initializer.ledsettings.incoming_setting_change = False
-            self.color_mode = ColorMode(self.component_initializer.ledsettings.color_mode,
-                                        self.component_initializer.ledsettings)
-            self.color_mode_name = self.component_initializer.ledsettings.color_mode
-            # Reinitialize MIDIEventProcessor and LEDEffectsProcessor with the new color_mode
-            self.midi_event_processor.color_mode = self.color_mode
-            self.led_effects_processor.color_mode = self.color_mode
-            logger.info(f"Color mode changed to {self.color_mode_name}")
+    def rebuild_color_mode(self, _=None):
+        self.color_mode = ColorMode(self.component_initializer.ledsettings.color_mode,
+                                    self.component_initializer.ledsettings)
+        self.color_mode_name = self.component_initializer.ledsettings.color_mode
+        # Reinitialize MIDIEventProcessor and LEDEffectsProcessor with the new color_mode
+        self.midi_event_processor.color_mode = self.color_mode
+        self.led_effects_processor.color_mode = self.color_mode
+        logger.info(f"Color mode changed to {self.color_mode_name}")
+
+    def reload_color_mode_settings(self, _=None):
+        self.color_mode.LoadSettings(self.component_initializer.ledsettings)
+
+    def reset_settings(self, _=None):
+        self.component_initializer.ledsettings = LedSettings(self.component_initializer.usersettings)
+        self.component_initializer.ledstrip = LedStrip(self.component_initializer.usersettings,
+                                                        self.component_initializer.ledsettings)
+        self.component_initializer.menu = MenuLCD("config/menu.xml", self.args,
+                                                  self.component_initializer.usersettings,
+                                                  self.component_initializer.ledsettings,
+                                                  self.component_initializer.ledstrip,
+                                                  self.component_initializer.learning,
+                                                  self.component_initializer.saving,
+                                                  self.component_initializer.midiports,
+                                                  self.component_initializer.hotspot,
+                                                  self.component_initializer.platform)
+        self.component_initializer.menu.show()
+        self.component_initializer.ledsettings.add_instance(self.component_initializer.menu,
+                                                             self.component_initializer.ledstrip)
+        # the old ColorMode still reads the replaced LedSettings
+        self.rebuild_color_mode()
 
     def check_settings_changes(self):
-        if (time.time() - self.component_initializer.usersettings.last_save) > 1:
-            if self.component_initializer.usersettings.pending_changes:
-                self.color_mode.LoadSettings(self.component_initializer.ledsettings)
-                self.component_initializer.usersettings.save_changes()
-
-            if self.component_initializer.usersettings.pending_reset:
-                self.component_initializer.usersettings.pending_reset = False
-                self.component_initializer.ledsettings = LedSettings(self.component_initializer.usersettings)
-                self.component_initializer.ledstrip = LedStrip(self.component_initializer.usersettings,
-                                                                self.component_initializer.ledsettings)
-                self.component_initializer.menu = MenuLCD("config/menu.xml", self.args,
-                                                          self.component_initializer.usersettings,
-                                                          self.component_initializer.ledsettings,
-                                                          self.component_initializer.ledstrip,
-                                                          self.component_initializer.learning,
-                                                          self.component_initializer.saving,
-                                                          self.component_initializer.midiports,
-                                                          self.component_initializer.hotspot,
-                                                          self.component_initializer.platform)
-                self.component_initializer.menu.show()
-                self.component_initializer.ledsettings.add_instance(self.component_initializer.menu,
-                                                                     self.component_initializer.ledstrip)
+        if self.component_initializer.usersettings.save_due():
+            self.component_initializer.usersettings.save_changes()
 
 
 if __name__ == "__main__":
@@ -4,6 +4,7 @@ import websockets
 from lib.functions import get_ip_address
 import json
 from lib.log_setup import logger
+from lib.led_frames import LedFrameProducer
 
 UPLOAD_FOLDER = 'Songs/'
 
@@ -40,17 +41,35 @@ app_state = AppState()
 
 def start_server(loop):
     async def learning(websocket):
+        hub = app_state.learning.socket_send
+        cursor, wakeup = hub.subscribe()
+        closed = asyncio.ensure_future(websocket.wait_closed())
         try:
             while True:
-                await asyncio.sleep(0.01)
-                for msg in app_state.learning.socket_send[:]:
-                    await websocket.send(str(msg))
-                    app_state.learning.socket_send.remove(msg)
+                wakeup.clear()
+                messages, cursor = hub.read(cursor)
+                if len(messages) == 1:
+                    await websocket.send(str(messages[0]))
+                elif messages:
+                    # a burst goes out as one frame
+                    await websocket.send(json.dumps({"type": "batch", "messages": [str(msg) for msg in messages]}))
+                else:
+                    waiter = asyncio.ensure_future(wakeup.wait())
+                    await asyncio.wait({waiter, closed}, return_when=asyncio.FIRST_COMPLETED)
+                    if closed.done():
+                        waiter.cancel()
+                        break
         except:
             # Handle the connection closed error
             pass
+        finally:
+            hub.unsubscribe(wakeup)
+            closed.cancel()
+
+    ledemu_producer = LedFrameProducer(lambda: app_state.ledstrip.strip.getPixels(),
+                                       lambda: app_state.ledemu_pause)
 
-    async def ledemu_recv(websocket):
+    async def ledemu_recv(websocket, client):
         async for message in websocket:
             try:
                 msg = json.loads(message)
@@ -58,6 +77,14 @@ def start_server(loop):
                     app_state.ledemu_pause = True
                 elif msg["cmd"] == "resume":
                     app_state.ledemu_pause = False
+                    ledemu_producer.request_keyframe(client)
+                elif msg["cmd"] == "fps":
+                    # each client picks its own rate, the server answers with the rate actually used
+                    max_fps = app_state.ledstrip.WEBEMU_MAX_FPS
+                    ledemu_producer.set_fps(client, max(1, min(max_fps, int(msg["fps"]))))
+                    await websocket.send(json.dumps({"settings": {"fps": client.fps}}))
+                elif msg["cmd"] == "keyframe":
+                    ledemu_producer.request_keyframe(client)
             except websockets.exceptions.ConnectionClosed:
                 pass
             except websockets.exceptions.WebSocketException:
@@ -67,43 +94,29 @@ def start_server(loop):
                 return
 
     async def ledemu(websocket):
+        client = None
         try:
             app_state.ledemu_clients.add(websocket)
             logger.info(f"LED emulator client connected. Active clients: {len(app_state.ledemu_clients)}")
 
+            fps = app_state.ledstrip.WEBEMU_FPS
             await websocket.send(json.dumps({"settings":
                                                  {"gamma": app_state.ledstrip.led_gamma,
-                                                  "reverse": app_state.ledstrip.reverse}}))
-
-            previous_leds = None
-            while not websocket.closed and websocket in app_state.ledemu_clients:  # Check both conditions
-                try:
-                    ledstrip = app_state.ledstrip
-                    await asyncio.sleep(1 / ledstrip.WEBEMU_FPS)
-
-                    if app_state.ledemu_pause:
-                        continue
+                                                  "reverse": app_state.ledstrip.reverse,
+                                                  "fps": fps}}))
 
-                    # Check connection is still open before sending
-                    if websocket.closed:
-                        break
-
-                    current_leds = ledstrip.strip.getPixels()
-                    if previous_leds != current_leds:  # Only send if LED state has changed
-                        try:
-                            await websocket.send(json.dumps({"leds": current_leds}))
-                            previous_leds = list(current_leds)  # Create a copy of the list
-                        except websockets.exceptions.ConnectionClosed:
-                            break
-
-                except websockets.exceptions.ConnectionClosed:
-                    break
-                except websockets.exceptions.WebSocketException:
-                    break
-                except Exception as e:
-                    logger.warning(f"LED emulator error: {str(e)}")
-                    break
+            # frames are sent by the shared producer, this handler only reads client commands
+            client = ledemu_producer.add_client(websocket, fps)
+            await ledemu_recv(websocket, client)
+        except websockets.exceptions.ConnectionClosed:
+            pass
+        except websockets.exceptions.WebSocketException:
+            pass
+        except Exception as e:
+            logger.warning(f"LED emulator error: {str(e)}")
         finally:
+            if client is not None:
+                ledemu_producer.remove_client(client)
             if websocket in app_state.ledemu_clients:
                 app_state.ledemu_clients.remove(websocket)
                 logger.info(f"LED emulator client disconnected. Active clients: {len(app_state.ledemu_clients)}")
@@ -117,7 +130,7 @@ def start_server(loop):
             if websocket.path == "/learning":
                 await learning(websocket)
             elif websocket.path == "/ledemu":
-                await asyncio.gather(ledemu(websocket), ledemu_recv(websocket))
+                await ledemu(websocket)
             else:
                 # No handler for this path; close the connection.
                 return
@@ -135,6 +148,7 @@ def start_server(loop):
             await asyncio.Future()
 
     asyncio.set_event_loop(loop)
+    app_state.learning.socket_send.attach_loop(loop)
     loop.run_until_complete(main())
 
 
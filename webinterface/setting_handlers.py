@@ -0,0 +1,327 @@
+from webinterface import app_state
+from lib.functions import fastColorWipe
+from lib.settings_bus import settings_bus, COLOR_MODE, SETTINGS
+import lib.colormaps as cmap
+import json
+import webcolors as wc
+
+# Settings looked up by name instead of going through the change_setting chain.
+# Every entry is (parse, apply, response, action): a request is parsed completely in the request thread,
+# apply runs in the main loop between two frames, response holds the flags returned to the page.
+# Actions (add a color, next step) do something every time, they are never merged with a later request.
+SETTING_HANDLERS = {}
+
+# seconds a request waits for the main loop to apply its settings, so the response (and what the page
+# reads right after it) reflects them
+APPLY_TIMEOUT = 1
+
+
+class SettingsBatch:
+    """Side effects of the applied settings, run once however many settings asked for them"""
+
+    def __init__(self):
+        self.rebuild_color_mode = False
+        self.wipe_strip = False
+        self.update_multicolor = False
+
+    def finish(self):
+        if self.update_multicolor:
+            cmap.update_multicolor(app_state.ledsettings.multicolor_range, app_state.ledsettings.multicolor)
+        if self.wipe_strip:
+            fastColorWipe(app_state.ledstrip.strip, True, app_state.ledsettings)
+        if self.rebuild_color_mode:
+            settings_bus.publish(COLOR_MODE)
+
+
+def apply_settings(changes, timeout=APPLY_TIMEOUT):
+    """Parse a list of (setting_name, value, second_value) and have the main loop apply it.
+
+    Waits up to timeout seconds for the main loop, returns the response flags of the settings, with
+    pending set when the main loop didn't apply them in time (they are applied when it gets to it).
+    Raises KeyError for an unknown setting and ValueError for a bad value, in both cases before
+    anything was published.
+    """
+    parsed = []
+    response = {}
+    repeatable = True
+    # the second value tells apart the same setting of different items, e.g. the multicolor index
+    key = tuple((setting_name, second_value) for setting_name, _, second_value in changes)
+    for setting_name, value, second_value in changes:
+        parse, _, setting_response, action = SETTING_HANDLERS[setting_name]
+        repeatable = repeatable and not action
+        try:
+            parsed.append((setting_name, parse(value, second_value)))
+        except (TypeError, ValueError, IndexError, KeyError, AttributeError) as e:
+            raise ValueError(setting_name + ": " + str(e))
+        for flag, enabled in setting_response.items():
+            response[flag] = response.get(flag, False) or enabled
+
+    # a batch replaces a not yet applied batch of the same settings, e.g. while a slider is dragged
+    ticket = settings_bus.publish(SETTINGS, parsed, key=key if repeatable else object())
+    if timeout:
+        response["pending"] = not settings_bus.wait_until_handled(ticket, timeout)
+    return response
+
+
+@settings_bus.subscriber(SETTINGS)
+def apply_parsed_settings(parsed):
+    # runs in the main loop
+    batch = SettingsBatch()
+    for setting_name, value in parsed:
+        SETTING_HANDLERS[setting_name][1](batch, value)
+    batch.finish()
+
+
+def setting_handler(*names, parse, action=False, **response):
+    def register(apply):
+        for name in names:
+            SETTING_HANDLERS[name] = (parse, apply, response, action)
+        return apply
+    return register
+
+
+def parse_text(value, second_value):
+    return str(value)
+
+
+def parse_int(value, second_value):
+    return int(value)
+
+
+def parse_float(value, second_value):
+    return float(value)
+
+
+def parse_flag(value, second_value):
+    return int(value == 'true')
+
+
+def parse_color(value, second_value):
+    return tuple(wc.hex_to_rgb("#" + value))
+
+
+def parse_none(value, second_value):
+    return None
+
+
+def parse_multicolor_index(second_value):
+    index = int(second_value)
+    if not 0 <= index < len(app_state.ledsettings.multicolor):
+        raise IndexError("no color " + str(index))
+    return index
+
+
+def value_setting(name, parse, reload_sequence=True):
+    # ledsettings attribute and user setting of the same name
+    @setting_handler(name, parse=parse, reload_sequence=reload_sequence)
+    def apply(batch, value):
+        setattr(app_state.ledsettings, name, value)
+        app_state.usersettings.change_setting_value(name, value)
+
+
+def color_setting(name, attribute):
+    # color kept as a {"red", "green", "blue"} dict in ledsettings and <attribute>_red etc. in the user settings
+    @setting_handler(name, parse=parse_color, reload_sequence=True)
+    def apply(batch, rgb):
+        color = getattr(app_state.ledsettings, attribute)
+        for channel, component in zip(("red", "green", "blue"), rgb):
+            color[channel] = component
+            app_state.usersettings.change_setting_value(attribute + "_" + channel, component)
+
+
+for _name in ("rainbow_offset", "rainbow_scale", "rainbow_timeshift", "velocityrainbow_offset",
+              "velocityrainbow_scale", "velocityrainbow_curve", "speed_max_notes", "scale_key"):
+    value_setting(_name, parse_int)
+for _name in ("rainbow_colormap", "velocityrainbow_colormap"):
+    value_setting(_name, parse_text)
+value_setting("speed_period_in_seconds", parse_float)
+value_setting("led_animation_brightness_percent", parse_int, reload_sequence=False)
+value_setting("skipped_notes", parse_text, reload_sequence=False)
+value_setting("multicolor_iteration", parse_flag, reload_sequence=False)
+value_setting("disable_backlight_on_idle", parse_flag, reload_sequence=False)
+
+for _name, _attribute in (("speed_slowest_color", "speed_slowest"), ("speed_fastest_color", "speed_fastest"),
+                          ("gradient_start_color", "gradient_start"), ("gradient_end_color", "gradient_end"),
+                          ("key_in_scale_color", "key_in_scale"), ("key_not_in_scale_color", "key_not_in_scale")):
+    color_setting(_name, _attribute)
+
+
+@setting_handler("led_color", parse=parse_color, reload_sequence=True)
+def set_led_color(batch, rgb):
+    app_state.ledsettings.color_mode = "Single"
+
+    app_state.ledsettings.red = rgb[0]
+    app_state.ledsettings.green = rgb[1]
+    app_state.ledsettings.blue = rgb[2]
+
+    app_state.usersettings.change_setting_value("color_mode", app_state.ledsettings.color_mode)
+    app_state.usersettings.change_setting_value("red", rgb[0])
+    app_state.usersettings.change_setting_value("green", rgb[1])
+    app_state.usersettings.change_setting_value("blue", rgb[2])
+    batch.rebuild_color_mode = True
+
+
+@setting_handler("color_mode", parse=parse_text, reload_sequence=True)
+def set_color_mode(batch, value):
+    # setting a different color mode publishes the rebuild by itself
+    app_state.ledsettings.color_mode = value
+    app_state.usersettings.change_setting_value("color_mode", app_state.ledsettings.color_mode)
+
+
+@setting_handler("light_mode", parse=parse_text)
+def set_light_mode(batch, value):
+    app_state.ledsettings.mode = value
+    app_state.usersettings.change_setting_value("mode", value)
+
+
+@setting_handler("fading_speed", "velocity_speed", parse=parse_int)
+def set_fading_speed(batch, value):
+    if not value:
+        value = 1000
+    app_state.ledsettings.fadingspeed = value
+    app_state.usersettings.change_setting_value("fadingspeed", app_state.ledsettings.fadingspeed)
+
+
+@setting_handler("brightness", parse=parse_int)
+def set_brightness(batch, value):
+    app_state.usersettings.change_setting_value("brightness_percent", value)
+    app_state.ledstrip.change_brightness(value, True)
+
+
+@setting_handler("backlight_brightness", parse=parse_int)
+def set_backlight_brightness(batch, value):
+    app_state.ledsettings.backlight_brightness_percent = value
+    app_state.ledsettings.backlight_brightness = 255 * app_state.ledsettings.backlight_brightness_percent / 100
+    app_state.usersettings.change_setting_value("backlight_brightness",
+                                                int(app_state.ledsettings.backlight_brightness))
+    app_state.usersettings.change_setting_value("backlight_brightness_percent",
+                                                app_state.ledsettings.backlight_brightness_percent)
+    batch.wipe_strip = True
+
+
+@setting_handler("backlight_color", parse=parse_color)
+def set_backlight_color(batch, rgb):
+    app_state.ledsettings.backlight_red = rgb[0]
+    app_state.ledsettings.backlight_green = rgb[1]
+    app_state.ledsettings.backlight_blue = rgb[2]
+
+    app_state.usersettings.change_setting_value("backlight_red", rgb[0])
+    app_state.usersettings.change_setting_value("backlight_green", rgb[1])
+    app_state.usersettings.change_setting_value("backlight_blue", rgb[2])
+    batch.wipe_strip = True
+
+
+@setting_handler("sides_color", parse=parse_color)
+def set_sides_color(batch, rgb):
+    app_state.ledsettings.adjacent_red = rgb[0]
+    app_state.ledsettings.adjacent_green = rgb[1]
+    app_state.ledsettings.adjacent_blue = rgb[2]
+
+    app_state.usersettings.change_setting_value("adjacent_red", rgb[0])
+    app_state.usersettings.change_setting_value("adjacent_green", rgb[1])
+    app_state.usersettings.change_setting_value("adjacent_blue", rgb[2])
+
+
+@setting_handler("sides_color_mode", parse=parse_text)
+def set_sides_color_mode(batch, value):
+    app_state.ledsettings.adjacent_mode = value
+    app_state.usersettings.change_setting_value("adjacent_mode", value)
+
+
+@setting_handler("show_midi_events", parse=parse_flag)
+def set_show_midi_events(batch, value):
+    app_state.usersettings.change_setting_value("midi_logging", value)
+
+
+@setting_handler("multicolor", parse=lambda value, second_value: (parse_color(value, None),
+                                                                   parse_multicolor_index(second_value)),
+                 reload_sequence=True)
+def set_multicolor(batch, value):
+    rgb, index = value
+    app_state.ledsettings.multicolor[index][0] = rgb[0]
+    app_state.ledsettings.multicolor[index][1] = rgb[1]
+    app_state.ledsettings.multicolor[index][2] = rgb[2]
+
+    app_state.usersettings.change_setting_value("multicolor", app_state.ledsettings.multicolor)
+    batch.update_multicolor = True
+
+
+def multicolor_range_setting(name, side):
+    @setting_handler(name, parse=lambda value, second_value: (int(value), parse_multicolor_index(second_value)),
+                     reload_sequence=True)
+    def apply(batch, value):
+        note, index = value
+        app_state.ledsettings.multicolor_range[index][side] = note
+        app_state.usersettings.change_setting_value("multicolor_range", app_state.ledsettings.multicolor_range)
+        batch.update_multicolor = True
+
+
+multicolor_range_setting("multicolor_range_left", 0)
+multicolor_range_setting("multicolor_range_right", 1)
+
+
+def parse_multicolors(value, second_value):
+    # {"<n>": {"color": "rrggbb", "range": [first note, last note]}, ...}
+    return [(list(parse_color(color["color"], None)), [int(color["range"][0]), int(color["range"][1])])
+            for color in json.loads(value).values()]
+
+
+def store_multicolors(batch):
+    app_state.usersettings.change_setting_value("multicolor", app_state.ledsettings.multicolor)
+    app_state.usersettings.change_setting_value("multicolor_range", app_state.ledsettings.multicolor_range)
+    batch.update_multicolor = True
+
+
+@setting_handler("add_multicolor", parse=parse_none, action=True, reload=True)
+def add_multicolor(batch, value):
+    app_state.ledsettings.addcolor()
+
+
+@setting_handler("add_multicolor_and_set_value", parse=parse_multicolors)
+def set_multicolors(batch, colors):
+    app_state.ledsettings.multicolor.clear()
+    app_state.ledsettings.multicolor_range.clear()
+    for rgb, note_range in colors:
+        app_state.ledsettings.multicolor.append(rgb)
+        app_state.ledsettings.multicolor_range.append(note_range)
+    store_multicolors(batch)
+
+
+@setting_handler("remove_multicolor", parse=lambda value, second_value: parse_multicolor_index(value), action=True,
+                 reload=True)
+def remove_multicolor(batch, index):
+    app_state.ledsettings.deletecolor(index + 1)
+    batch.update_multicolor = True
+
+
+@setting_handler("remove_all_multicolors", parse=parse_none)
+def remove_all_multicolors(batch, value):
+    app_state.ledsettings.multicolor.clear()
+    app_state.ledsettings.multicolor_range.clear()
+    store_multicolors(batch)
+
+
+@setting_handler("next_step", parse=parse_none, action=True, reload_sequence=True)
+def next_step(batch, value):
+    app_state.ledsettings.set_sequence(0, 1, False)
+
+
+@setting_handler("set_sequence", parse=parse_int, reload_sequence=True)
+def set_sequence(batch, sequence):
+    if sequence == 0:
+        menu = app_state.ledsettings.menu
+        ledstrip = app_state.ledsettings.ledstrip
+        app_state.ledsettings.__init__(app_state.usersettings)
+        app_state.ledsettings.menu = menu
+        app_state.ledsettings.ledstrip = ledstrip
+        app_state.ledsettings.sequence_active = False
+    else:
+        app_state.ledsettings.set_sequence(sequence - 1, 0)
+    batch.rebuild_color_mode = True
+
+
+@setting_handler("set_step", parse=lambda value, second_value: (value, second_value))
+def set_step(batch, value):
+    sequence, step = value
+    app_state.ledsettings.set_sequence(sequence, step, True)
+    batch.rebuild_color_mode = True
@@ -1846,6 +1846,19 @@ var opt, onYouTubeIframeAPIReady, msc_credits, media_height, times_arr, offset_j
             $.ajax({
                 url: '/api/change_setting?setting_name=download_sheet_music&value=' + filename,
                 success: function (data) {
+                    if (data.pending) {
+                        // converted to ABC in the background, loaded once the job is done
+                        watch_conversion(data.job, function (job) {
+                            if (job.state === "done") {
+                                load_sheet_file(filename);
+                            }
+                        });
+                        return;
+                    }
+                    if (data.success === false) {
+                        console.log(data.error);
+                        return;
+                    }
                     readAbcOrXML(data);
                     lineChk();
                     msc_resize();
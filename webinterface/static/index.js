@@ -10,7 +10,9 @@ let beats_per_measure = 4;
 let count = 0;
 let is_playing = 0;
 
-let learning_status_timeout = '';
+let status_source = null;
+let status_state = {"learning": {}, "recording": {}, "system": {}, "conversion": {}};
+let conversion_callbacks = {};
 let hand_colorList = '';
 
 let uploadProgress = [];
@@ -114,6 +116,9 @@ function loadAjax(subpage) {
     }, 100);
 }
 loadAjax(window.location.hash.substring(1));
+if (!document.hidden) {
+    start_status_stream();
+}
 
 
 
@@ -183,6 +188,51 @@ function change_setting(setting_name, value, second_value = false, disable_seque
 }
 
 
+let pending_settings = new Map();
+let pending_settings_disable_sequence = false;
+let pending_settings_timeout = null;
+
+function queue_setting(setting_name, value, second_value = false, disable_sequence = false) {
+    // color pickers and sliders fire many changes, they are sent together at most every 100 ms
+    // and the server applies each batch with a single color mode rebuild
+    pending_settings.set(setting_name + ":" + second_value, {
+        "setting_name": setting_name,
+        "value": String(value).replaceAll('#', ''),
+        "second_value": second_value === false ? null : second_value
+    });
+    pending_settings_disable_sequence = pending_settings_disable_sequence || disable_sequence;
+    if (!pending_settings_timeout) {
+        pending_settings_timeout = setTimeout(send_pending_settings, 100);
+    }
+}
+
+function send_pending_settings() {
+    const settings = Array.from(pending_settings.values());
+    const body = JSON.stringify({"settings": settings, "disable_sequence": pending_settings_disable_sequence});
+    pending_settings.clear();
+    pending_settings_disable_sequence = false;
+    pending_settings_timeout = null;
+
+    const xhttp = new XMLHttpRequest();
+    xhttp.onreadystatechange = function () {
+        if (this.readyState === 4 && this.status === 200) {
+            const response = JSON.parse(this.responseText);
+            if (response["reload_sequence"] === true) {
+                get_current_sequence_setting();
+                get_sequences();
+            }
+            const multicolor_settings = ["multicolor", "multicolor_range_left", "multicolor_range_right"];
+            if (settings.some(setting => multicolor_settings.includes(setting.setting_name))) {
+                get_colormap_gradients();
+            }
+        }
+    }
+    xhttp.open("POST", "/api/change_settings", true);
+    xhttp.setRequestHeader("Content-Type", "application/json");
+    xhttp.send(body);
+}
+
+
 function press_button(element) {
     element.classList.add("pressed");
     setTimeout(function () {
@@ -45,39 +45,143 @@ function previewFile(file) {
     }
 }
 
-function uploadFile(file, i) {
-    const url = '/upload';
+const UPLOAD_CHUNK_SIZE = 256 * 1024;
+const UPLOAD_RETRIES = 10;
+let crc32_table = null;
+
+function crc32(bytes) {
+    if (!crc32_table) {
+        crc32_table = new Int32Array(256);
+        for (let n = 0; n < 256; n++) {
+            let c = n;
+            for (let k = 0; k < 8; k++) {
+                c = c & 1 ? 0xEDB88320 ^ (c >>> 1) : c >>> 1;
+            }
+            crc32_table[n] = c;
+        }
+    }
+    let crc = -1;
+    for (let i = 0; i < bytes.length; i++) {
+        crc = (crc >>> 8) ^ crc32_table[(crc ^ bytes[i]) & 0xff];
+    }
+    return ((crc ^ -1) >>> 0).toString(16).padStart(8, "0");
+}
+
+function upload_request(url, body, success, failed) {
     const xhr = new XMLHttpRequest();
-    const formData = new FormData();
     xhr.open('POST', url, true)
     xhr.setRequestHeader('X-Requested-With', 'XMLHttpRequest')
+    xhr.setRequestHeader('Content-Type', 'application/octet-stream')
+    xhr.onload = function () {
+        if (xhr.status === 200) {
+            success(JSON.parse(xhr.responseText));
+        } else {
+            failed();
+        }
+    };
+    xhr.onerror = failed;
+    xhr.send(body);
+}
+
+function uploadFile(file, i) {
+    // sent in chunks, after a dropped connection the upload continues where the server stands
+    let retries = 0;
+
+    file.arrayBuffer().then(function (buffer) {
+        const params = "filename=" + encodeURIComponent(file.name) + "&size=" + file.size +
+            "&checksum=" + crc32(new Uint8Array(buffer));
 
-    // Update progress (can be used to show progress indicator)
-    xhr.upload.addEventListener("progress", function (e) {
-        updateProgress(i, (e.loaded * 100.0 / e.total) || 100)
-    })
-
-    xhr.addEventListener('readystatechange', function () {
-        if (xhr.readyState === 4 && xhr.status === 200) {
-            let response = JSON.parse(this.responseText);
-
-            updateProgress(i, 100);
-
-            if (response.success === true) {
-                clearTimeout(get_songs_timeout);
-                get_songs_timeout = setTimeout(function () {
-                    get_songs();
-                }, 2000);
-                document.getElementById(response["song_name"]).innerHTML += "<svg xmlns=\"http://www.w3.org/2000/svg\" class=\"h-6 w-6 ml-2 text-green-400\" fill=\"none\" viewBox=\"0 0 24 24\" stroke=\"currentColor\">\n" +
-                    "  <path stroke-linecap=\"round\" stroke-linejoin=\"round\" stroke-width=\"2\" d=\"M5 13l4 4L19 7\" />\n" +
-                    "</svg>";
-            } else {
-                document.getElementById(response["song_name"]).innerHTML += "<svg xmlns=\"http://www.w3.org/2000/svg\" class=\"h-6 w-6 ml-2 text-red-500\" fill=\"none\" viewBox=\"0 0 24 24\" stroke=\"currentColor\">\n" +
-                    "  <path stroke-linecap=\"round\" stroke-linejoin=\"round\" stroke-width=\"2\" d=\"M6 18L18 6M6 6l12 12\" />\n" +
-                    "</svg>" + "<div class='text-red-400'>" + response.error + "</div>";
+        const retry = function () {
+            if (++retries > UPLOAD_RETRIES) {
+                upload_finished({"success": false, "song_name": file.name, "error": "upload failed"});
+                return;
             }
+            setTimeout(start, Math.min(1000 * retries, 10000));
+        };
+
+        const start = function () {
+            upload_request("/upload/init?" + params, null, function (response) {
+                if (response.success) {
+                    send_chunk(response.upload_id, response.offset);
+                } else {
+                    upload_finished(response);
+                }
+            }, retry);
+        };
+
+        const send_chunk = function (upload_id, offset) {
+            updateProgress(i, file.size ? offset * 100.0 / file.size : 0);
+            if (offset >= file.size) {
+                upload_request("/upload/commit?upload_id=" + upload_id, null, upload_finished, retry);
+                return;
+            }
+            const url = "/upload/append?upload_id=" + upload_id + "&offset=" + offset;
+            upload_request(url, file.slice(offset, offset + UPLOAD_CHUNK_SIZE), function (response) {
+                if (response.success) {
+                    retries = 0;
+                    send_chunk(upload_id, response.offset);
+                } else {
+                    retry();
+                }
+            }, retry);
+        };
+
+        start();
+    });
+
+    function upload_finished(response) {
+        updateProgress(i, 100);
+
+        if (response.success === true && response.job) {
+            show_conversion(response["song_name"], response.job);
+        } else if (response.success === true) {
+            clearTimeout(get_songs_timeout);
+            get_songs_timeout = setTimeout(function () {
+                get_songs();
+            }, 2000);
+            document.getElementById(response["song_name"]).innerHTML += "<svg xmlns=\"http://www.w3.org/2000/svg\" class=\"h-6 w-6 ml-2 text-green-400\" fill=\"none\" viewBox=\"0 0 24 24\" stroke=\"currentColor\">\n" +
+                "  <path stroke-linecap=\"round\" stroke-linejoin=\"round\" stroke-width=\"2\" d=\"M5 13l4 4L19 7\" />\n" +
+                "</svg>";
+        } else {
+            document.getElementById(response["song_name"] || file.name).innerHTML += "<svg xmlns=\"http://www.w3.org/2000/svg\" class=\"h-6 w-6 ml-2 text-red-500\" fill=\"none\" viewBox=\"0 0 24 24\" stroke=\"currentColor\">\n" +
+                "  <path stroke-linecap=\"round\" stroke-linejoin=\"round\" stroke-width=\"2\" d=\"M6 18L18 6M6 6l12 12\" />\n" +
+                "</svg>" + "<div class='text-red-400'>" + response.error + "</div>";
+        }
+    }
+}
+
+function show_conversion(song_name, job) {
+    // converting an uploaded score to MIDI, shown next to the file name until it is done
+    const element = document.getElementById(song_name);
+    const status = document.createElement("span");
+    status.className = "ml-2 text-gray-400";
+    const cancel = document.createElement("span");
+    cancel.className = "ml-2 underline cursor-pointer";
+    cancel.innerHTML = "cancel";
+    cancel.onclick = function () {
+        const xhttp = new XMLHttpRequest();
+        xhttp.open("GET", "/api/cancel_conversion?job_id=" + job.id, true);
+        xhttp.send();
+    };
+    element.appendChild(status);
+    element.appendChild(cancel);
+
+    watch_conversion(job, function (job) {
+        if (job.state === "queued" || job.state === "running" || job.state === "cancelling") {
+            status.innerHTML = "converting " + Math.round(job.progress * 100) + "%";
+            return;
+        }
+        cancel.remove();
+        if (job.state === "done") {
+            status.className = "ml-2 text-green-400";
+            status.innerHTML = "converted to " + job.target;
+            clearTimeout(get_songs_timeout);
+            get_songs_timeout = setTimeout(function () {
+                get_songs();
+            }, 2000);
+        } else {
+            status.className = "ml-2 text-red-400";
+            status.innerHTML = job.state === "cancelled" ? "conversion cancelled" : job.error;
         }
-    })
-    formData.append('file', file)
-    xhr.send(formData)
+    });
 }
\ No newline at end of file
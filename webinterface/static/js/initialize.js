@@ -3,10 +3,18 @@
  */
 function initialize_homepage() {
     clearInterval(homepage_interval);
+    homepage_interval = null;
     refresh_rate = getCookie("refresh_rate") || 3;
     setCookie("refresh_rate", refresh_rate, 365);
     document.getElementById("refresh_rate").value = refresh_rate;
-    if (refresh_rate !== 0) {
+    checkSavedMode();
+    if (status_source && status_source.readyState === EventSource.OPEN) {
+        // pushed by the status stream, the last values are shown until the next update
+        if ("cpu_usage" in status_state.system) {
+            render_system_stats(status_state.system, 0);
+        }
+    } else if (refresh_rate !== 0) {
+        // polled until the status stream is open, or if the browser has none
         homepage_interval = setInterval(get_homepage_data_loop, refresh_rate * 1000)
     } else {
         setTimeout(get_homepage_data_loop, 1000)
@@ -14,7 +22,8 @@ function initialize_homepage() {
     document.getElementById('refresh_rate').onchange = function () {
         setCookie('refresh_rate', this.value, 365);
         clearInterval(homepage_interval)
-        if (this.value !== 0) {
+        homepage_interval = null;
+        if (this.value !== 0 && !(status_source && status_source.readyState === EventSource.OPEN)) {
             homepage_interval = setInterval(get_homepage_data_loop, this.value * 1000)
         }
     }
@@ -68,12 +77,12 @@ function initialize_led_settings() {
 
     document.getElementById('fading_speed').onchange = function () {
         let value = this.value || "10";
-        change_setting("fading_speed", value, false, true)
+        queue_setting("fading_speed", value, false, true)
     }
 
     document.getElementById('velocity_speed').onchange = function () {
         let value = this.value || "8";
-        change_setting("velocity_speed", value, false, true)
+        queue_setting("velocity_speed", value, false, true)
     }
 
     document.getElementById('light_mode').onchange = function () {
@@ -89,7 +98,7 @@ function initialize_led_settings() {
         } else {
             document.getElementById('velocity').hidden = true;
         }
-        change_setting("light_mode", this.value, false, true)
+        queue_setting("light_mode", this.value, false, true)
     }
 
     document.getElementById('ledcolors').addEventListener('change', function (event) {
@@ -121,35 +130,35 @@ function initialize_led_settings() {
     });
 
     document.getElementById('rainbow_offset').onchange = function () {
-        change_setting("rainbow_offset", this.value, false, true)
+        queue_setting("rainbow_offset", this.value, false, true)
     }
 
     document.getElementById('rainbow_scale').onchange = function () {
-        change_setting("rainbow_scale", this.value, false, true)
+        queue_setting("rainbow_scale", this.value, false, true)
     }
 
     document.getElementById('rainbow_timeshift').onchange = function () {
-        change_setting("rainbow_timeshift", this.value, false, true)
+        queue_setting("rainbow_timeshift", this.value, false, true)
     }
 
     document.getElementById('rainbow_colormap').onchange = function () {
-        change_setting("rainbow_colormap", this.value, false, true)
+        queue_setting("rainbow_colormap", this.value, false, true)
     }
 
     document.getElementById('velocityrainbow_offset').onchange = function () {
-        change_setting("velocityrainbow_offset", this.value, false, true)
+        queue_setting("velocityrainbow_offset", this.value, false, true)
     }
 
     document.getElementById('velocityrainbow_scale').onchange = function () {
-        change_setting("velocityrainbow_scale", this.value, false, true)
+        queue_setting("velocityrainbow_scale", this.value, false, true)
     }
 
     document.getElementById('velocityrainbow_curve').onchange = function () {
-        change_setting("velocityrainbow_curve", this.value, false, true)
+        queue_setting("velocityrainbow_curve", this.value, false, true)
     }
 
     document.getElementById('velocityrainbow_colormap').onchange = function () {
-        change_setting("velocityrainbow_colormap", this.value, false, true)
+        queue_setting("velocityrainbow_colormap", this.value, false, true)
     }
 
     document.getElementById('color_mode').onchange = function () {
@@ -157,42 +166,42 @@ function initialize_led_settings() {
             case "Single":
                 remove_color_modes();
                 document.getElementById('Single').hidden = false;
-                change_setting("color_mode", "Single", false, true);
+                queue_setting("color_mode", "Single", false, true);
                 document.getElementById("led_color").dispatchEvent(new Event('input'));
                 break;
             case "Multicolor":
                 remove_color_modes();
                 document.getElementById('Multicolor').hidden = false;
-                change_setting("color_mode", "Multicolor", false, true);
+                queue_setting("color_mode", "Multicolor", false, true);
                 break;
             case "Rainbow":
                 remove_color_modes();
                 document.getElementById('Rainbow').hidden = false;
-                change_setting("color_mode", "Rainbow", false, true);
+                queue_setting("color_mode", "Rainbow", false, true);
                 break;
             case "VelocityRainbow":
                 remove_color_modes();
                 document.getElementById('VelocityRainbow').hidden = false;
-                change_setting("color_mode", "VelocityRainbow", false, true);
+                queue_setting("color_mode", "VelocityRainbow", false, true);
                 break;
             case "Speed":
                 remove_color_modes();
                 document.getElementById('Speed').hidden = false;
-                change_setting("color_mode", "Speed", false, true);
+                queue_setting("color_mode", "Speed", false, true);
                 document.getElementById("speed_slow_color").dispatchEvent(new Event('input'));
                 document.getElementById("speed_fast_color").dispatchEvent(new Event('input'));
                 break;
             case "Gradient":
                 remove_color_modes();
                 document.getElementById('Gradient').hidden = false;
-                change_setting("color_mode", "Gradient", false, true);
+                queue_setting("color_mode", "Gradient", false, true);
                 document.getElementById("gradient_start_color").dispatchEvent(new Event('input'));
                 document.getElementById("gradient_end_color").dispatchEvent(new Event('input'));
                 break;
             case "Scale":
                 remove_color_modes();
                 document.getElementById('Scale').hidden = false;
-                change_setting("color_mode", "Scale", false, true);
+                queue_setting("color_mode", "Scale", false, true);
                 document.getElementById("key_in_scale_color").dispatchEvent(new Event('input'));
                 document.getElementById("key_not_in_scale_color").dispatchEvent(new Event('input'));
                 break;
@@ -11,6 +11,10 @@ function remove_page_indicators() {
 }
 
 function get_homepage_data_loop() {
+    if (document.hidden) {
+        // no requests from background tabs
+        return;
+    }
     const xhttp = new XMLHttpRequest();
     xhttp.onreadystatechange = function () {
         if (this.readyState === 4 && this.status === 200) {
@@ -18,60 +22,43 @@ function get_homepage_data_loop() {
             if (refresh_rate === 0) {
                 refresh_rate = 1
             }
-            const response_pc_stats = JSON.parse(this.responseText);
-
-            let download = (response_pc_stats.download - download_start) / refresh_rate;
-            let upload = (response_pc_stats.upload - upload_start) / refresh_rate;
-            if (download_start === 0) {
-                download = 0;
-                upload = 0;
-            }
-            animateValue(document.getElementById("cpu_number"), last_cpu_usage,
-                response_pc_stats["cpu_usage"], refresh_rate * 500, false);
-            document.getElementById("memory_usage_percent").innerHTML = response_pc_stats["memory_usage_percent"] + "%";
-            document.getElementById("memory_usage").innerHTML =
-
-                formatBytes(response_pc_stats["memory_usage_used"], 2, false) + "/" +
-                formatBytes(response_pc_stats["memory_usage_total"]);
-            document.getElementById("cpu_temp").innerHTML = response_pc_stats["cpu_temp"];
-
-            document.getElementById("card_usage").innerHTML =
-                formatBytes(response_pc_stats["card_space_used"], 2, false) + "/" +
-                formatBytes(response_pc_stats["card_space_total"]);
-            document.getElementById("card_usage_percent").innerHTML = response_pc_stats["card_space_percent"] + "%";
-            animateValue(document.getElementById("download_number"), last_download, download, refresh_rate * 500, true);
-            animateValue(document.getElementById("upload_number"), last_upload, upload, refresh_rate * 500, true);
-
-            document.getElementById("cover_state").innerHTML = response_pc_stats["cover_state"];
-
-            document.getElementById("led_fps").innerHTML = response_pc_stats.led_fps;
-            document.getElementById("cpu_count").innerHTML = response_pc_stats.cpu_count;
-            document.getElementById("cpu_pid").innerHTML = response_pc_stats.cpu_pid;
-            document.getElementById("cpu_freq").innerHTML = response_pc_stats.cpu_freq;
-            document.getElementById("memory_pid").innerHTML =
-                formatBytes(response_pc_stats.memory_pid, 2, false);
-
-            document.getElementById("cover_state").innerHTML = response_pc_stats.cover_state;
-
-            // change value of select based on response_pc_stats.screen_on
-            document.getElementById("screen_on").value = response_pc_stats.screen_on;
-
-            document.getElementById("cover_state").innerHTML = response_pc_stats.cover_state;
-
-
-            download_start = response_pc_stats.download;
-            upload_start = response_pc_stats.upload;
-
-            last_cpu_usage = response_pc_stats["cpu_usage"];
-            last_download = download;
-            last_upload = upload;
-
-            checkSavedMode();
+            render_system_stats(JSON.parse(this.responseText), refresh_rate * 500);
         }
     };
     xhttp.open("GET", "/api/get_homepage_data", true);
     xhttp.send();
 }
+
+// homepage statistics, polled with get_homepage_data or pushed by the status stream
+function render_system_stats(stats, animation_time) {
+    if (!document.getElementById("cpu_number")) {
+        return;
+    }
+    animateValue(document.getElementById("cpu_number"), last_cpu_usage, stats.cpu_usage, animation_time, false);
+    document.getElementById("memory_usage_percent").innerHTML = stats.memory_usage_percent + "%";
+    document.getElementById("memory_usage").innerHTML =
+        formatBytes(stats.memory_usage_used, 2, false) + "/" + formatBytes(stats.memory_usage_total);
+    document.getElementById("cpu_temp").innerHTML = stats.cpu_temp;
+
+    document.getElementById("card_usage").innerHTML =
+        formatBytes(stats.card_space_used, 2, false) + "/" + formatBytes(stats.card_space_total);
+    document.getElementById("card_usage_percent").innerHTML = stats.card_space_percent + "%";
+    animateValue(document.getElementById("download_number"), last_download, stats.download_rate, animation_time, true);
+    animateValue(document.getElementById("upload_number"), last_upload, stats.upload_rate, animation_time, true);
+
+    document.getElementById("led_fps").innerHTML = stats.led_fps;
+    document.getElementById("cpu_count").innerHTML = stats.cpu_count;
+    document.getElementById("cpu_pid").innerHTML = stats.cpu_pid;
+    document.getElementById("cpu_freq").innerHTML = stats.cpu_freq;
+    document.getElementById("memory_pid").innerHTML = formatBytes(stats.memory_pid, 2, false);
+    document.getElementById("cover_state").innerHTML = stats.cover_state;
+    document.getElementById("screen_on").value = stats.screen_on;
+
+    last_cpu_usage = stats.cpu_usage;
+    last_download = stats.download_rate;
+    last_upload = stats.upload_rate;
+}
+
 function get_colormap_gradients() {
     const xhttp = new XMLHttpRequest();
     xhttp.onreadystatechange = function () {
@@ -1059,77 +1046,51 @@ function get_recording_status() {
     xhttp.onreadystatechange = function () {
         if (this.readyState === 4 && this.status === 200) {
             let response = JSON.parse(this.responseText);
-            document.getElementById("input_port").innerHTML = response["input_port"];
-            document.getElementById("play_port").innerHTML = response["play_port"];
-
-            if (response["isrecording"]) {
-                document.getElementById("recording_status").innerHTML = '<p class="animate-pulse text-red-400">recording</p>';
-                document.getElementById("start_recording_button").classList.add('pointer-events-none', 'animate-pulse');
-                document.getElementById("save_recording_button").classList.remove('pointer-events-none', 'opacity-50');
-                document.getElementById("cancel_recording_button").classList.remove('pointer-events-none', 'opacity-50');
-            } else {
-                document.getElementById("recording_status").innerHTML = '<p>idle</p>';
-                document.getElementById("start_recording_button").classList.remove('pointer-events-none', 'animate-pulse');
-                document.getElementById("save_recording_button").classList.add('pointer-events-none', 'opacity-50');
-                document.getElementById("cancel_recording_button").classList.add('pointer-events-none', 'opacity-50');
-            }
-            if (Object.keys(response["isplaying"]).length > 0) {
-                document.getElementById("midi_player_wrapper").classList.remove("hidden");
-                document.getElementById("start_midi_play").classList.add("hidden");
-                document.getElementById("stop_midi_play").classList.remove("hidden");
-            }
+            response["isplaying"] = Object.keys(response["isplaying"]).length > 0;
+            render_recording_status(response);
         }
     };
     xhttp.open("GET", "/api/get_recording_status", true);
     xhttp.send();
 }
 
-function get_learning_status(loop_call = false) {
+function render_recording_status(response) {
+    if (!document.getElementById("recording_status")) {
+        return;
+    }
+    document.getElementById("input_port").innerHTML = response["input_port"];
+    document.getElementById("play_port").innerHTML = response["play_port"];
+
+    if (response["isrecording"]) {
+        document.getElementById("recording_status").innerHTML = '<p class="animate-pulse text-red-400">recording</p>';
+        document.getElementById("start_recording_button").classList.add('pointer-events-none', 'animate-pulse');
+        document.getElementById("save_recording_button").classList.remove('pointer-events-none', 'opacity-50');
+        document.getElementById("cancel_recording_button").classList.remove('pointer-events-none', 'opacity-50');
+    } else {
+        document.getElementById("recording_status").innerHTML = '<p>idle</p>';
+        document.getElementById("start_recording_button").classList.remove('pointer-events-none', 'animate-pulse');
+        document.getElementById("save_recording_button").classList.add('pointer-events-none', 'opacity-50');
+        document.getElementById("cancel_recording_button").classList.add('pointer-events-none', 'opacity-50');
+    }
+    if (response["isplaying"]) {
+        document.getElementById("midi_player_wrapper").classList.remove("hidden");
+        document.getElementById("start_midi_play").classList.add("hidden");
+        document.getElementById("stop_midi_play").classList.remove("hidden");
+    }
+}
+
+function get_learning_status() {
     const xhttp = new XMLHttpRequest();
-    const delay_between_requests = 500;
     xhttp.timeout = 5000;
     xhttp.onreadystatechange = function () {
         let response;
         if (this.readyState === 4 && this.status === 200) {
             response = JSON.parse(this.responseText);
 
-            clearTimeout(learning_status_timeout);
-            document.getElementById("start_learning").classList.add("pointer-events-none", "opacity-50");
-            switch (response.loading) {
-                case 0:
-                    learning_status_timeout = setTimeout(get_learning_status, delay_between_requests, true);
-                    break;
-                case 1:
-                    learning_status_timeout = setTimeout(get_learning_status, delay_between_requests, true);
-                    document.getElementById("start_learning").innerHTML = '<span class="flex uppercase text-xs m-auto ">' +
-                        '<div id="learning_status" class="align-middle text-center">Loading...</div></span>';
-                    break;
-                case 2:
-                    learning_status_timeout = setTimeout(get_learning_status, delay_between_requests, true);
-                    document.getElementById("start_learning").innerHTML = '<span class="flex uppercase text-xs m-auto ">' +
-                        '<div id="learning_status" class="align-middle text-center">Processing...</div></span>';
-                    break;
-                case 3:
-                    learning_status_timeout = setTimeout(get_learning_status, delay_between_requests, true);
-                    document.getElementById("start_learning").innerHTML = '<span class="flex uppercase text-xs m-auto ">' +
-                        '<div id="learning_status" class="align-middle text-center">Merging...</div></span>';
-                    break;
-                case 4:
-                    document.getElementById("start_learning").classList.remove("pointer-events-none", "opacity-50");
-                    document.getElementById("start_learning").innerHTML = '<span class="flex uppercase text-xs m-auto ">' +
-                        '<div id="learning_status" class="align-middle text-center" data-translate="learning_status">Start learning</div></span>';
-                    translateStaticContent();
-                    break;
-                case 5:
-                    document.getElementById("start_learning").innerHTML = '<span class="flex uppercase text-xs m-auto ">' +
-                        '<div id="learning_status" class="align-middle text-center">Error!</div></span>';
-                    break;
-                default:
-                    break;
-            }
-
+            // loading progress is pushed by the status stream, see start_status_stream
+            render_learning_loading(response.loading);
 
-            if (response.loading === 4 || loop_call === false) {
+            if (document.getElementById("practice")) {
 
                 document.getElementById("practice").value = response["practice"];
                 document.getElementById("tempo_slider").value = response["set_tempo"];
@@ -1213,6 +1174,140 @@ function get_learning_status(loop_call = false) {
     xhttp.send();
 }
 
+function render_learning_loading(loading) {
+    const start_learning = document.getElementById("start_learning");
+    if (!start_learning) {
+        return;
+    }
+    start_learning.classList.add("pointer-events-none", "opacity-50");
+    switch (loading) {
+        case 1:
+            start_learning.innerHTML = '<span class="flex uppercase text-xs m-auto ">' +
+                '<div id="learning_status" class="align-middle text-center">Loading...</div></span>';
+            break;
+        case 2:
+            start_learning.innerHTML = '<span class="flex uppercase text-xs m-auto ">' +
+                '<div id="learning_status" class="align-middle text-center">Processing...</div></span>';
+            break;
+        case 3:
+            start_learning.innerHTML = '<span class="flex uppercase text-xs m-auto ">' +
+                '<div id="learning_status" class="align-middle text-center">Merging...</div></span>';
+            break;
+        case 4:
+            start_learning.classList.remove("pointer-events-none", "opacity-50");
+            start_learning.innerHTML = '<span class="flex uppercase text-xs m-auto ">' +
+                '<div id="learning_status" class="align-middle text-center" data-translate="learning_status">Start learning</div></span>';
+            translateStaticContent();
+            break;
+        case 5:
+            start_learning.innerHTML = '<span class="flex uppercase text-xs m-auto ">' +
+                '<div id="learning_status" class="align-middle text-center">Error!</div></span>';
+            break;
+        default:
+            break;
+    }
+}
+
+// Learning, recording and system status pushed by the server (server-sent events), only changed fields are sent
+function start_status_stream() {
+    if (status_source || !window.EventSource) {
+        return;
+    }
+    status_source = new EventSource("/api/stream_status");
+    // the homepage statistics come with the stream, no need to poll them
+    status_source.addEventListener("open", function () {
+        clearInterval(homepage_interval);
+        homepage_interval = null;
+    });
+
+    status_source.addEventListener("learning", function (event) {
+        const changes = JSON.parse(event.data);
+        const first_update = !("loading" in status_state.learning);
+        Object.assign(status_state.learning, changes);
+        if ("loading" in changes) {
+            render_learning_loading(changes.loading);
+        }
+        const settings_changed = Object.keys(changes).some(name => name !== "loading");
+        if (!first_update && (settings_changed || changes.loading === 4)) {
+            get_learning_status();
+        }
+    });
+
+    status_source.addEventListener("recording", function (event) {
+        Object.assign(status_state.recording, JSON.parse(event.data));
+        render_recording_status(status_state.recording);
+    });
+
+    status_source.addEventListener("system", function (event) {
+        Object.assign(status_state.system, JSON.parse(event.data));
+        render_system_stats(status_state.system, 1000);
+    });
+
+    status_source.addEventListener("conversion", function (event) {
+        Object.assign(status_state.conversion, JSON.parse(event.data));
+        (status_state.conversion.jobs || []).forEach(conversion_job_changed);
+    });
+}
+
+function stop_status_stream() {
+    if (status_source) {
+        status_source.close();
+        status_source = null;
+    }
+}
+
+// background tabs keep no connection open, the first events after reopening carry the full state again
+document.addEventListener("visibilitychange", function () {
+    if (document.hidden) {
+        stop_status_stream();
+    } else {
+        start_status_stream();
+    }
+});
+
+
+function conversion_job_changed(job) {
+    if (!(job.id in conversion_callbacks)) {
+        return;
+    }
+    const callbacks = conversion_callbacks[job.id];
+    if (["done", "failed", "cancelled"].includes(job.state)) {
+        delete conversion_callbacks[job.id];
+    }
+    callbacks.forEach(callback => callback(job));
+}
+
+
+function watch_conversion(job, callback) {
+    // callback(job) on every progress update of a conversion job, until it is finished
+    if (["done", "failed", "cancelled"].includes(job.state)) {
+        callback(job);
+        return;
+    }
+    (conversion_callbacks[job.id] = conversion_callbacks[job.id] || []).push(callback);
+    if (status_source) {
+        return;
+    }
+    // no server-sent events, ask for the job instead
+    const poll = function () {
+        const xhttp = new XMLHttpRequest();
+        xhttp.onreadystatechange = function () {
+            if (this.readyState === 4 && this.status === 200) {
+                const response = JSON.parse(this.responseText);
+                if (response.success) {
+                    conversion_job_changed(response.job);
+                    if (job.id in conversion_callbacks) {
+                        setTimeout(poll, 1000);
+                    }
+                }
+            }
+        };
+        xhttp.open("GET", "/api/get_conversion_job?job_id=" + job.id, true);
+        xhttp.send();
+    };
+    setTimeout(poll, 1000);
+}
+
 
 function get_songs() {
     let page;
@@ -1288,6 +1383,14 @@ function get_songs() {
                 document.getElementById("sort_by_date").classList.add("text-gray-800", "dark:text-gray-200");
                 document.getElementById("sort_by_name").classList.remove("text-gray-800", "dark:text-gray-200");
             }
+            if (sortby === "difficultyAsc" || sortby === "difficultyDesc") {
+                const other = sortby === "difficultyAsc" ? "difficultyDesc" : "difficultyAsc";
+                document.getElementById("sort_icon_" + sortby).classList.remove("hidden");
+                document.getElementById("sort_icon_" + other).classList.add("hidden");
+                document.getElementById("sort_by_difficulty").classList.add("text-gray-800", "dark:text-gray-200");
+                document.getElementById("sort_by_name").classList.remove("text-gray-800", "dark:text-gray-200");
+                document.getElementById("sort_by_date").classList.remove("text-gray-800", "dark:text-gray-200");
+            }
 
         }
         translateStaticContent();
@@ -1488,7 +1591,7 @@ function change_color_input(prefix, color_input_id, setting_name) {
         parseInt(document.getElementById(prefix + "green").value, 10),
         parseInt(document.getElementById(prefix + "blue").value, 10));
     document.getElementById(color_input_id).value = new_color;
-    change_setting(setting_name, new_color)
+    queue_setting(setting_name, new_color)
 }
 
 function change_color_input_multicolor(event, prefix, id_to_change, setting_name, i) {
@@ -1497,7 +1600,7 @@ function change_color_input_multicolor(event, prefix, id_to_change, setting_name
         parseInt(document.getElementById(prefix + "green").value, 10),
         parseInt(document.getElementById(prefix + "blue").value, 10));
     document.getElementById(id_to_change).value = new_color;
-    change_setting(setting_name, new_color, i)
+    queue_setting(setting_name, new_color, i)
 }
 
 const editLedColor = function (event, prefix) {
@@ -1609,6 +1712,10 @@ function handleSessionSummary(data, retries = 5) {
     delayL_el.textContent = data.delay_l;
     mistakesR_el.textContent = data.mistakes_r_count;
     mistakesL_el.textContent = data.mistakes_l_count;
+    const tendency_el = document.getElementById('summary_tendency');
+    if (tendency_el) {
+        tendency_el.textContent = `${translate(data.r.tendency)} / ${translate(data.l.tendency)}`;
+    }
     
     // Add translations if needed
     translateStaticContent();
@@ -1628,55 +1735,58 @@ function handleSessionSummary(data, retries = 5) {
         summaryChart = null;
     }
 
-    // Prepare chart data
-    const timingDataR = data.timing_r.map(item => ({ x: item[0], y: item[1] }));
-    const timingDataL = data.timing_l.map(item => ({ x: item[0], y: item[1] }));
+    // Prepare chart data, the summary holds per bar series instead of every note
+    const bars = Array.from({length: data.bar_count}, (_, i) => data.first_bar + i);
+    const barDelayR = data.r.bar_delay;
+    const barDelayL = data.l.bar_delay;
 
-    // Find min/max for axes scaling (adjust y slightly for markers)
-    const allDelays = timingDataR.map(p => p.y).concat(timingDataL.map(p => p.y));
-    const minY = allDelays.length > 0 ? Math.min(...allDelays) : -0.1;
-    const maxY = allDelays.length > 0 ? Math.max(...allDelays, data.max_delay) : data.max_delay + 0.1;
+    // Find min/max for axes scaling
+    const allDelays = barDelayR.concat(barDelayL).filter(d => d !== null);
+    const minY = allDelays.length > 0 ? Math.min(...allDelays, 0) : -0.1;
+    const maxY = allDelays.length > 0 ? Math.max(...allDelays, 0) : 0.1;
     const minYAxis = minY - (maxY - minY) * 0.1; // Add 10% padding below
     const maxYAxis = maxY + (maxY - minY) * 0.1; // Add 10% padding above
 
-    const mistakeDataR = data.mistakes_r_times.map(time => ({ x: time, y: minYAxis }));
-    const mistakeDataL = data.mistakes_l_times.map(time => ({ x: time, y: minYAxis }));
-
     summaryChart = new Chart(ctx, {
-        type: 'scatter',
+        type: 'bar',
         data: {
+            labels: bars,
             datasets: [
                 {
+                    type: 'line',
                     label: translate('right_hand_notes'),
-                    data: timingDataR,
+                    data: barDelayR,
+                    accuracy: data.r.bar_accuracy,
                     backgroundColor: data.color_r,
                     borderColor: data.color_r,
-                    pointRadius: 5,
+                    pointRadius: 4,
+                    spanGaps: true,
+                    yAxisID: 'y'
                 },
                 {
+                    type: 'line',
                     label: translate('left_hand_notes'),
-                    data: timingDataL,
+                    data: barDelayL,
+                    accuracy: data.l.bar_accuracy,
                     backgroundColor: data.color_l,
                     borderColor: data.color_l,
-                    pointRadius: 5,
+                    pointRadius: 4,
+                    spanGaps: true,
+                    yAxisID: 'y'
                 },
                 {
                     label: translate('right_hand_mistakes'),
-                    data: mistakeDataR,
+                    data: data.r.bar_mistakes,
                     backgroundColor: data.color_r,
                     borderColor: data.color_r,
-                    pointStyle: 'crossRot',
-                    radius: 8, 
-                    showLine: false
+                    yAxisID: 'y1'
                 },
                 {
                     label: translate('left_hand_mistakes'),
-                    data: mistakeDataL,
+                    data: data.l.bar_mistakes,
                     backgroundColor: data.color_l,
                     borderColor: data.color_l,
-                    pointStyle: 'crossRot',
-                    radius: 8,
-                    showLine: false
+                    yAxisID: 'y1'
                 }
             ]
         },
@@ -1695,39 +1805,23 @@ function handleSessionSummary(data, retries = 5) {
                     callbacks: {
                         label: function(context) {
                             let label = context.dataset.label || '';
-                            if (label.includes(translate('mistakes')) || label.includes(translate('right_hand_mistakes')) || label.includes(translate('left_hand_mistakes'))) {
-                                return `${label}: ${translate('time')} ${context.parsed.x.toFixed(2)}s`;
-                            }
                             if (label) {
                                 label += ': ';
                             }
+                            if (context.dataset.yAxisID === 'y1') {
+                                return label + context.parsed.y;
+                            }
                             if (context.parsed.y !== null) {
                                 label += `${translate('delay')} ${context.parsed.y.toFixed(3)}s`;
                             }
-                            if (context.parsed.x !== null) {
-                                label += ` ${translate('at')} ${context.parsed.x.toFixed(2)}s`;
+                            const accuracy = context.dataset.accuracy[context.dataIndex];
+                            if (accuracy !== null) {
+                                label += ` (${Math.round(accuracy * 100)}%)`;
                             }
                             return label;
                         }
                     }
                 },
-                annotation: {
-                    annotations: {
-                        maxDelayLine: {
-                            type: 'line',
-                            yMin: data.max_delay,
-                            yMax: data.max_delay,
-                            borderColor: 'rgb(15, 249, 78)', // Green line
-                            borderWidth: 2,
-                            borderDash: [6, 6],
-                            label: {
-                                content: translate('max_acceptable_delay'),
-                                enabled: true,
-                                position: 'start'
-                            }
-                        }
-                    }
-                },
                 zoom: {
                     pan: {
                         enabled: true,
@@ -1748,13 +1842,10 @@ function handleSessionSummary(data, retries = 5) {
             },
             scales: {
                 x: {
-                    type: 'linear',
-                    position: 'bottom',
                     title: {
                         display: true,
-                        text: translate('time')
-                    },
-                    beginAtZero: true
+                        text: translate('bar')
+                    }
                 },
                 y: {
                     title: {
@@ -1763,6 +1854,20 @@ function handleSessionSummary(data, retries = 5) {
                     },
                     min: minYAxis,
                     max: maxYAxis
+                },
+                y1: {
+                    position: 'right',
+                    beginAtZero: true,
+                    ticks: {
+                        precision: 0
+                    },
+                    grid: {
+                        drawOnChartArea: false
+                    },
+                    title: {
+                        display: true,
+                        text: translate('mistakes_per_bar')
+                    }
                 }
             }
         }
@@ -186,6 +186,7 @@ const translations = {
         name: "Name",
         date: "Date",
         action: "Action",
+        difficulty: "Difficulty",
         songs_per_page: "Songs per page",
         total_songs: "Total songs: ",
 
@@ -310,6 +311,12 @@ const translations = {
         mistakes: "Timing Mistake",
         max_acceptaple_delay: "Maximum Allowable Delay",
         time: "MIDI Time (seconds)",
+        bar: "Bar",
+        mistakes_per_bar: "Mistakes per Bar",
+        timing_tendency: "Timing Tendency (Right / Left)",
+        rushing: "Rushing",
+        dragging: "Dragging",
+        steady: "Steady",
         delay: "Delay (seconds)",
         reset_zoom: "Reset",
         learning_status: "Start Learning"
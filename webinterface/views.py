@@ -1,6 +1,12 @@
 from webinterface import webinterface, app_state
 from flask import render_template, request, jsonify
 import os
+import threading
+from lib.song_library import song_library
+from lib.conversion_jobs import conversion_queue, SCORE_EXTENSIONS
+from lib.log_setup import logger
+from lib.learnmidi import precompile_song
+from lib.upload_sessions import upload_sessions
 
 import time
 
@@ -75,4 +81,68 @@ def upload_file():
 
         filename = filename.replace("'", "")
         file.save(os.path.join(webinterface.config['UPLOAD_FOLDER'], filename))
-        return jsonify(success=True, reload_songs=True, song_name=filename)
+        return song_uploaded(filename)
+
+
+def song_uploaded(filename):
+    add_song(filename)
+
+    # sheet music of a song which isn't there yet is converted to MIDI in the background
+    base, extension = os.path.splitext(filename)
+    if extension.lower() in SCORE_EXTENSIONS and not os.path.exists("Songs/" + base + ".mid"):
+        try:
+            job = conversion_queue.submit(filename, ".mid",
+                                          lambda job: add_song(job.target) if job.state == "done" else None)
+            return jsonify(success=True, reload_songs=True, song_name=filename, job=job.as_dict())
+        except ValueError as e:
+            logger.warning(str(e))
+    return jsonify(success=True, reload_songs=True, song_name=filename)
+
+
+def add_song(filename):
+    song_library.add(filename)
+    if filename.endswith(".mid"):
+        threading.Thread(target=precompile_song, args=(filename,), daemon=True).start()
+
+
+# Chunked uploads: init with the file name, size and CRC-32 (returns where to continue from after a
+# dropped connection), append the raw bytes chunk by chunk, commit to check and move the file in place
+
+@webinterface.route('/upload/init', methods=['POST'])
+def upload_init():
+    filename = os.path.basename(request.args.get('filename', '')).replace("'", "")
+    if not allowed_file(filename):
+        return jsonify(success=False, error="not a midi file", song_name=filename)
+    if os.path.exists("Songs/" + filename):
+        return jsonify(success=False, error="file already exists", song_name=filename)
+    try:
+        upload_id, offset = upload_sessions.init(filename, int(request.args.get('size')),
+                                                 request.args.get('checksum', ''))
+    except (TypeError, ValueError) as e:
+        return jsonify(success=False, error=str(e), song_name=filename)
+    return jsonify(success=True, upload_id=upload_id, offset=offset, song_name=filename)
+
+
+@webinterface.route('/upload/append', methods=['POST'])
+def upload_append():
+    upload_id = request.args.get('upload_id', '')
+    try:
+        offset = upload_sessions.append(upload_id, int(request.args.get('offset')), request.stream,
+                                        request.content_length or 0)
+    except (TypeError, ValueError) as e:
+        # the client carries on from the offset the server has
+        try:
+            offset = upload_sessions.offset(upload_id)
+        except ValueError:
+            offset = None
+        return jsonify(success=False, error=str(e), offset=offset)
+    return jsonify(success=True, offset=offset)
+
+
+@webinterface.route('/upload/commit', methods=['POST'])
+def upload_commit():
+    try:
+        filename = upload_sessions.commit(request.args.get('upload_id', ''))
+    except ValueError as e:
+        return jsonify(success=False, error=str(e))
+    return song_uploaded(filename)
@@ -1,10 +1,9 @@
 from webinterface import webinterface, app_state
-from flask import render_template, send_file, request, jsonify
+from flask import render_template, send_file, request, jsonify, Response
 from werkzeug.security import safe_join
-from lib.functions import (get_last_logs, find_between, theaterChase, theaterChaseRainbow, fireplace, sound_of_da_police, scanner,
+from lib.functions import (get_last_logs, theaterChase, theaterChaseRainbow, fireplace, sound_of_da_police, scanner,
                            breathing, rainbow, rainbowCycle, chords, colormap_animation, fastColorWipe, play_midi, clamp)
 import lib.colormaps as cmap
-import psutil
 import threading
 import webcolors as wc
 import mido
@@ -14,18 +13,21 @@ import subprocess
 import datetime
 import os
 import math
-from zipfile import ZipFile
 import json
-import ast
 from lib.rpi_drivers import GPIO
-from lib.log_setup import logger
+from lib.log_setup import logger, get_log_levels, set_log_level, memory_handler
+from lib.system_metrics import metrics_sampler
+from lib.status_board import status_board
+from lib.song_library import song_library
+from lib.conversion_jobs import conversion_queue
+from lib.zip_stream import stream_zip
+from lib.settings_bus import settings_bus, COLOR_MODE
+from webinterface.setting_handlers import SETTING_HANDLERS, apply_settings
 
 SENSECOVER = 12
 GPIO.setmode(GPIO.BCM)
 GPIO.setup(SENSECOVER, GPIO.IN, GPIO.PUD_UP)
 
-pid = psutil.Process(os.getpid())
-
 
 @webinterface.route('/api/start_animation', methods=['GET'])
 def start_animation():
@@ -107,42 +109,48 @@ def start_animation():
 
 @webinterface.route('/api/get_homepage_data')
 def get_homepage_data():
-    global pid
+    # system statistics come from the background sampler, nothing here waits for psutil
+    homepage_data = metrics_sampler.latest()
+    del homepage_data['time']
+    homepage_data['cpu_count'] = metrics_sampler.cpu_count
+    homepage_data['cover_state'] = cover_state()
+    homepage_data['led_fps'] = round(app_state.ledstrip.current_fps, 2)
+    homepage_data['screen_on'] = app_state.menu.screen_on
+    return jsonify(homepage_data)
 
+
+@webinterface.route('/api/get_metrics_history', methods=['GET'])
+def get_metrics_history():
+    seconds = request.args.get('seconds')
     try:
-        temp = find_between(str(psutil.sensors_temperatures()["cpu_thermal"]), "current=", ",")
-    except:
-        temp = 0
-
-    temp = round(float(temp), 1)
-
-    upload = psutil.net_io_counters().bytes_sent
-    download = psutil.net_io_counters().bytes_recv
-
-    card_space = psutil.disk_usage('/')
-
-    cover_opened = GPIO.input(SENSECOVER)
-
-    homepage_data = {
-        'cpu_usage': psutil.cpu_percent(interval=0.1),
-        'cpu_count': psutil.cpu_count(),
-        'cpu_pid': pid.cpu_percent(),
-        'cpu_freq': psutil.cpu_freq().current,
-        'memory_usage_percent': psutil.virtual_memory()[2],
-        'memory_usage_total': psutil.virtual_memory()[0],
-        'memory_usage_used': psutil.virtual_memory()[3],
-        'memory_pid': pid.memory_full_info().rss,
-        'cpu_temp': temp,
-        'upload': upload,
-        'download': download,
-        'card_space_used': card_space.used,
-        'card_space_total': card_space.total,
-        'card_space_percent': card_space.percent,
-        'cover_state': 'Opened' if cover_opened else 'Closed',
-        'led_fps': round(app_state.ledstrip.current_fps, 2),
-        'screen_on': app_state.menu.screen_on,
-    }
-    return jsonify(homepage_data)
+        seconds = float(seconds) if seconds is not None else None
+    except ValueError:
+        return jsonify(success=False, error="Invalid seconds value")
+    return jsonify(success=True, interval=metrics_sampler.interval, history=metrics_sampler.history(seconds))
+
+
+@webinterface.route('/api/change_settings', methods=['POST'])
+def change_settings():
+    # {"settings": [{"setting_name": ..., "value": ..., "second_value": ...}, ...], "disable_sequence": false}
+    # applies all or none of the settings, with one color mode rebuild and one save by the main loop
+    data = request.get_json(silent=True) or {}
+    try:
+        changes = [(change["setting_name"], change.get("value"), change.get("second_value"))
+                   for change in data.get("settings", [])]
+    except (AttributeError, KeyError, TypeError):
+        return jsonify(success=False, error="Invalid settings")
+    unknown = [setting_name for setting_name, _, _ in changes
+               if not isinstance(setting_name, str) or setting_name not in SETTING_HANDLERS]
+    if unknown:
+        return jsonify(success=False, error="Unknown settings: " + ", ".join(map(str, unknown)))
+    try:
+        response = apply_settings(changes)
+    except ValueError as e:
+        return jsonify(success=False, error=str(e))
+    if data.get("disable_sequence"):
+        app_state.ledsettings.sequence_active = False
+    response.setdefault("reload_sequence", False)
+    return jsonify(success=True, **response)
 
 
 @webinterface.route('/api/change_setting', methods=['GET'])
@@ -165,85 +173,19 @@ def change_setting():
         #app_state.ledsettings.ledstrip = ledstrip
         app_state.ledsettings.sequence_active = False
 
-    if setting_name == "clean_ledstrip":
-        fastColorWipe(app_state.ledstrip.strip, True, app_state.ledsettings)
-
-    if setting_name == "led_color":
-        rgb = wc.hex_to_rgb("#" + value)
-
-        app_state.ledsettings.color_mode = "Single"
-
-        app_state.ledsettings.red = rgb[0]
-        app_state.ledsettings.green = rgb[1]
-        app_state.ledsettings.blue = rgb[2]
-
-        app_state.usersettings.change_setting_value("color_mode", app_state.ledsettings.color_mode)
-        app_state.usersettings.change_setting_value("red", rgb[0])
-        app_state.usersettings.change_setting_value("green", rgb[1])
-        app_state.usersettings.change_setting_value("blue", rgb[2])
-        app_state.ledsettings.incoming_setting_change = True
-        return jsonify(success=True, reload_sequence=reload_sequence)
-
-    if setting_name == "light_mode":
-        app_state.ledsettings.mode = value
-        app_state.usersettings.change_setting_value("mode", value)
-
-    if setting_name == "fading_speed" or setting_name == "velocity_speed":
-        if not int(value):
-            value = 1000
-        app_state.ledsettings.fadingspeed = int(value)
-        app_state.usersettings.change_setting_value("fadingspeed", app_state.ledsettings.fadingspeed)
-
-    if setting_name == "brightness":
-        app_state.usersettings.change_setting_value("brightness_percent", int(value))
-        app_state.ledstrip.change_brightness(int(value), True)
-
-    if setting_name == "led_animation_brightness_percent":
-        app_state.usersettings.change_setting_value("led_animation_brightness_percent", int(value))
-        app_state.ledsettings.led_animation_brightness_percent = int(value)
-
-    if setting_name == "backlight_brightness":
-        app_state.ledsettings.backlight_brightness_percent = int(value)
-        app_state.ledsettings.backlight_brightness = 255 * app_state.ledsettings.backlight_brightness_percent / 100
-        app_state.usersettings.change_setting_value("backlight_brightness",
-                                                       int(app_state.ledsettings.backlight_brightness))
-        app_state.usersettings.change_setting_value("backlight_brightness_percent",
-                                                       app_state.ledsettings.backlight_brightness_percent)
-        fastColorWipe(app_state.ledstrip.strip, True, app_state.ledsettings)
-
-    if setting_name == "disable_backlight_on_idle":
-        value = int(value == 'true')
-        app_state.ledsettings.disable_backlight_on_idle = int(value)
-        app_state.usersettings.change_setting_value("disable_backlight_on_idle", app_state.ledsettings.disable_backlight_on_idle)
-
-    if setting_name == "backlight_color":
-        rgb = wc.hex_to_rgb("#" + value)
-
-        app_state.ledsettings.backlight_red = rgb[0]
-        app_state.ledsettings.backlight_green = rgb[1]
-        app_state.ledsettings.backlight_blue = rgb[2]
-
-        app_state.usersettings.change_setting_value("backlight_red", rgb[0])
-        app_state.usersettings.change_setting_value("backlight_green", rgb[1])
-        app_state.usersettings.change_setting_value("backlight_blue", rgb[2])
+    if setting_name in SETTING_HANDLERS:
+        # applied by the main loop
+        try:
+            response = apply_settings([(setting_name, value, second_value)])
+        except ValueError as e:
+            return jsonify(success=False, error=str(e))
+        if response.pop("reload_sequence", False):
+            response["reload_sequence"] = reload_sequence
+        return jsonify(success=True, **response)
 
+    if setting_name == "clean_ledstrip":
         fastColorWipe(app_state.ledstrip.strip, True, app_state.ledsettings)
 
-    if setting_name == "sides_color":
-        rgb = wc.hex_to_rgb("#" + value)
-
-        app_state.ledsettings.adjacent_red = rgb[0]
-        app_state.ledsettings.adjacent_green = rgb[1]
-        app_state.ledsettings.adjacent_blue = rgb[2]
-
-        app_state.usersettings.change_setting_value("adjacent_red", rgb[0])
-        app_state.usersettings.change_setting_value("adjacent_green", rgb[1])
-        app_state.usersettings.change_setting_value("adjacent_blue", rgb[2])
-
-    if setting_name == "sides_color_mode":
-        app_state.ledsettings.adjacent_mode = value
-        app_state.usersettings.change_setting_value("adjacent_mode", value)
-
     if setting_name == "input_port":
         app_state.usersettings.change_setting_value("input_port", value)
         app_state.midiports.change_port("inport", value)
@@ -255,10 +197,6 @@ def change_setting():
         app_state.usersettings.change_setting_value("play_port", value)
         app_state.midiports.change_port("playport", value)
 
-    if setting_name == "skipped_notes":
-        app_state.usersettings.change_setting_value("skipped_notes", value)
-        app_state.ledsettings.skipped_notes = value
-
     if setting_name == "add_note_offset":
         app_state.ledsettings.add_note_offset()
         return jsonify(success=True, reload=True)
@@ -294,236 +232,6 @@ def change_setting():
         app_state.usersettings.change_setting_value("reverse", int(value))
         app_state.ledstrip.change_reverse(int(value), True)
 
-    if setting_name == "color_mode":
-        reload_sequence = True
-        if second_value == "no_reload":
-            reload_sequence = False
-
-        app_state.ledsettings.color_mode = value
-        app_state.usersettings.change_setting_value("color_mode", app_state.ledsettings.color_mode)
-        return jsonify(success=True, reload_sequence=reload_sequence)
-
-    if setting_name == "add_multicolor":
-        app_state.ledsettings.addcolor()
-        return jsonify(success=True, reload=True)
-
-    if setting_name == "add_multicolor_and_set_value":
-        settings = json.loads(value)
-
-        app_state.ledsettings.multicolor.clear()
-        app_state.ledsettings.multicolor_range.clear()
-
-        for key, value in settings.items():
-            rgb = wc.hex_to_rgb("#" + value["color"])
-
-            app_state.ledsettings.multicolor.append([int(rgb[0]), int(rgb[1]), int(rgb[2])])
-            app_state.ledsettings.multicolor_range.append([int(value["range"][0]), int(value["range"][1])])
-
-        app_state.usersettings.change_setting_value("multicolor", app_state.ledsettings.multicolor)
-        app_state.usersettings.change_setting_value("multicolor_range",
-                                                       app_state.ledsettings.multicolor_range)
-
-        cmap.update_multicolor(app_state.ledsettings.multicolor_range, app_state.ledsettings.multicolor)
-
-        return jsonify(success=True)
-
-    if setting_name == "remove_multicolor":
-        app_state.ledsettings.deletecolor(int(value) + 1)
-        cmap.update_multicolor(app_state.ledsettings.multicolor_range, app_state.ledsettings.multicolor)
-        return jsonify(success=True, reload=True)
-
-    if setting_name == "multicolor":
-        rgb = wc.hex_to_rgb("#" + value)
-        app_state.ledsettings.multicolor[int(second_value)][0] = rgb[0]
-        app_state.ledsettings.multicolor[int(second_value)][1] = rgb[1]
-        app_state.ledsettings.multicolor[int(second_value)][2] = rgb[2]
-
-        app_state.usersettings.change_setting_value("multicolor", app_state.ledsettings.multicolor)
-
-        cmap.update_multicolor(app_state.ledsettings.multicolor_range, app_state.ledsettings.multicolor)
-
-        return jsonify(success=True, reload_sequence=reload_sequence)
-
-    if setting_name == "multicolor_range_left":
-        app_state.ledsettings.multicolor_range[int(second_value)][0] = int(value)
-        app_state.usersettings.change_setting_value("multicolor_range", app_state.ledsettings.multicolor_range)
-
-        cmap.update_multicolor(app_state.ledsettings.multicolor_range, app_state.ledsettings.multicolor)
-
-        return jsonify(success=True, reload_sequence=reload_sequence)
-
-    if setting_name == "multicolor_range_right":
-        app_state.ledsettings.multicolor_range[int(second_value)][1] = int(value)
-        app_state.usersettings.change_setting_value("multicolor_range", app_state.ledsettings.multicolor_range)
-
-        cmap.update_multicolor(app_state.ledsettings.multicolor_range, app_state.ledsettings.multicolor)
-
-        return jsonify(success=True, reload_sequence=reload_sequence)
-
-    if setting_name == "remove_all_multicolors":
-        app_state.ledsettings.multicolor.clear()
-        app_state.ledsettings.multicolor_range.clear()
-
-        app_state.usersettings.change_setting_value("multicolor", app_state.ledsettings.multicolor)
-        app_state.usersettings.change_setting_value("multicolor_range", app_state.ledsettings.multicolor_range)
-        return jsonify(success=True)
-
-    if setting_name == "rainbow_offset":
-        app_state.ledsettings.rainbow_offset = int(value)
-        app_state.usersettings.change_setting_value("rainbow_offset",
-                                                       int(app_state.ledsettings.rainbow_offset))
-        return jsonify(success=True, reload_sequence=reload_sequence)
-
-    if setting_name == "rainbow_scale":
-        app_state.ledsettings.rainbow_scale = int(value)
-        app_state.usersettings.change_setting_value("rainbow_scale",
-                                                       int(app_state.ledsettings.rainbow_scale))
-        return jsonify(success=True, reload_sequence=reload_sequence)
-
-    if setting_name == "rainbow_timeshift":
-        app_state.ledsettings.rainbow_timeshift = int(value)
-        app_state.usersettings.change_setting_value("rainbow_timeshift",
-                                                       int(app_state.ledsettings.rainbow_timeshift))
-        return jsonify(success=True, reload_sequence=reload_sequence)
-
-    if setting_name == "rainbow_colormap":
-        app_state.ledsettings.rainbow_colormap = value
-        app_state.usersettings.change_setting_value("rainbow_colormap",
-                                                       app_state.ledsettings.rainbow_colormap)
-        return jsonify(success=True, reload_sequence=reload_sequence)
-
-    if setting_name == "velocityrainbow_offset":
-        app_state.ledsettings.velocityrainbow_offset = int(value)
-        app_state.usersettings.change_setting_value("velocityrainbow_offset",
-                                                       int(app_state.ledsettings.velocityrainbow_offset))
-        return jsonify(success=True, reload_sequence=reload_sequence)
-
-    if setting_name == "velocityrainbow_scale":
-        app_state.ledsettings.velocityrainbow_scale = int(value)
-        app_state.usersettings.change_setting_value("velocityrainbow_scale",
-                                                       int(app_state.ledsettings.velocityrainbow_scale))
-        return jsonify(success=True, reload_sequence=reload_sequence)
-
-    if setting_name == "velocityrainbow_curve":
-        app_state.ledsettings.velocityrainbow_curve = int(value)
-        app_state.usersettings.change_setting_value("velocityrainbow_curve",
-                                                       int(app_state.ledsettings.velocityrainbow_curve))
-        return jsonify(success=True, reload_sequence=reload_sequence)
-
-    if setting_name == "velocityrainbow_colormap":
-        app_state.ledsettings.velocityrainbow_colormap = value
-        app_state.usersettings.change_setting_value("velocityrainbow_colormap",
-                                                       app_state.ledsettings.velocityrainbow_colormap)
-        return jsonify(success=True, reload_sequence=reload_sequence)
-
-
-    if setting_name == "speed_slowest_color":
-        rgb = wc.hex_to_rgb("#" + value)
-        app_state.ledsettings.speed_slowest["red"] = rgb[0]
-        app_state.ledsettings.speed_slowest["green"] = rgb[1]
-        app_state.ledsettings.speed_slowest["blue"] = rgb[2]
-
-        app_state.usersettings.change_setting_value("speed_slowest_red", rgb[0])
-        app_state.usersettings.change_setting_value("speed_slowest_green", rgb[1])
-        app_state.usersettings.change_setting_value("speed_slowest_blue", rgb[2])
-
-        return jsonify(success=True, reload_sequence=reload_sequence)
-
-    if setting_name == "speed_fastest_color":
-        rgb = wc.hex_to_rgb("#" + value)
-        app_state.ledsettings.speed_fastest["red"] = rgb[0]
-        app_state.ledsettings.speed_fastest["green"] = rgb[1]
-        app_state.ledsettings.speed_fastest["blue"] = rgb[2]
-
-        app_state.usersettings.change_setting_value("speed_fastest_red", rgb[0])
-        app_state.usersettings.change_setting_value("speed_fastest_green", rgb[1])
-        app_state.usersettings.change_setting_value("speed_fastest_blue", rgb[2])
-
-        return jsonify(success=True, reload_sequence=reload_sequence)
-
-    if setting_name == "gradient_start_color":
-        rgb = wc.hex_to_rgb("#" + value)
-        app_state.ledsettings.gradient_start["red"] = rgb[0]
-        app_state.ledsettings.gradient_start["green"] = rgb[1]
-        app_state.ledsettings.gradient_start["blue"] = rgb[2]
-
-        app_state.usersettings.change_setting_value("gradient_start_red", rgb[0])
-        app_state.usersettings.change_setting_value("gradient_start_green", rgb[1])
-        app_state.usersettings.change_setting_value("gradient_start_blue", rgb[2])
-
-        return jsonify(success=True, reload_sequence=reload_sequence)
-
-    if setting_name == "gradient_end_color":
-        rgb = wc.hex_to_rgb("#" + value)
-        app_state.ledsettings.gradient_end["red"] = rgb[0]
-        app_state.ledsettings.gradient_end["green"] = rgb[1]
-        app_state.ledsettings.gradient_end["blue"] = rgb[2]
-
-        app_state.usersettings.change_setting_value("gradient_end_red", rgb[0])
-        app_state.usersettings.change_setting_value("gradient_end_green", rgb[1])
-        app_state.usersettings.change_setting_value("gradient_end_blue", rgb[2])
-
-        return jsonify(success=True, reload_sequence=reload_sequence)
-
-    if setting_name == "speed_max_notes":
-        app_state.ledsettings.speed_max_notes = int(value)
-        app_state.usersettings.change_setting_value("speed_max_notes", int(value))
-
-        return jsonify(success=True, reload_sequence=reload_sequence)
-
-    if setting_name == "speed_period_in_seconds":
-        app_state.ledsettings.speed_period_in_seconds = float(value)
-        app_state.usersettings.change_setting_value("speed_period_in_seconds", float(value))
-
-        return jsonify(success=True, reload_sequence=reload_sequence)
-
-    if setting_name == "key_in_scale_color":
-        rgb = wc.hex_to_rgb("#" + value)
-        app_state.ledsettings.key_in_scale["red"] = rgb[0]
-        app_state.ledsettings.key_in_scale["green"] = rgb[1]
-        app_state.ledsettings.key_in_scale["blue"] = rgb[2]
-
-        app_state.usersettings.change_setting_value("key_in_scale_red", rgb[0])
-        app_state.usersettings.change_setting_value("key_in_scale_green", rgb[1])
-        app_state.usersettings.change_setting_value("key_in_scale_blue", rgb[2])
-
-        return jsonify(success=True, reload_sequence=reload_sequence)
-
-    if setting_name == "key_not_in_scale_color":
-        rgb = wc.hex_to_rgb("#" + value)
-        app_state.ledsettings.key_not_in_scale["red"] = rgb[0]
-        app_state.ledsettings.key_not_in_scale["green"] = rgb[1]
-        app_state.ledsettings.key_not_in_scale["blue"] = rgb[2]
-
-        app_state.usersettings.change_setting_value("key_not_in_scale_red", rgb[0])
-        app_state.usersettings.change_setting_value("key_not_in_scale_green", rgb[1])
-        app_state.usersettings.change_setting_value("key_not_in_scale_blue", rgb[2])
-
-        return jsonify(success=True, reload_sequence=reload_sequence)
-
-    if setting_name == "scale_key":
-        app_state.ledsettings.scale_key = int(value)
-        app_state.usersettings.change_setting_value("scale_key", int(value))
-
-        return jsonify(success=True, reload_sequence=reload_sequence)
-
-    if setting_name == "next_step":
-        app_state.ledsettings.set_sequence(0, 1, False)
-        return jsonify(success=True, reload_sequence=reload_sequence)
-
-    if setting_name == "set_sequence":
-        if int(value) == 0:
-            menu = app_state.ledsettings.menu
-            ledstrip = app_state.ledsettings.ledstrip
-            app_state.ledsettings.__init__(app_state.usersettings)
-            app_state.ledsettings.menu = menu
-            app_state.ledsettings.ledstrip = ledstrip
-            app_state.ledsettings.sequence_active = False
-        else:
-            app_state.ledsettings.set_sequence(int(value) - 1, 0)
-        app_state.ledsettings.incoming_setting_change = True
-        return jsonify(success=True, reload_sequence=reload_sequence)
-
     if setting_name == "change_sequence_name":
         sequences_tree = minidom.parse("config/sequences.xml")
         sequence_to_edit = "sequence_" + str(value)
@@ -612,7 +320,7 @@ def change_setting():
         sequences_tree.getElementsByTagName("list")[0].appendChild(element)
 
         pretty_save("config/sequences.xml", sequences_tree)
-        app_state.ledsettings.incoming_setting_change = True
+        settings_bus.publish(COLOR_MODE)
         return jsonify(success=True, reload_sequence=reload_sequence)
 
     if setting_name == "remove_sequence":
@@ -632,7 +340,7 @@ def change_setting():
                 i += 1
 
         pretty_save("config/sequences.xml", sequences_tree)
-        app_state.ledsettings.incoming_setting_change = True
+        settings_bus.publish(COLOR_MODE)
         return jsonify(success=True, reload_sequence=reload_sequence)
 
     if setting_name == "add_step":
@@ -671,7 +379,7 @@ def change_setting():
         sequences_tree.getElementsByTagName("sequence_" + str(value))[0].appendChild(step)
 
         pretty_save("config/sequences.xml", sequences_tree)
-        app_state.ledsettings.incoming_setting_change = True
+        settings_bus.publish(COLOR_MODE)
         return jsonify(success=True, reload_sequence=reload_sequence, reload_steps_list=True,
                        set_sequence_step_number=step_amount)
 
@@ -699,7 +407,7 @@ def change_setting():
                 i += 1
 
         pretty_save("config/sequences.xml", sequences_tree)
-        app_state.ledsettings.incoming_setting_change = True
+        settings_bus.publish(COLOR_MODE)
         return jsonify(success=True, reload_sequence=reload_sequence, reload_steps_list=True)
 
     # saving current led settings as sequence step
@@ -948,7 +656,7 @@ def change_setting():
 
         pretty_save("config/sequences.xml", sequences_tree)
 
-        app_state.ledsettings.incoming_setting_change = True
+        settings_bus.publish(COLOR_MODE)
 
         return jsonify(success=True, reload_sequence=reload_sequence, reload_steps_list=True)
 
@@ -984,15 +692,6 @@ def change_setting():
     if setting_name == "restart_rtp":
         app_state.platform.restart_rtpmidid()
 
-    if setting_name == "show_midi_events":
-        value = int(value == 'true')
-        app_state.usersettings.change_setting_value("midi_logging", value)
-
-    if setting_name == "multicolor_iteration":
-        value = int(value == 'true')
-        app_state.usersettings.change_setting_value("multicolor_iteration", value)
-        app_state.ledsettings.multicolor_iteration = value
-
     if setting_name == "start_recording":
         app_state.saving.start_recording()
         return jsonify(success=True, reload_songs=True)
@@ -1017,8 +716,10 @@ def change_setting():
                 if search_name in fname:
                     new_name = second_value.replace(".mid", "") + fname.replace(search_name, "")
                     os.rename('Songs/' + fname, 'Songs/' + new_name)
+                    song_library.rename(fname, new_name)
         else:
             os.rename('Songs/' + value, 'Songs/' + second_value)
+            song_library.rename(value, second_value)
             os.rename('Songs/cache/' + value + ".p", 'Songs/cache/' + second_value + ".p")
 
         return jsonify(success=True, reload_songs=True)
@@ -1029,8 +730,10 @@ def change_setting():
             for fname in os.listdir('Songs'):
                 if name_no_suffix in fname:
                     os.remove("Songs/" + fname)
+                    song_library.remove(fname)
         else:
             os.remove("Songs/" + value)
+            song_library.remove(value)
 
             file_types = [".musicxml", ".xml", ".mxl", ".abc"]
             for file_type in file_types:
@@ -1047,27 +750,17 @@ def change_setting():
         return jsonify(success=True, reload_songs=True)
 
     if setting_name == "download_song":
-        if "_main" in value:
-            zipObj = ZipFile("Songs/" + value.replace(".mid", "") + ".zip", 'w')
-            name_no_suffix = value.replace("_main.mid", "")
-            songs_count = 0
-            for fname in os.listdir('Songs'):
-                if name_no_suffix in fname and ".zip" not in fname:
-                    songs_count += 1
-                    zipObj.write("Songs/" + fname)
-            zipObj.close()
-            if songs_count == 1:
-                os.remove("Songs/" + value.replace(".mid", "") + ".zip")
-                return send_file(safe_join("../Songs/" + value), mimetype='application/x-csv',
-                                 download_name=value,
-                                 as_attachment=True)
-            else:
-                return send_file(safe_join("../Songs/" + value.replace(".mid", "")) + ".zip",
-                                 mimetype='application/x-csv',
-                                 download_name=value.replace(".mid", "") + ".zip", as_attachment=True)
-        else:
+        if safe_join("Songs", value) is None:
+            return jsonify(success=False, error="invalid song name")
+        song_library.load()
+        files = song_library.song_files(value)
+        if len(files) == 1:
             return send_file(safe_join("../Songs/" + value), mimetype='application/x-csv', download_name=value,
                              as_attachment=True)
+        # zipped while it is sent, nothing is written to the card
+        response = Response(stream_zip(files), mimetype='application/zip')
+        response.headers.set('Content-Disposition', 'attachment', filename=value.replace(".mid", "") + ".zip")
+        return response
 
     if setting_name == "download_sheet_music":
         file_types = [".musicxml", ".xml", ".mxl", ".abc"]
@@ -1080,12 +773,15 @@ def change_setting():
                                  as_attachment=True)
             except:
                 i += 1
-        app_state.learning.convert_midi_to_abc(value)
+        # no sheet music yet, the page waits for the conversion job and asks again
         try:
-            return send_file(safe_join("../Songs/", value.replace(".mid", ".abc")), mimetype='application/x-csv',
-                             download_name=value.replace(".mid", ".abc"), as_attachment=True)
-        except:
-            logger.warning("Converting failed")
+            job = conversion_queue.submit(value, ".abc")
+        except ValueError as e:
+            return jsonify(success=False, error=str(e))
+        if job.state != "done":
+            return jsonify(success=False, pending=True, job=job.as_dict())
+        return send_file(safe_join("../Songs/", job.target), mimetype='application/x-csv',
+                         download_name=job.target, as_attachment=True)
 
     if setting_name == "start_midi_play":
         app_state.saving.t = threading.Thread(target=play_midi, args=(value, app_state.midiports,
@@ -1097,7 +793,7 @@ def change_setting():
         return jsonify(success=True, reload_songs=True)
 
     if setting_name == "stop_midi_play":
-        app_state.saving.is_playing_midi.clear()
+        app_state.saving.stop_playing()
         fastColorWipe(app_state.ledstrip.strip, True, app_state.ledsettings)
 
         return jsonify(success=True, reload_songs=True)
@@ -1115,7 +811,7 @@ def change_setting():
         return jsonify(success=True)
 
     if setting_name == "stop_learning_song":
-        app_state.learning.is_started_midi = False
+        app_state.learning.stop_learning()
         fastColorWipe(app_state.ledstrip.strip, True, app_state.ledsettings)
 
         return jsonify(success=True)
@@ -1160,7 +856,7 @@ def change_setting():
         app_state.learning.start_point = clamp(app_state.learning.start_point, 0,
                                                   app_state.learning.end_point - 1)
         app_state.usersettings.change_setting_value("start_point", app_state.learning.start_point)
-        app_state.learning.restart_learning()
+        app_state.learning.update_loop_region()
 
         return jsonify(success=True)
 
@@ -1170,27 +866,41 @@ def change_setting():
         app_state.learning.end_point = clamp(app_state.learning.end_point, app_state.learning.start_point + 1,
                                                 100)
         app_state.usersettings.change_setting_value("end_point", app_state.learning.end_point)
-        app_state.learning.restart_learning()
+        app_state.learning.update_loop_region()
+
+        return jsonify(success=True)
+
+    if setting_name == "input_latency":
+        # manual offset in milliseconds for the current input port
+        app_state.midiports.set_input_latency(clamp(float(value), 0, 500) / 1000)
 
         return jsonify(success=True)
 
+    if setting_name == "learning_loop_region":
+        # value and second_value are the loop start and end, unit is "percent", "seconds" or "bars"
+        unit = request.args.get('unit', 'percent')
+        try:
+            app_state.learning.set_loop_region(float(value), float(second_value), unit)
+        except ValueError as e:
+            return jsonify(success=False, error=str(e))
+
+        return jsonify(success=True, reload_learning_settings=True)
+
     if setting_name == "set_current_time_as_start_point":
-        app_state.learning.start_point = round(
-            float(app_state.learning.current_idx * 100 / float(len(app_state.learning.song_tracks))), 3)
+        app_state.learning.start_point = round(app_state.learning.get_position_percent(), 3)
         app_state.learning.start_point = clamp(app_state.learning.start_point, 0,
                                                   app_state.learning.end_point - 1)
         app_state.usersettings.change_setting_value("start_point", app_state.learning.start_point)
-        app_state.learning.restart_learning()
+        app_state.learning.update_loop_region()
 
         return jsonify(success=True, reload_learning_settings=True)
 
     if setting_name == "set_current_time_as_end_point":
-        app_state.learning.end_point = round(
-            float(app_state.learning.current_idx * 100 / float(len(app_state.learning.song_tracks))), 3)
+        app_state.learning.end_point = round(app_state.learning.get_position_percent(), 3)
         app_state.learning.end_point = clamp(app_state.learning.end_point, app_state.learning.start_point + 1,
                                                 100)
         app_state.usersettings.change_setting_value("end_point", app_state.learning.end_point)
-        app_state.learning.restart_learning()
+        app_state.learning.update_loop_region()
 
         return jsonify(success=True, reload_learning_settings=True)
 
@@ -1546,74 +1256,231 @@ def get_learning_status():
                 "prev_hand_colorL": app_state.usersettings.get_setting_value("prev_hand_colorL"),
                 "show_wrong_notes": app_state.usersettings.get_setting_value("show_wrong_notes"),
                 "show_future_notes": app_state.usersettings.get_setting_value("show_future_notes"),
-                "hand_colorList": ast.literal_eval(app_state.usersettings.get_setting_value("hand_colorList")),
-                "is_loop_active": ast.literal_eval(app_state.usersettings.get_setting_value("is_loop_active")),
-                "number_of_mistakes": ast.literal_eval(app_state.usersettings.get_setting_value("number_of_mistakes")),
-                "is_led_activeL": ast.literal_eval(app_state.usersettings.get_setting_value("is_led_activeL")),
-                "is_led_activeR": ast.literal_eval(app_state.usersettings.get_setting_value("is_led_activeR"))}
+                "hand_colorList": app_state.usersettings.values.hand_colorList,
+                "is_loop_active": app_state.usersettings.values.is_loop_active,
+                "number_of_mistakes": app_state.usersettings.values.number_of_mistakes,
+                "is_led_activeL": app_state.usersettings.values.is_led_activeL,
+                "is_led_activeR": app_state.usersettings.values.is_led_activeR}
 
     return jsonify(response)
 
 
-@webinterface.route('/api/get_songs', methods=['GET'])
-def get_songs():
-    page = request.args.get('page')
-    page = int(page) - 1
-    length = request.args.get('length')
-    sortby = request.args.get('sortby')
-    search = request.args.get('search')
+LEARNING_STATUS_SETTINGS = ("practice", "hands", "mute_hand", "start_point", "end_point", "set_tempo", "hand_colorR",
+                            "hand_colorL", "show_wrong_notes", "show_future_notes", "is_loop_active",
+                            "number_of_mistakes", "is_led_activeL", "is_led_activeR")
+RECORDING_STATUS_SETTINGS = ("input_port", "play_port")
+# system statistics shown on the homepage, pushed from the metrics sampler
+SYSTEM_METRICS = ("cpu_usage", "cpu_pid", "cpu_freq", "cpu_temp", "memory_usage_percent", "memory_usage_total",
+                  "memory_usage_used", "memory_pid", "upload_rate", "download_rate", "card_space_used",
+                  "card_space_total", "card_space_percent")
+# the statistics and the LED frame rate (in whole fps) are pushed at most once per this many seconds
+SYSTEM_STATUS_INTERVAL = 3
 
-    start = int(page) * int(length)
 
-    songs_list_dict = {}
+def learning_status():
+    # raw setting strings, the page fetches get_learning_status when one of them changes
+    status = {name: app_state.usersettings.get_setting_value(name) for name in LEARNING_STATUS_SETTINGS}
+    status["loading"] = app_state.learning.loading
+    return status
 
-    path = 'Songs/'
-    songs_list = os.listdir(path)
-    songs_list = [os.path.join(path, i) for i in songs_list]
 
-    songs_list = sorted(songs_list, key=os.path.getmtime)
+def recording_status():
+    status = {name: app_state.usersettings.get_setting_value(name) for name in RECORDING_STATUS_SETTINGS}
+    status["isrecording"] = app_state.saving.is_recording
+    status["isplaying"] = len(app_state.saving.is_playing_midi) > 0
+    return status
 
-    if sortby == "dateAsc":
-        songs_list.reverse()
 
-    if sortby == "nameAsc":
-        songs_list.sort()
+def cover_state():
+    return 'Opened' if GPIO.input(SENSECOVER) else 'Closed'
 
-    if sortby == "nameDesc":
-        songs_list.sort(reverse=True)
 
-    i = 0
-    total_songs = 0
+def system_metrics_status(sample):
+    status = {name: sample[name] for name in SYSTEM_METRICS}
+    status["led_fps"] = round(sample["led_fps"])
+    status["cover_state"] = cover_state()
+    return status
+
+
+def system_status():
+    status = system_metrics_status(metrics_sampler.latest())
+    status["led_fps"] = round(app_state.ledstrip.current_fps)
+    status["cpu_count"] = metrics_sampler.cpu_count
+    status["screen_on"] = app_state.menu.screen_on
+    return status
 
-    for song in songs_list:
-        if "_#" in song or not song.endswith('.mid'):
-            continue
-        if search:
-            if search.lower() not in song.lower():
-                continue
-        total_songs += 1
 
-    max_page = int(math.ceil(total_songs / int(length)))
+STATUS_SOURCES = {"learning": learning_status,
+                  "recording": recording_status,
+                  "system": system_status,
+                  "conversion": conversion_queue.status}
+last_system_status = 0
 
-    for song in songs_list:
-        song = song.replace("Songs/", "")
-        date = os.path.getmtime("Songs/" + song)
-        if "_#" in song or not song.endswith('.mid'):
-            continue
 
-        if search:
-            if search.lower() not in song.lower():
+def publish_setting(topic, name):
+    def publish(value):
+        status_board.update(topic, {name: app_state.usersettings.get_setting_value(name)})
+    return publish
+
+
+def publish_system_status(sample):
+    global last_system_status
+    if sample['time'] - last_system_status < SYSTEM_STATUS_INTERVAL:
+        return
+    last_system_status = sample['time']
+    status_board.update("system", system_metrics_status(sample))
+
+
+def start_status_updates():
+    """Publish status changes to the status board as they happen, called once app_state is set.
+
+    Learning and loading state, recording and ports are published by the code changing them, the
+    metrics sampler adds the system statistics, frame rate and cover state.
+    """
+    for topic, names in (("learning", LEARNING_STATUS_SETTINGS), ("recording", RECORDING_STATUS_SETTINGS)):
+        for name in names:
+            app_state.usersettings.subscribe(name, publish_setting(topic, name))
+    app_state.usersettings.subscribe("screen_on", lambda value: status_board.update("system", {"screen_on": value}))
+    metrics_sampler.subscribe(publish_system_status)
+
+
+def refresh_status():
+    # full state for a new listener, in case something changed without being published
+    for topic, source in STATUS_SOURCES.items():
+        try:
+            status_board.update(topic, source())
+        except Exception as e:
+            logger.warning("Can't read " + topic + " status: " + str(e))
+
+
+@webinterface.route('/api/stream_status', methods=['GET'])
+def stream_status():
+    # server-sent events, one event per topic with only the fields that changed;
+    # the first events carry the full state, topics=learning,recording limits what is sent
+    topics = request.args.get('topics')
+    topics = set(topics.split(",")) if topics else None
+    refresh_status()
+
+    def generate():
+        after = 0
+        while True:
+            changes, after = status_board.wait_for_changes(after, topics, timeout=15)
+            if not changes:
+                yield ": keepalive\n\n"
                 continue
+            for topic, fields in changes.items():
+                yield "event: " + topic + "\ndata: " + json.dumps(fields) + "\n\n"
 
-        i += 1
-        if i > int(start):
-            songs_list_dict[song] = date
+    return Response(generate(), mimetype='text/event-stream', headers={'Cache-Control': 'no-cache'})
 
-        if len(songs_list_dict) >= int(length):
-            break
 
-    return render_template('songs_list.html', len=len(songs_list_dict), songs_list_dict=songs_list_dict, page=page,
-                           max_page=max_page, total_songs=total_songs)
+@webinterface.route('/api/get_conversion_jobs', methods=['GET'])
+def get_conversion_jobs():
+    return jsonify(conversion_queue.status())
+
+
+@webinterface.route('/api/get_conversion_job', methods=['GET'])
+def get_conversion_job():
+    try:
+        job = conversion_queue.get(int(request.args.get('job_id')))
+    except (TypeError, ValueError):
+        job = None
+    if job is None:
+        return jsonify(success=False, error="job not found")
+    return jsonify(success=True, job=job)
+
+
+@webinterface.route('/api/cancel_conversion', methods=['GET'])
+def cancel_conversion():
+    try:
+        cancelled = conversion_queue.cancel(int(request.args.get('job_id')))
+    except (TypeError, ValueError):
+        cancelled = False
+    return jsonify(success=cancelled)
+
+
+@webinterface.route('/api/calibrate_input_latency', methods=['GET'])
+def calibrate_input_latency():
+    # mode: "round_trip" or "tap_along", progress is reported by /api/get_input_latency
+    mode = request.args.get('mode', 'round_trip')
+    if app_state.learning.is_started_midi:
+        return jsonify(success=False, error="Stop learning before calibrating")
+    try:
+        started = app_state.learning.latency_calibrator.start(mode)
+    except ValueError as e:
+        return jsonify(success=False, error=str(e))
+
+    return jsonify(success=started)
+
+
+@webinterface.route('/api/get_input_latency', methods=['GET'])
+def get_input_latency():
+    response = {"input_port": app_state.usersettings.get_setting_value("input_port"),
+                "latency": app_state.midiports.get_input_latency(),
+                "calibration": app_state.learning.latency_calibrator.status}
+
+    return jsonify(response)
+
+
+@webinterface.route('/api/get_practice_history', methods=['GET'])
+def get_practice_history():
+    # sessions of one song for progress charts, oldest first
+    song = request.args.get('song')
+    if not song:
+        return jsonify(success=False, error="song is required")
+    since = float(request.args.get('since', 0))
+    limit = clamp(int(request.args.get('limit', 500)), 1, 5000)
+
+    return jsonify(success=True, song=song,
+                   sessions=app_state.learning.practice_history.get_song_history(song, since, limit))
+
+
+@webinterface.route('/api/get_practice_session', methods=['GET'])
+def get_practice_session():
+    session = app_state.learning.practice_history.get_session(int(request.args.get('id', 0)))
+    if session is None:
+        return jsonify(success=False, error="Session not found")
+
+    return jsonify(success=True, session=session)
+
+
+@webinterface.route('/api/get_practice_overview', methods=['GET'])
+def get_practice_overview():
+    return jsonify(success=True, songs=app_state.learning.practice_history.get_songs_overview())
+
+
+@webinterface.route('/api/get_songs', methods=['GET'])
+def get_songs():
+    page = request.args.get('page')
+    page = int(page) - 1
+    length = int(request.args.get('length'))
+    sortby = request.args.get('sortby')
+    search = request.args.get('search')
+
+    # sorted and counted by the song library index, no directory listing per request
+    songs, total_songs = song_library.query(sortby, search, page * length, length)
+    songs_list_dict = {song["name"]: song["mtime"] for song in songs}
+    songs_difficulty = {song["name"]: song["difficulty"] for song in songs}
+
+    max_page = int(math.ceil(total_songs / length))
+
+    return render_template('songs_list.html', len=len(songs_list_dict), songs_list_dict=songs_list_dict,
+                           songs_difficulty=songs_difficulty, page=page, max_page=max_page, total_songs=total_songs)
+
+
+@webinterface.route('/api/get_song_info', methods=['GET'])
+def get_song_info():
+    song = song_library.get(request.args.get('song'))
+    if song is None:
+        return jsonify(success=False, error="Unknown song")
+    return jsonify(success=True, song=song)
+
+
+@webinterface.route('/api/set_song_tags', methods=['GET'])
+def set_song_tags():
+    # tags=comma,separated,list
+    tags = request.args.get('tags', '').split(',')
+    return jsonify(success=song_library.set_tags(request.args.get('song'), tags))
 
 
 @webinterface.route('/api/get_ports', methods=['GET'])
@@ -1687,8 +1554,7 @@ def get_steps_list():
 def set_step_properties():
     sequence = request.args.get('sequence')
     step = request.args.get('step')
-    app_state.ledsettings.set_sequence(sequence, step, True)
-    app_state.ledsettings.incoming_setting_change = True
+    apply_settings([("set_step", sequence, step)])
     return jsonify(success=True)
 
 
@@ -1738,6 +1604,59 @@ def get_logs():
     last_logs = request.args.get('last_logs')
     return get_last_logs(last_logs)
 
+
+@webinterface.route('/api/get_log_records', methods=['GET'])
+def get_log_records():
+    # cursor pagination over the in-memory log buffer:
+    # after=<seq> returns newer lines (polling), before=<seq> older ones (scrolling back), neither the newest
+    after = request.args.get('after', type=int)
+    before = request.args.get('before', type=int)
+    limit = clamp(request.args.get('limit', 100, type=int), 1, memory_handler.lines.maxlen)
+    lines = memory_handler.get_lines(after=after, before=before, limit=limit)
+
+    return jsonify(lines=[line for _, line in lines],
+                   first=lines[0][0] if lines else None,
+                   last=lines[-1][0] if lines else None,
+                   latest=memory_handler.last_seq)
+
+
+@webinterface.route('/api/stream_logs', methods=['GET'])
+def stream_logs():
+    # live tail as server-sent events, the event id is the cursor so a reconnecting
+    # EventSource continues from Last-Event-ID
+    after = request.headers.get('Last-Event-ID', type=int)
+    if after is None:
+        after = request.args.get('after', memory_handler.last_seq, type=int)
+
+    def generate(after):
+        while True:
+            lines = memory_handler.wait_for_lines(after, timeout=15)
+            if not lines:
+                # keeps the connection alive and detects closed clients
+                yield ": keepalive\n\n"
+                continue
+            for seq, line in lines:
+                yield "id: " + str(seq) + "\ndata: " + line + "\n\n"
+            after = lines[-1][0]
+
+    return Response(generate(after), mimetype='text/event-stream', headers={'Cache-Control': 'no-cache'})
+
+
+@webinterface.route('/api/get_log_levels', methods=['GET'])
+def get_log_levels_api():
+    return jsonify(get_log_levels())
+
+
+@webinterface.route('/api/set_log_level', methods=['GET'])
+def set_log_level_api():
+    # takes effect immediately for the given logger ("my_app" or "score_logger"), not persisted
+    try:
+        set_log_level(request.args.get('logger'), request.args.get('level'))
+    except ValueError as e:
+        return jsonify(success=False, error=str(e))
+
+    return jsonify(success=True, levels=get_log_levels())
+
 @webinterface.route('/api/get_colormap_gradients', methods=['GET'])
 def get_colormap_gradients():
     return jsonify(cmap.colormaps_preview)